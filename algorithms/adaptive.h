@@ -0,0 +1,40 @@
+#ifndef ADAPTIVE_H
+#define ADAPTIVE_H
+
+#include <math.h>
+
+/* Must match the index of each method in utils.c_interface.ADAPTIVE_METHODS */
+#define ADAPTIVE_NONE    0
+#define ADAPTIVE_ADAGRAD 1
+#define ADAPTIVE_RMSPROP 2
+
+#define ADAPTIVE_EPSILON 1e-6f
+
+/* Per-parameter squared-gradient accumulators, shaped like the factors */
+typedef struct {
+    int mode;
+    float decay;
+    float *user_accumulators;
+    float *movie_accumulators;
+} adaptive_rates;
+
+/* Returns the change for parameter index of a factor matrix given its
+ * descent direction, updating that parameter's accumulator first */
+static inline float adaptive_step(const adaptive_rates *rates, float *accumulators,
+        long index, float learn_rate, float direction)
+{
+    float *accumulator;
+
+    if (rates->mode == ADAPTIVE_NONE) {
+        return learn_rate * direction;
+    }
+    accumulator = accumulators + index;
+    if (rates->mode == ADAPTIVE_ADAGRAD) {
+        *accumulator += direction * direction;
+    } else {
+        *accumulator = rates->decay * *accumulator + (1 - rates->decay) * direction * direction;
+    }
+    return learn_rate * direction / (sqrtf(*accumulator) + ADAPTIVE_EPSILON);
+}
+
+#endif
@@ -0,0 +1,244 @@
+from __future__ import print_function
+import ctypes
+import multiprocessing
+import numpy as np
+
+from algorithms.model import Model
+from utils.constants import (ALS_BATCH_POINTS, MAX_RATING, MIN_RATING,
+                             MOVIE_INDEX, RATING_INDEX,
+                             SVD_FEATURE_VALUE_INITIAL, USER_INDEX)
+from utils.data_indexes import (PointIndex, compute_index_offsets,
+                                split_id_batches)
+from utils.data_io import get_point_column
+from utils.dataset import get_points_array
+
+_solver = {}
+
+
+class ALS(Model):
+    def __init__(self, num_features=3, k_factor=0.05,
+                 feature_initial=SVD_FEATURE_VALUE_INITIAL, num_processes=1):
+        self.num_features = num_features
+        self.k_factor = k_factor
+        self.feature_initial = feature_initial
+        self.num_processes = num_processes
+        self.users = np.array([])
+        self.movies = np.array([])
+        self.train_points = np.array([])
+        self.user_groups = None
+        self.movie_groups = None
+        self.stats = None
+        self.max_user = 0
+        self.max_movie = 0
+        self.debug = False
+
+    def __getstate__(self):
+        # Groupings are rebuilt from the train points when training resumes
+        state = self.__dict__.copy()
+        state['user_groups'] = None
+        state['movie_groups'] = None
+        return state
+
+    def calculate_predictions(self, users, movies):
+        factor_products = np.einsum('ij,ij->i', self.users[users, :],
+                                    self.movies[movies, :])
+        predictions = (self.stats.get_baselines(users=users, movies=movies) +
+                       factor_products)
+        return np.clip(predictions, MIN_RATING, MAX_RATING)
+
+    def initialize_users_and_movies(self):
+        self.max_user = self.user_groups[1].shape[0] - 1
+        self.max_movie = self.movie_groups[1].shape[0] - 1
+        np.random.seed()
+        self.users = np.zeros((self.max_user, self.num_features),
+                              dtype=np.float32)
+        self.movies = np.array(
+            np.random.normal(loc=0.0, scale=self.feature_initial,
+                             size=(self.max_movie, self.num_features)),
+            dtype=np.float32)
+
+    def set_stats(self, stats):
+        self.stats = stats
+
+    def set_train_points(self, train_points):
+        train_points = get_points_array(train_points)
+        self.train_points = train_points
+        self.user_groups = group_points(train_points, USER_INDEX,
+                                        num_ids=self.max_user or None)
+        self.movie_groups = group_points(train_points, MOVIE_INDEX,
+                                         num_ids=self.max_movie or None)
+
+    def open_solver_pool(self):
+        if self.num_processes <= 1:
+            return None
+        return SolverPool(self, self.num_processes)
+
+    def solve_factors(self, column_index, solver_pool=None):
+        if column_index == USER_INDEX:
+            offsets = self.user_groups[1]
+            fixed_factors = self.movies
+        else:
+            offsets = self.movie_groups[1]
+            fixed_factors = self.users
+        tasks = [(column_index, start_id, stop_id) for start_id, stop_id in
+                 split_id_batches(offsets, ALS_BATCH_POINTS)]
+        if solver_pool is not None and len(tasks) > 1:
+            solved_batches = solver_pool.solve(column_index, fixed_factors,
+                                               tasks)
+        else:
+            _initialize_solver(self.train_points, self.user_groups,
+                               self.movie_groups,
+                               {column_index: fixed_factors},
+                               self.stats.movie_averages,
+                               self.stats.user_offsets, self.k_factor)
+            try:
+                solved_batches = [_solve_batch(task) for task in tasks]
+            finally:
+                _solver.clear()
+        factors = np.zeros((offsets.shape[0] - 1, self.num_features),
+                           dtype=np.float32)
+        for start_id, solved_factors in solved_batches:
+            factors[start_id:start_id + solved_factors.shape[0]] = (
+                solved_factors)
+        return factors
+
+    def train(self, train_points, stats, epochs=1):
+        self.max_user = 0
+        self.max_movie = 0
+        self.set_train_points(train_points)
+        self.set_stats(stats)
+        self.initialize_users_and_movies()
+        self.train_more(epochs=epochs)
+
+    def train_more(self, train_points=None, epochs=1):
+        if train_points is not None or self.user_groups is None:
+            self.set_train_points(
+                self.train_points if train_points is None else train_points)
+        # One pool serves every sweep of this call
+        solver_pool = self.open_solver_pool()
+        try:
+            for epoch in range(epochs):
+                if self.debug:
+                    print('Sweep #{}'.format(epoch + 1))
+                self.train_sweep(solver_pool=solver_pool)
+        finally:
+            if solver_pool is not None:
+                solver_pool.close()
+
+    def train_sweep(self, solver_pool=None):
+        self.users = self.solve_factors(USER_INDEX, solver_pool=solver_pool)
+        self.movies = self.solve_factors(MOVIE_INDEX,
+                                         solver_pool=solver_pool)
+
+
+class SolverPool:
+    """Worker processes that solve the batches of every half-sweep. The
+    points and groupings are handed over once when the pool starts; the
+    fixed factors of each half-sweep are copied into shared memory."""
+    def __init__(self, model, num_processes):
+        self.shared_factors = {}
+        self.fixed_factors = {}
+        for column_index, groups in ((USER_INDEX, model.movie_groups),
+                                     (MOVIE_INDEX, model.user_groups)):
+            shape = (groups[1].shape[0] - 1, model.num_features)
+            shared_factors = multiprocessing.RawArray(ctypes.c_float,
+                                                      shape[0] * shape[1])
+            self.shared_factors[column_index] = (shared_factors, shape)
+            self.fixed_factors[column_index] = get_shared_array(
+                shared_factors, shape)
+        self.pool = multiprocessing.Pool(
+            processes=num_processes, initializer=_initialize_shared_solver,
+            initargs=(model.train_points, model.user_groups,
+                      model.movie_groups, self.shared_factors,
+                      model.stats.movie_averages, model.stats.user_offsets,
+                      model.k_factor))
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def solve(self, column_index, fixed_factors, tasks):
+        np.copyto(self.fixed_factors[column_index], fixed_factors)
+        return self.pool.map(_solve_batch, tasks)
+
+
+def get_shared_array(shared_factors, shape):
+    return np.frombuffer(shared_factors, dtype=np.float32).reshape(shape)
+
+
+def group_points(points, column_index, num_ids=None):
+    column = get_point_column(points, column_index)
+    order = np.argsort(column, kind='mergesort').astype(np.int32)
+    offsets = compute_index_offsets(column[order], num_ids=num_ids)
+    return order, offsets
+
+
+def _initialize_shared_solver(points, user_groups, movie_groups,
+                              shared_factors, movie_averages, user_offsets,
+                              k_factor):
+    fixed_factors = {column_index: get_shared_array(*shared)
+                     for column_index, shared in shared_factors.items()}
+    _initialize_solver(points, user_groups, movie_groups, fixed_factors,
+                       movie_averages, user_offsets, k_factor)
+
+
+def _initialize_solver(points, user_groups, movie_groups, fixed_factors,
+                       movie_averages, user_offsets, k_factor):
+    # fixed_factors maps the column being solved to the other side's factors
+    _solver.update(points=points,
+                   groups={USER_INDEX: user_groups,
+                           MOVIE_INDEX: movie_groups},
+                   fixed_factors=fixed_factors,
+                   movie_averages=movie_averages, user_offsets=user_offsets,
+                   k_factor=k_factor)
+
+
+def _solve_batch(task):
+    column_index, start_id, stop_id = task
+    order, offsets = _solver['groups'][column_index]
+    offsets = offsets[start_id:stop_id + 1]
+    local_offsets = offsets - offsets[0]
+    counts = np.diff(local_offsets)
+    # Ids with equally many ratings are solved together as one stack of
+    # equal-size systems; gathering the points of the ids in count order
+    # makes every stack a contiguous slice
+    id_order = np.argsort(counts, kind='stable')
+    sorted_counts = counts[id_order]
+    rows, _ = PointIndex(order[offsets[0]:offsets[-1]],
+                         local_offsets).gather(id_order)
+    points = _solver['points']
+    users = get_point_column(points, USER_INDEX)[rows]
+    movies = get_point_column(points, MOVIE_INDEX)[rows]
+    ratings = get_point_column(points, RATING_INDEX)[rows]
+    residuals = ratings - (_solver['movie_averages'][movies] +
+                           _solver['user_offsets'][users])
+    other_ids = movies if column_index == USER_INDEX else users
+    fixed_rows = _solver['fixed_factors'][column_index][other_ids].astype(
+        np.float64)
+    num_ids = stop_id - start_id
+    num_features = fixed_rows.shape[1]
+    grams = np.zeros((num_ids, num_features, num_features))
+    right_sides = np.zeros((num_ids, num_features, 1))
+    stack_starts = np.flatnonzero(np.append(
+        True, sorted_counts[1:] != sorted_counts[:-1]))
+    stack_stops = np.append(stack_starts[1:], num_ids)
+    point_starts = np.cumsum(sorted_counts) - sorted_counts
+    for start, stop in zip(stack_starts, stack_stops):
+        count = sorted_counts[start]
+        # Ids without ratings keep a zero system and solve to zero factors
+        if count == 0:
+            continue
+        first_point = point_starts[start]
+        last_point = first_point + (stop - start) * count
+        segments = fixed_rows[first_point:last_point].reshape(
+            stop - start, count, num_features)
+        transposed = segments.transpose(0, 2, 1)
+        ids = id_order[start:stop]
+        grams[ids] = np.matmul(transposed, segments)
+        right_sides[ids] = np.matmul(transposed, residuals[
+            first_point:last_point].reshape(stop - start, count, 1))
+    # Weighted-lambda regularization: ridge scaled by each id's count
+    grams += (_solver['k_factor'] * np.maximum(counts, 1))[:, None, None] * (
+        np.eye(num_features))
+    solved_factors = np.linalg.solve(grams, right_sides)[:, :, 0]
+    return start_id, solved_factors.astype(np.float32)
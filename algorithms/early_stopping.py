@@ -0,0 +1,92 @@
+from __future__ import print_function
+import numpy as np
+
+from utils.dataset import get_points_array
+
+
+class EarlyStopping:
+    def __init__(self, model, validation_points, eval_every=1, patience=None,
+                 min_delta=0.0):
+        if eval_every < 1:
+            raise ValueError('eval_every must be at least 1, got {}'
+                             .format(eval_every))
+        self.model = model
+        self.validation_points = get_points_array(validation_points)
+        self.eval_every = eval_every
+        self.patience = patience
+        self.min_delta = min_delta
+        self.rmse_history = []
+        self.epoch_history = []
+        self.best_rmse = None
+        self.best_epoch = None
+        self.num_bad_evaluations = 0
+        self.snapshot = {}
+        self.schedule_state = None
+
+    def evaluate(self, epoch):
+        rmse = self.model.calculate_rmse(self.validation_points)
+        self.rmse_history.append(rmse)
+        self.epoch_history.append(epoch)
+        if self.best_rmse is None or rmse < self.best_rmse - self.min_delta:
+            self.best_rmse = rmse
+            self.best_epoch = epoch
+            self.num_bad_evaluations = 0
+            self.save_snapshot()
+        else:
+            self.num_bad_evaluations += 1
+        return rmse
+
+    def restore_best(self):
+        for name, array in self.snapshot.items():
+            np.copyto(getattr(self.model, name), array)
+        if self.schedule_state is not None:
+            self.model.learn_rate_schedule.set_state(self.schedule_state)
+
+    def save_snapshot(self):
+        # Buffers are allocated once and overwritten on every improvement
+        for name in self.model.get_parameter_names():
+            parameters = getattr(self.model, name)
+            buffer = self.snapshot.get(name)
+            if buffer is None or buffer.shape != parameters.shape:
+                self.snapshot[name] = np.copy(parameters)
+            else:
+                np.copyto(buffer, parameters)
+        # The learn rate carries on from the best epoch too
+        schedule = getattr(self.model, 'learn_rate_schedule', None)
+        self.schedule_state = (None if schedule is None else
+                               schedule.get_state())
+
+    def should_stop(self):
+        return (self.patience is not None and
+                self.num_bad_evaluations >= self.patience)
+
+    def train(self, train_points, stats, epochs, callback=None,
+              start_epoch=0):
+        # A start_epoch past 0 resumes a model restored from a checkpoint
+        trained_epochs = start_epoch
+        while trained_epochs < epochs:
+            block_epochs = min(self.eval_every, epochs - trained_epochs)
+            if trained_epochs == 0:
+                self.model.train(train_points, stats=stats,
+                                 epochs=block_epochs)
+            elif trained_epochs == start_epoch:
+                self.model.train_more(train_points=train_points,
+                                      epochs=block_epochs)
+            else:
+                self.model.train_more(epochs=block_epochs)
+            trained_epochs += block_epochs
+            rmse = self.evaluate(trained_epochs)
+            if callback is not None:
+                callback(trained_epochs, rmse)
+            if self.should_stop():
+                print('Stopping after epoch {epoch}: no improvement over '
+                      '{rmse} for {patience} evaluations'
+                      .format(epoch=trained_epochs, rmse=self.best_rmse,
+                              patience=self.patience))
+                break
+        # Without patience the run keeps its last epoch, as before
+        if (self.patience is not None and
+                self.best_epoch not in (None, trained_epochs)):
+            print('Restoring factors from epoch {}'.format(self.best_epoch))
+            self.restore_best()
+        return self.best_epoch
@@ -0,0 +1,132 @@
+#ifndef FACTORS_H
+#define FACTORS_H
+
+#include <stdint.h>
+#include <string.h>
+
+/* Storage of the users and movies factor matrices handed to the kernels.
+ * Rows are row_stride values apart, num_features of them used; see
+ * utils.factor_layout. Must match utils.c_interface.FACTOR_FORMAT_* */
+#define FACTOR_FORMAT_FLOAT32 0  /* float[num_rows][row_stride] */
+#define FACTOR_FORMAT_FLOAT16 1  /* IEEE 754 binary16, as numpy.float16 */
+
+/* Independent partial sums of a dot product; wide enough for one AVX-512
+ * register of floats, so every ISA build sums in the same order */
+#define FACTOR_LANES 16
+
+static inline float half_to_float(uint16_t half)
+{
+    uint32_t sign = (uint32_t) (half & 0x8000) << 16;
+    uint32_t exponent = (half >> 10) & 0x1f;
+    uint32_t mantissa = half & 0x3ff;
+    uint32_t bits;
+    float value;
+
+    if (exponent == 0x1f) {
+        bits = sign | 0x7f800000 | (mantissa << 13);
+    } else if (exponent != 0) {
+        bits = sign | ((exponent + 112) << 23) | (mantissa << 13);
+    } else if (mantissa == 0) {
+        bits = sign;
+    } else {
+        /* Subnormal: mantissa * 2^-24 */
+        value = (float) mantissa * 5.9604644775390625e-8f;
+        return sign ? -value : value;
+    }
+    memcpy(&value, &bits, sizeof(value));
+    return value;
+}
+
+/* Rounds to nearest, ties to even, like numpy's float32 to float16 cast */
+static inline uint16_t float_to_half(float value)
+{
+    uint32_t bits, sign, mantissa, remainder, halfway;
+    uint16_t half;
+    int exponent, shift;
+
+    memcpy(&bits, &value, sizeof(bits));
+    sign = (bits >> 16) & 0x8000;
+    mantissa = bits & 0x7fffff;
+    if (((bits >> 23) & 0xff) == 0xff) {
+        return (uint16_t) (sign | 0x7c00 | (mantissa ? 0x200 : 0));
+    }
+    exponent = (int) ((bits >> 23) & 0xff) - 127 + 15;
+    if (exponent >= 0x1f) {
+        return (uint16_t) (sign | 0x7c00);
+    }
+    if (exponent <= 0) {
+        if (exponent < -10) {
+            return (uint16_t) sign;
+        }
+        mantissa |= 0x800000;
+        shift = 14 - exponent;
+        half = (uint16_t) (mantissa >> shift);
+        remainder = mantissa & ((1u << shift) - 1);
+        halfway = 1u << (shift - 1);
+        if (remainder > halfway || (remainder == halfway && (half & 1))) {
+            half++;
+        }
+        return (uint16_t) (sign | half);
+    }
+    half = (uint16_t) (sign | ((uint32_t) exponent << 10) | (mantissa >> 13));
+    remainder = mantissa & 0x1fff;
+    /* A carry out of the mantissa correctly bumps the exponent */
+    if (remainder > 0x1000 || (remainder == 0x1000 && (half & 1))) {
+        half++;
+    }
+    return half;
+}
+
+/* Factors are always computed on as float; only their storage differs */
+static inline float load_factor(const void *factors, int factor_format, long index)
+{
+    if (factor_format == FACTOR_FORMAT_FLOAT16) {
+        return half_to_float(((const uint16_t *) factors)[index]);
+    }
+    return ((const float *) factors)[index];
+}
+
+static inline void store_factor(void *factors, int factor_format, long index, float value)
+{
+    if (factor_format == FACTOR_FORMAT_FLOAT16) {
+        ((uint16_t *) factors)[index] = float_to_half(value);
+    } else {
+        ((float *) factors)[index] = value;
+    }
+}
+
+/* Dot product of a user row and a movie row starting at the given indexes.
+ * Lane l sums features l, l + FACTOR_LANES, ...; the lanes are independent so
+ * the compiler can keep them in vector registers without reassociating. */
+static inline float dot_factors(const void *users, const void *movies, int factor_format,
+        long user_row, long movie_row, int num_features)
+{
+    float lanes[FACTOR_LANES] = {0};
+    float sum = 0;
+    const float *user_values, *movie_values;
+    int f, lane;
+
+    if (factor_format == FACTOR_FORMAT_FLOAT32) {
+        user_values = (const float *) users + user_row;
+        movie_values = (const float *) movies + movie_row;
+        for (f = 0; f + FACTOR_LANES <= num_features; f += FACTOR_LANES) {
+            for (lane = 0; lane < FACTOR_LANES; lane++) {
+                lanes[lane] += user_values[f + lane] * movie_values[f + lane];
+            }
+        }
+        for (; f < num_features; f++) {
+            lanes[f % FACTOR_LANES] += user_values[f] * movie_values[f];
+        }
+    } else {
+        for (f = 0; f < num_features; f++) {
+            lanes[f % FACTOR_LANES] += load_factor(users, factor_format, user_row + f) *
+                load_factor(movies, factor_format, movie_row + f);
+        }
+    }
+    for (lane = 0; lane < FACTOR_LANES; lane++) {
+        sum += lanes[lane];
+    }
+    return sum;
+}
+
+#endif
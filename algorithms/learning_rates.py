@@ -0,0 +1,52 @@
+LEARN_RATE_SCHEDULES = ('constant', 'exponential', 'step', 'bold_driver')
+"""Epoch-wise learning rate schedules understood by LearnRateSchedule"""
+
+
+class LearnRateSchedule:
+    def __init__(self, schedule='constant', decay=0.9, step_epochs=10,
+                 increase=1.05):
+        if schedule not in LEARN_RATE_SCHEDULES:
+            raise ValueError('Unknown learn rate schedule {}, expected one '
+                             'of {}'.format(schedule, LEARN_RATE_SCHEDULES))
+        self.schedule = schedule
+        self.decay = decay
+        self.step_epochs = step_epochs
+        self.increase = increase
+        self.epoch = 0
+        self.scale = 1.0
+        self.last_loss = None
+
+    def end_epoch(self, loss=None):
+        self.epoch += 1
+        if self.schedule == 'exponential':
+            self.scale = self.decay ** self.epoch
+        elif self.schedule == 'step':
+            self.scale = self.decay ** (self.epoch // self.step_epochs)
+        elif self.schedule == 'bold_driver':
+            # Speed up while the loss falls, back off hard once it rises
+            if self.last_loss is not None:
+                if loss < self.last_loss:
+                    self.scale *= self.increase
+                else:
+                    self.scale *= self.decay
+            self.last_loss = loss
+
+    def get_learn_rate(self, learn_rate):
+        return learn_rate * self.scale
+
+    def get_state(self):
+        return {'epoch': self.epoch, 'scale': self.scale,
+                'last_loss': self.last_loss}
+
+    def needs_loss(self):
+        return self.schedule == 'bold_driver'
+
+    def reset(self):
+        self.epoch = 0
+        self.scale = 1.0
+        self.last_loss = None
+
+    def set_state(self, state):
+        self.epoch = state['epoch']
+        self.scale = state['scale']
+        self.last_loss = state['last_loss']
@@ -1,7 +1,19 @@
+import numpy as np
 import os
 import pickle
 
+from utils.constants import (MOVIE_INDEX, PREDICT_CHUNK_SIZE, RATING_INDEX,
+                             USER_INDEX)
+from utils.data_io import get_point_column
 from utils.data_paths import MODELS_DIR_PATH
+from utils.dataset import get_points_array
+
+CHECKPOINT_SKIPPED_NAMES = ('train_points', 'residuals', 'stratified_order',
+                            'block_offsets', 'data_set', 'rated_index')
+"""Point-sized attributes left out of checkpoints; resume with the points"""
+
+CHECKPOINT_RUNTIME_NAMES = ('backend', 'debug', 'num_threads', 'run_c')
+"""Run settings that restoring a checkpoint into a model leaves as they are"""
 
 
 class Model:
@@ -11,7 +23,131 @@ class Model:
         with open(file_path, 'rb') as file:
             return pickle.load(file)
 
+    @staticmethod
+    def load_checkpoint(file_name, mmap_mode='r'):
+        """Builds the checkpointed model around memory-mapped arrays by
+        default, so loading only reads the header and processes share the
+        pages; use mmap_mode=None to train the loaded model further"""
+        from utils.checkpoint import read_checkpoint_header
+        header, _ = read_checkpoint_header(
+            os.path.join(MODELS_DIR_PATH, file_name))
+        model = import_class(header['class'])()
+        model.restore_checkpoint(file_name, mmap_mode=mmap_mode,
+                                 keep_runtime_settings=False)
+        return model
+
+    def calculate_rmse(self, test_points):
+        test_points = get_points_array(test_points)
+        num_test_points = test_points.shape[0]
+        squared_error = 0.0
+        for start in range(0, num_test_points, PREDICT_CHUNK_SIZE):
+            chunk = test_points[start:start + PREDICT_CHUNK_SIZE]
+            errors = (self.predict_chunk(chunk) -
+                      get_point_column(chunk, RATING_INDEX))
+            squared_error += np.dot(errors, errors)
+        return np.sqrt(squared_error / num_test_points)
+
+    def get_parameter_names(self):
+        return ('users', 'movies')
+
+    def predict(self, test_points):
+        test_points = get_points_array(test_points)
+        num_test_points = test_points.shape[0]
+        predictions = np.zeros(num_test_points, dtype=np.float32)
+        for start in range(0, num_test_points, PREDICT_CHUNK_SIZE):
+            chunk = test_points[start:start + PREDICT_CHUNK_SIZE]
+            predictions[start:start + chunk.shape[0]] = (
+                self.predict_chunk(chunk))
+        return predictions
+
+    def predict_chunk(self, chunk):
+        return self.calculate_predictions(
+            users=get_point_column(chunk, USER_INDEX),
+            movies=get_point_column(chunk, MOVIE_INDEX))
+
+    def restore_checkpoint(self, file_name, mmap_mode=None,
+                           keep_runtime_settings=True):
+        """Loads the checkpointed state into this model and returns the
+        metadata it was saved with. The CHECKPOINT_RUNTIME_NAMES settings
+        already set on the model are kept unless keep_runtime_settings is
+        False."""
+        from utils.checkpoint import load_checkpoint
+        header, arrays = load_checkpoint(
+            os.path.join(MODELS_DIR_PATH, file_name), mmap_mode=mmap_mode)
+        if header['class'] != get_class_name(self):
+            raise ValueError('{} holds a {}, not a {}'.format(
+                file_name, header['class'], get_class_name(self)))
+        attributes = header['attributes']
+        if keep_runtime_settings:
+            attributes = {name: value for name, value in attributes.items()
+                          if name not in CHECKPOINT_RUNTIME_NAMES}
+        apply_checkpoint_attributes(self, attributes)
+        for key, array in arrays.items():
+            names = key.split('.')
+            owner = self
+            for name in names[:-1]:
+                owner = getattr(owner, name)
+            setattr(owner, names[-1], array)
+        return header['metadata']
+
     def save(self, file_name):
         file_path = os.path.join(MODELS_DIR_PATH, file_name)
         with open(file_path, 'wb+') as file:
             pickle.dump(self, file)
+
+    def save_checkpoint(self, file_name, metadata=None):
+        from utils.checkpoint import save_checkpoint
+        arrays = {}
+        attributes = collect_checkpoint_attributes(self, arrays)
+        save_checkpoint(os.path.join(MODELS_DIR_PATH, file_name), arrays,
+                        header={'class': get_class_name(self),
+                                'attributes': attributes,
+                                'metadata': metadata or {}})
+
+
+def apply_checkpoint_attributes(target, attributes):
+    for name, value in attributes.items():
+        if isinstance(value, dict) and '__class__' in value:
+            nested = getattr(target, name, None)
+            if get_class_name(nested) != value['__class__']:
+                nested = import_class(value['__class__'])()
+            apply_checkpoint_attributes(nested, value['attributes'])
+            value = nested
+        setattr(target, name, value)
+
+
+def collect_checkpoint_attributes(source, arrays, prefix=''):
+    """Splits the pickled state of source into JSON attributes and arrays,
+    recursing into the repo's own objects such as stats. Values that are
+    neither, like random states or None, keep their constructor default."""
+    get_state = getattr(source, '__getstate__', None)
+    state = get_state() if get_state is not None else None
+    if state is None:
+        state = source.__dict__
+    attributes = {}
+    for name, value in state.items():
+        if name in CHECKPOINT_SKIPPED_NAMES or value is None:
+            continue
+        if isinstance(value, np.ndarray):
+            if not value.dtype.hasobject:
+                arrays[prefix + name] = value
+        elif isinstance(value, np.generic):
+            attributes[name] = value.item()
+        elif isinstance(value, (bool, int, float, str)):
+            attributes[name] = value
+        elif type(value).__module__.split('.')[0] in ('algorithms', 'utils'):
+            attributes[name] = {
+                '__class__': get_class_name(value),
+                'attributes': collect_checkpoint_attributes(
+                    value, arrays, prefix=prefix + name + '.')}
+    return attributes
+
+
+def get_class_name(instance):
+    return '{}.{}'.format(type(instance).__module__, type(instance).__name__)
+
+
+def import_class(class_name):
+    import importlib
+    module_name, name = class_name.rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), name)
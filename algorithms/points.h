@@ -0,0 +1,36 @@
+#ifndef POINTS_H
+#define POINTS_H
+
+#include <stdint.h>
+
+/* Layouts of the train_points array handed to the kernels */
+#define POINT_FORMAT_INT32   0  /* int32[num_points][4] user, movie, time, rating */
+#define POINT_FORMAT_COMPACT 1  /* packed compact_point records (9 bytes each) */
+
+/* Must match utils.data_io.COMPACT_POINT_DTYPE */
+typedef struct __attribute__((packed)) {
+    int32_t user;
+    int16_t movie;
+    int16_t time;
+    int8_t  rating;
+} compact_point;
+
+static inline void read_point(const void *points, int point_format, long p,
+        int *user, int *movie, int *time, int *rating)
+{
+    if (point_format == POINT_FORMAT_COMPACT) {
+        const compact_point *point = (const compact_point *) points + p;
+        *user   = point->user;
+        *movie  = point->movie;
+        *time   = point->time;
+        *rating = point->rating;
+    } else {
+        const int32_t *point = (const int32_t *) points + 4 * p;
+        *user   = point[0];
+        *movie  = point[1];
+        *time   = point[2];
+        *rating = point[3];
+    }
+}
+
+#endif
@@ -0,0 +1,137 @@
+#include <pthread.h>
+#include <stdlib.h>
+#include "factors.h"
+#include "points.h"
+
+/* Arguments shared by every worker, plus the slice of points it scores */
+typedef struct {
+    void *points;
+    int point_format;
+    int start;
+    int stop;
+    void *users;
+    float *user_offsets;
+    int num_users;
+    void *movies;
+    float *movie_averages;
+    int num_movies;
+    int num_features;
+    int factor_format;
+    int user_stride;
+    int movie_stride;
+    float *predictions;
+    double squared_error;
+    int error;
+} predict_slice;
+
+static void predict_points(predict_slice *slice)
+{
+    int p;
+    int user_id, movie_id, time, rating;
+    int num_features = slice->num_features;
+    int factor_format = slice->factor_format;
+    float prediction, error;
+    double squared_error = 0.0;
+
+    for (p = slice->start; p < slice->stop; p++) {
+        read_point(slice->points, slice->point_format, p, &user_id, &movie_id, &time, &rating);
+        if (user_id < 0 || user_id >= slice->num_users || movie_id < 0 || movie_id >= slice->num_movies) {
+            slice->error = 2;
+            return;
+        }
+        prediction = slice->movie_averages[movie_id] + slice->user_offsets[user_id] +
+            dot_factors(slice->users, slice->movies, factor_format,
+                        (long) user_id * slice->user_stride,
+                        (long) movie_id * slice->movie_stride, num_features);
+        // Clip once at the end, like SVD.calculate_predictions
+        if (prediction > 5) {
+            prediction = 5.0;
+        } else if (prediction < 1) {
+            prediction = 1.0;
+        }
+        if (slice->predictions != NULL) {
+            slice->predictions[p] = prediction;
+        }
+        error = ((float) rating) - prediction;
+        squared_error += (double) error * error;
+    }
+    slice->squared_error = squared_error;
+}
+
+static void *predict_points_worker(void *slice)
+{
+    predict_points((predict_slice *) slice);
+    return NULL;
+}
+
+/* Writes predictions when the array is given and always returns the summed
+ * squared error of the points through squared_error */
+int c_predict(void *points, int point_format, int num_points, void *users, float *user_offsets,
+        int num_users, void *movies, float *movie_averages, int num_movies,
+        int num_features, float *predictions, double *squared_error, int num_threads,
+        int factor_format, int user_stride, int movie_stride)
+{
+    int t;
+    int num_started = 0;
+    int error = 0;
+    predict_slice *slices;
+    pthread_t *threads;
+
+    if (num_threads < 1) {
+        num_threads = 1;
+    }
+    if (num_threads > num_points) {
+        num_threads = num_points > 0 ? num_points : 1;
+    }
+    slices = malloc(num_threads * sizeof(predict_slice));
+    threads = malloc(num_threads * sizeof(pthread_t));
+    if (slices == NULL || threads == NULL) {
+        free(slices);
+        free(threads);
+        return 1;
+    }
+    for (t = 0; t < num_threads; t++) {
+        slices[t].points = points;
+        slices[t].point_format = point_format;
+        slices[t].start = (int) ((long) num_points * t / num_threads);
+        slices[t].stop = (int) ((long) num_points * (t + 1) / num_threads);
+        slices[t].users = users;
+        slices[t].user_offsets = user_offsets;
+        slices[t].num_users = num_users;
+        slices[t].movies = movies;
+        slices[t].movie_averages = movie_averages;
+        slices[t].num_movies = num_movies;
+        slices[t].num_features = num_features;
+        slices[t].factor_format = factor_format;
+        slices[t].user_stride = user_stride;
+        slices[t].movie_stride = movie_stride;
+        slices[t].predictions = predictions;
+        slices[t].squared_error = 0.0;
+        slices[t].error = 0;
+    }
+    /* Slice 0 runs on the calling thread */
+    for (t = 1; t < num_threads; t++) {
+        if (pthread_create(&threads[t], NULL, predict_points_worker, &slices[t]) != 0) {
+            break;
+        }
+        num_started = t;
+    }
+    predict_points(&slices[0]);
+    for (t = 1; t <= num_started; t++) {
+        pthread_join(threads[t], NULL);
+    }
+    /* Finish any slices whose thread could not be started */
+    for (t = num_started + 1; t < num_threads; t++) {
+        predict_points(&slices[t]);
+    }
+    *squared_error = 0.0;
+    for (t = 0; t < num_threads; t++) {
+        *squared_error += slices[t].squared_error;
+        if (slices[t].error != 0) {
+            error = slices[t].error;
+        }
+    }
+    free(slices);
+    free(threads);
+    return error;
+}
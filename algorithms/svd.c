@@ -1,49 +1,82 @@
+#include <pthread.h>
 #include <stdio.h>
+#include <stdlib.h>
+#include "adaptive.h"
+#include "factors.h"
+#include "points.h"
 
-int c_update_feature(int *train_points, int num_points, float *users, float *user_offsets,
-        int num_users, float *movies, float* movie_averages, int num_movies, float *residuals,
-        float learn_rate, int feature, int num_features, float k_factor)
-{
+/* Everything needed to update one feature for a single training point */
+typedef struct {
+    void *train_points;
+    int point_format;
+    void *users;
+    float *user_offsets;
+    void *movies;
+    float *movie_averages;
+    float *residuals;
+    float learn_rate;
+    int feature;
+    int num_features;
+    float k_factor;
+    adaptive_rates rates;
+    int factor_format;
+    int user_stride;
+    int movie_stride;
+} feature_update;
+
+typedef void (*point_updater)(const feature_update *update, long p);
+
+/* One worker's share of a stratum: block rows first_row, first_row + step, ... */
+typedef struct {
+    point_updater update_point;
+    const feature_update *update;
+    const int *order;
+    const long long *block_offsets;
+    int num_blocks;
+    int stratum;
+    int first_row;
+    int step;
+} stratum_share;
 
-	int p, f;
+static void update_point(const feature_update *update, long p)
+{
 	float prediction, feature_product;
-	float *user_features, *movie_features;
-	float *user_features_cursor, *movie_features_cursor;
+	long user_factors, movie_factors, user_rate, movie_rate;
+	float user_value, movie_value;
 	float error, user_change, movie_change;
-	int *user,*movie,*time,*rating;
-	int *train_cursor = train_points;
-	
-	for(p = 0; p < num_points; p++){
+	int user, movie, time, rating;
+	int feature = update->feature;
+	int num_features = update->num_features;
+	int factor_format = update->factor_format;
+	float *residuals = update->residuals;
+
 		/* Get current variables   */
-		user   = train_cursor++;
-		movie  = train_cursor++;
-		time   = train_cursor++;
-		rating = train_cursor++; 
+		read_point(update->train_points, update->point_format, p, &user, &movie, &time, &rating);
 		
 		/* Calculate prediction error */
-		user_features  = users + (*user * num_features);
-	    movie_features = movies + (*movie * num_features);
-       	user_features_cursor  = user_features;
-      	movie_features_cursor = movie_features;
-        prediction = user_offsets[*user] + movie_averages[*movie];
+		user_factors  = (long) user * update->user_stride;
+		movie_factors = (long) movie * update->movie_stride;
+		/* Accumulators are packed, without the factor rows' padding */
+		user_rate  = (long) user * num_features + feature;
+		movie_rate = (long) movie * num_features + feature;
+        prediction = update->user_offsets[user] + update->movie_averages[movie];
 
-		feature_product = user_features[feature]*movie_features[feature];
+		user_value  = load_factor(update->users, factor_format, user_factors + feature);
+		movie_value = load_factor(update->movies, factor_format, movie_factors + feature);
+		feature_product = user_value * movie_value;
 		if(feature == 0){
-       		 for(f = 0; f < num_features; f++){
-       		        prediction += *user_features_cursor * *movie_features_cursor;
-       		        if(prediction > 5){
-       		            prediction = 5;
-       		        }else if(prediction < 1){
-       		            prediction = 1;
-       		        }
-
-        	        user_features_cursor++;
-               		movie_features_cursor++;
-                  }
-
+		    /* Clip once after the full sum, like predict.c */
+		    prediction += dot_factors(update->users, update->movies, factor_format,
+		            user_factors, movie_factors, num_features);
+		    if(prediction > 5){
+		        prediction = 5;
+		    }else if(prediction < 1){
+		        prediction = 1;
+		    }
 		}else{
 		    prediction  = residuals[p];
-		    prediction += user_features[feature-1]*movie_features[feature-1];
+		    prediction += load_factor(update->users, factor_format, user_factors + feature - 1) *
+		        load_factor(update->movies, factor_format, movie_factors + feature - 1);
             if(prediction > 5){ /* Clip ratings */
                 prediction = 5;
             }else if(prediction < 1){
@@ -58,30 +91,195 @@ int c_update_feature(int *train_points, int num_points, float *users, float *use
             }
 		}
 		
-		error = ((float) *rating) - prediction;
-
-		user_features_cursor  = &user_features[feature];
-		movie_features_cursor = &movie_features[feature];
+		error = ((float) rating) - prediction;
 
 		/* Update user and movie */
-		user_change  = learn_rate * (error * *movie_features_cursor - k_factor * *user_features_cursor);
-		movie_change = learn_rate * (error * *user_features_cursor - k_factor * *movie_features_cursor);
-
+		user_change  = adaptive_step(&update->rates,
+		        update->rates.user_accumulators, user_rate,
+		        update->learn_rate, error * movie_value - update->k_factor * user_value);
+		movie_change = adaptive_step(&update->rates,
+		        update->rates.movie_accumulators, movie_rate,
+		        update->learn_rate, error * user_value - update->k_factor * movie_value);
 
-		*user_features_cursor  += user_change;
-		*movie_features_cursor += movie_change;
-
-		user_features_cursor++; //next feature
-		movie_features_cursor++;
+		store_factor(update->users, factor_format, user_factors + feature, user_value + user_change);
+		store_factor(update->movies, factor_format, movie_factors + feature, movie_value + movie_change);
 
       	/* mmm save the residual */
 		if(feature < num_features - 1){
-		    //residuals[p] = prediction - *user_features_cursor * *movie_features_cursor;
 		    residuals[p] = prediction - feature_product;
-	        residuals[p] -= (*(user_features_cursor) * *(movie_features_cursor));
+	        residuals[p] -= load_factor(update->users, factor_format, user_factors + feature + 1) *
+	            load_factor(update->movies, factor_format, movie_factors + feature + 1);
 		}
+}
+
+/* residuals[p] caches the baseline plus every frozen feature of point p, so
+ * training a feature only needs that feature's product. */
+static void update_point_cached(const feature_update *update, long p)
+{
+    int user, movie, time, rating;
+    long user_factor, movie_factor, user_rate, movie_rate;
+    float prediction, error, user_value, movie_value, user_change, movie_change;
+
+    read_point(update->train_points, update->point_format, p, &user, &movie, &time, &rating);
+    user_factor  = (long) user * update->user_stride + update->feature;
+    movie_factor = (long) movie * update->movie_stride + update->feature;
+    user_rate  = (long) user * update->num_features + update->feature;
+    movie_rate = (long) movie * update->num_features + update->feature;
+    user_value  = load_factor(update->users, update->factor_format, user_factor);
+    movie_value = load_factor(update->movies, update->factor_format, movie_factor);
+
+    prediction = update->residuals[p] + user_value * movie_value;
+    if (prediction > 5) {
+        prediction = 5;
+    } else if (prediction < 1) {
+        prediction = 1;
+    }
+    error = ((float) rating) - prediction;
+
+    user_change = adaptive_step(&update->rates, update->rates.user_accumulators, user_rate,
+            update->learn_rate, error * movie_value - update->k_factor * user_value);
+    movie_change = adaptive_step(&update->rates, update->rates.movie_accumulators, movie_rate,
+            update->learn_rate, error * user_value - update->k_factor * movie_value);
+    store_factor(update->movies, update->factor_format, movie_factor, movie_value + movie_change);
+    store_factor(update->users, update->factor_format, user_factor, user_value + user_change);
+}
+
+int c_update_feature(void *train_points, int point_format, int num_points, void *users, float *user_offsets,
+        int num_users, void *movies, float* movie_averages, int num_movies, float *residuals,
+        float learn_rate, int feature, int num_features, float k_factor, int adaptive_mode,
+        float adaptive_decay, float *user_accumulators, float *movie_accumulators,
+        int factor_format, int user_stride, int movie_stride)
+{
+    int p;
+    feature_update update = {train_points, point_format, users, user_offsets, movies,
+                             movie_averages, residuals, learn_rate, feature, num_features,
+                             k_factor, {adaptive_mode, adaptive_decay, user_accumulators,
+                                        movie_accumulators}, factor_format,
+                             user_stride, movie_stride};
+
+	for(p = 0; p < num_points; p++){
+        update_point(&update, p);
 	}
     return 0;
 }
 
+static void update_stratum_share(const stratum_share *share)
+{
+    int row, block;
+    long long i;
+
+    for (row = share->first_row; row < share->num_blocks; row += share->step) {
+        /* Row blocks of one stratum never share a user or movie range */
+        block = row * share->num_blocks + (row + share->stratum) % share->num_blocks;
+        for (i = share->block_offsets[block]; i < share->block_offsets[block + 1]; i++) {
+            share->update_point(share->update, share->order[i]);
+        }
+    }
+}
+
+static void *update_stratum_worker(void *share)
+{
+    update_stratum_share((const stratum_share *) share);
+    return NULL;
+}
+
+/* DSGD: points are grouped into num_blocks x num_blocks (user range, movie range)
+ * blocks, listed block by block in order and delimited by block_offsets. Each
+ * stratum's blocks are conflict free and are trained concurrently. */
+static int update_strata(point_updater update_point, const feature_update *update,
+        const int *order, const long long *block_offsets, int num_blocks, int num_threads)
+{
+    int s, t, num_started;
+    stratum_share *shares;
+    pthread_t *threads;
+
+    if (num_threads > num_blocks) {
+        num_threads = num_blocks;
+    }
+    if (num_threads < 1) {
+        num_threads = 1;
+    }
+    shares = malloc(num_threads * sizeof(stratum_share));
+    threads = malloc(num_threads * sizeof(pthread_t));
+    if (shares == NULL || threads == NULL) {
+        free(shares);
+        free(threads);
+        return 1;
+    }
+    for (s = 0; s < num_blocks; s++) {
+        for (t = 0; t < num_threads; t++) {
+            shares[t].update_point = update_point;
+            shares[t].update = update;
+            shares[t].order = order;
+            shares[t].block_offsets = block_offsets;
+            shares[t].num_blocks = num_blocks;
+            shares[t].stratum = s;
+            shares[t].first_row = t;
+            shares[t].step = num_threads;
+        }
+        /* Share 0 runs on the calling thread */
+        num_started = 0;
+        for (t = 1; t < num_threads; t++) {
+            if (pthread_create(&threads[t], NULL, update_stratum_worker, &shares[t]) != 0) {
+                break;
+            }
+            num_started = t;
+        }
+        update_stratum_share(&shares[0]);
+        for (t = 1; t <= num_started; t++) {
+            pthread_join(threads[t], NULL);
+        }
+        for (t = num_started + 1; t < num_threads; t++) {
+            update_stratum_share(&shares[t]);
+        }
+    }
+    free(shares);
+    free(threads);
+    return 0;
+}
+
+int c_update_feature_stratified(void *train_points, int point_format, int num_points,
+        int *order, long long *block_offsets, int num_blocks, void *users,
+        float *user_offsets, int num_users, void *movies, float* movie_averages,
+        int num_movies, float *residuals, float learn_rate, int feature,
+        int num_features, float k_factor, int adaptive_mode, float adaptive_decay,
+        float *user_accumulators, float *movie_accumulators, int num_threads,
+        int factor_format, int user_stride, int movie_stride)
+{
+    feature_update update = {train_points, point_format, users, user_offsets, movies,
+                             movie_averages, residuals, learn_rate, feature, num_features,
+                             k_factor, {adaptive_mode, adaptive_decay, user_accumulators,
+                                        movie_accumulators}, factor_format,
+                             user_stride, movie_stride};
+
+    return update_strata(update_point, &update, order, block_offsets, num_blocks,
+                         num_threads);
+}
+
+/* Trains one feature against the frozen-feature residual cache. With an order
+ * and block_offsets the points are trained stratum by stratum on num_threads
+ * threads; otherwise serially in file order. */
+int c_update_cached_feature(void *train_points, int point_format, int num_points,
+        int *order, long long *block_offsets, int num_blocks, void *users,
+        int num_users, void *movies, int num_movies, float *residual_cache,
+        float learn_rate, int feature, int num_features, float k_factor,
+        int adaptive_mode, float adaptive_decay, float *user_accumulators,
+        float *movie_accumulators, int num_threads, int factor_format,
+        int user_stride, int movie_stride)
+{
+    long p;
+    feature_update update = {train_points, point_format, users, NULL, movies,
+                             NULL, residual_cache, learn_rate, feature, num_features,
+                             k_factor, {adaptive_mode, adaptive_decay, user_accumulators,
+                                        movie_accumulators}, factor_format,
+                             user_stride, movie_stride};
 
+    if (order != NULL && block_offsets != NULL) {
+        return update_strata(update_point_cached, &update, order, block_offsets,
+                             num_blocks, num_threads);
+    }
+    for (p = 0; p < num_points; p++) {
+        update_point_cached(&update, p);
+    }
+    return 0;
+}
@@ -1,13 +1,25 @@
 from __future__ import print_function
 import numpy as np
+import os
 import sys
 from time import time
 
 from algorithms.model import Model
-from utils.c_interface import c_svd_update_feature
+from utils.c_interface import (c_predict, c_rmse, c_svd_update_cached_feature,
+                               c_svd_update_feature,
+                               c_svd_update_feature_stratified, get_kernel,
+                               is_kernel_available)
 from utils.constants import SVD_FEATURE_VALUE_INITIAL
-from utils.constants import MOVIE_INDEX, USER_INDEX
-from utils.data_io import get_user_movie_time_rating
+from utils.constants import (MAX_RATING, MIN_RATING, MOVIE_INDEX,
+                             PREDICT_CHUNK_SIZE, RECOMMEND_BATCH_USERS,
+                             USER_INDEX)
+from utils.data_indexes import build_user_index
+from utils.data_io import get_point_column, get_user_movie_time_rating
+from utils.data_ordering import compute_stratified_order
+from utils.data_paths import MODELS_DIR_PATH
+from utils.dataset import compute_points_fingerprint, get_points_array
+from utils.factor_layout import align_factors, allocate_factors
+import utils.numpy_kernels  # registers the 'numpy' kernel backend
 
 
 class SVD(Model):
@@ -26,53 +38,343 @@ class SVD(Model):
         self.max_movie = 0
         self.debug = False
         self.run_c = False
+        self.backend = None
+        self.num_threads = 1
+        self.stratified_order = None
+        self.block_offsets = None
+        self.rated_index = None
+        self.residual_cache = np.array([])
+        self.residual_fingerprint = None
+        self.residual_cache_file_name = None
+        self.num_frozen_features = 0
+        self.adaptive_method = None
+        self.adaptive_decay = 0.9
+        self.user_accumulators = None
+        self.movie_accumulators = None
+        self.learn_rate_schedule = None
+        self.factor_dtype = 'float32'
+        self.training_order = None
+
+    def __getstate__(self):
+        # The residual cache is saved next to the model, see save
+        state = self.__dict__.copy()
+        state['residual_cache'] = np.array([])
+        state['rated_index'] = None
+        return state
+
+    def can_predict_in_c(self):
+        return self.select_backend('predict') == 'c'
 
     def calculate_max_movie(self):
-        return np.amax(self.train_points[:, MOVIE_INDEX]) + 1
+        return np.amax(get_point_column(self.train_points, MOVIE_INDEX)) + 1
 
     def calculate_max_user(self):
-        return np.amax(self.train_points[:, USER_INDEX]) + 1
+        return np.amax(get_point_column(self.train_points, USER_INDEX)) + 1
 
     def calculate_prediction(self, user, movie):
         return self.stats.get_baseline(user=user, movie=movie) + np.dot(
             self.users[user, :], self.movies[movie, :])
 
+    def calculate_predictions(self, users, movies):
+        # float16 factors are multiplied and summed in float32
+        factor_products = np.einsum('ij,ij->i', self.users[users, :],
+                                    self.movies[movies, :], dtype=np.float32,
+                                    casting='same_kind')
+        predictions = (self.stats.get_baselines(users=users, movies=movies) +
+                       factor_products)
+        return np.clip(predictions, MIN_RATING, MAX_RATING)
+
+    def calculate_rmse(self, test_points):
+        if not self.can_predict_in_c():
+            return Model.calculate_rmse(self, test_points)
+        return c_rmse(test_points, users=self.get_prediction_users(),
+                      user_offsets=self.stats.user_offsets,
+                      movies=self.movies,
+                      movie_averages=self.stats.movie_averages,
+                      num_features=self.num_features,
+                      num_threads=self.num_threads)
+
     def calculate_prediction_error(self, user, movie, rating):
         return rating - self.calculate_prediction(user, movie)
 
+    def check_c_only_options(self, backend):
+        if backend == 'c':
+            return
+        if self.adaptive_method is not None:
+            raise ValueError('Adaptive learning rates need the c backend, '
+                             'not {}'.format(backend))
+        if self.factor_dtype != 'float32':
+            raise ValueError('{} factors need the c backend, not {}'
+                             .format(self.factor_dtype, backend))
+
+    def check_feature_order_options(self):
+        # Only the point-major epoch of SVDEuclidean follows an order
+        if self.training_order is not None:
+            raise ValueError('{} trains feature by feature and does not '
+                             'support training_order'
+                             .format(self.__class__.__name__))
+
+    def compute_residual_cache(self):
+        num_train_points = self.train_points.shape[0]
+        frozen = self.num_frozen_features
+        residual_cache = np.zeros(num_train_points, dtype=np.float32)
+        for start in range(0, num_train_points, PREDICT_CHUNK_SIZE):
+            chunk = self.train_points[start:start + PREDICT_CHUNK_SIZE]
+            users = get_point_column(chunk, USER_INDEX)
+            movies = get_point_column(chunk, MOVIE_INDEX)
+            residual_cache[start:start + chunk.shape[0]] = (
+                self.stats.get_baselines(users=users, movies=movies) +
+                np.einsum('ij,ij->i', self.users[users, :frozen],
+                          self.movies[movies, :frozen], dtype=np.float32,
+                          casting='same_kind'))
+        self.residual_cache = residual_cache
+        self.residual_fingerprint = self.compute_residual_fingerprint()
+
+    def compute_residual_fingerprint(self):
+        # The cache holds the baselines, so the stats are part of its key
+        import hashlib
+        digest = hashlib.sha1(
+            compute_points_fingerprint(self.train_points).encode('ascii'))
+        for baselines in (self.stats.movie_averages, self.stats.user_offsets):
+            digest.update(np.ascontiguousarray(baselines).tobytes())
+        return digest.hexdigest()
+
+    def end_epoch(self):
+        if self.learn_rate_schedule is None:
+            return
+        loss = None
+        if self.learn_rate_schedule.needs_loss():
+            loss = self.calculate_rmse(self.train_points)
+        self.learn_rate_schedule.end_epoch(loss)
+
+    def ensure_accumulators(self):
+        if (self.user_accumulators is None or
+                self.user_accumulators.shape != self.users.shape or
+                self.movie_accumulators.shape != self.movies.shape):
+            self.user_accumulators = np.zeros_like(self.users,
+                                                   dtype=np.float32)
+            self.movie_accumulators = np.zeros_like(self.movies,
+                                                    dtype=np.float32)
+
+    def ensure_factor_layout(self):
+        # Unpickled factors lose their row padding
+        self.users = align_factors(self.users)
+        self.movies = align_factors(self.movies)
+
+    def ensure_residual_cache(self):
+        if self.residual_fingerprint == self.compute_residual_fingerprint():
+            if self.residual_cache.size == 0:
+                self.load_residual_cache()
+            if self.residual_cache.shape[0] == self.train_points.shape[0]:
+                return
+        self.compute_residual_cache()
+
+    def freeze_feature(self, feature):
+        for start in range(0, self.train_points.shape[0], PREDICT_CHUNK_SIZE):
+            chunk = self.train_points[start:start + PREDICT_CHUNK_SIZE]
+            users = get_point_column(chunk, USER_INDEX)
+            movies = get_point_column(chunk, MOVIE_INDEX)
+            self.residual_cache[start:start + chunk.shape[0]] += np.multiply(
+                self.users[users, feature], self.movies[movies, feature],
+                dtype=np.float32, casting='same_kind')
+        self.num_frozen_features = feature + 1
+
+    def get_adaptive_arguments(self):
+        if self.adaptive_method is None:
+            return {}
+        self.ensure_accumulators()
+        return {'adaptive_method': self.adaptive_method,
+                'adaptive_decay': self.adaptive_decay,
+                'user_accumulators': self.user_accumulators,
+                'movie_accumulators': self.movie_accumulators}
+
+    def get_epoch_learn_rate(self):
+        if self.learn_rate_schedule is None:
+            return self.learn_rate
+        return self.learn_rate_schedule.get_learn_rate(self.learn_rate)
+
+    def get_epoch_order(self):
+        if self.training_order is None:
+            return None
+        return self.training_order.get_epoch_order(self.train_points)
+
+    def get_parameter_names(self):
+        # Accumulators belong to the factors they were built up with
+        if self.adaptive_method is None or self.user_accumulators is None:
+            return Model.get_parameter_names(self)
+        return Model.get_parameter_names(self) + ('user_accumulators',
+                                                  'movie_accumulators')
+
+    def get_prediction_users(self):
+        return self.users
+
+    def get_rated_index(self):
+        # Built once per train points; models pickled before have none
+        if getattr(self, 'rated_index', None) is None:
+            self.rated_index = build_user_index(self.train_points,
+                                                num_users=self.max_user)
+        return self.rated_index
+
+    def get_stratified_order(self):
+        num_blocks = self.num_threads
+        if (self.stratified_order is None or
+                self.block_offsets.shape[0] != num_blocks ** 2 + 1):
+            self.stratified_order, self.block_offsets = (
+                compute_stratified_order(self.train_points,
+                                         num_blocks=num_blocks))
+        return self.stratified_order, self.block_offsets
+
+    def initialize_learning_state(self):
+        # Accumulators are created on first use, see ensure_accumulators
+        self.user_accumulators = None
+        self.movie_accumulators = None
+        if self.learn_rate_schedule is not None:
+            self.learn_rate_schedule.reset()
+
     def initialize_users_and_movies(self):
         self.max_user = self.calculate_max_user()
         self.max_movie = self.calculate_max_movie()
-        self.users = np.full((self.max_user, self.num_features),
-                             self.feature_initial, dtype=np.float32)
-        self.movies = np.full((self.max_movie, self.num_features),
-                              self.feature_initial, dtype=np.float32)
-
-    def predict(self, test_points):
-        num_test_points = test_points.shape[0]
-        predictions = np.zeros(num_test_points, dtype=np.float32)
-        for i, test_point in enumerate(test_points):
-            user, movie, _, _ = get_user_movie_time_rating(test_point)
-            predictions[i] = self.calculate_prediction(user, movie)
-        return predictions
+        self.users = allocate_factors(self.max_user, self.num_features,
+                                      dtype=self.factor_dtype,
+                                      fill_value=self.feature_initial)
+        self.movies = allocate_factors(self.max_movie, self.num_features,
+                                       dtype=self.factor_dtype,
+                                       fill_value=self.feature_initial)
 
     def set_train_points(self, train_points):
+        train_points = get_points_array(train_points)
         self.train_points = train_points
+        self.stratified_order = None
+        self.block_offsets = None
+        self.rated_index = None
         num_train_points = train_points.shape[0] + 1
         self.residuals = np.zeros(num_train_points, dtype=np.float32)
 
+    def load_residual_cache(self):
+        if self.residual_cache_file_name is None:
+            return
+        file_path = os.path.join(MODELS_DIR_PATH,
+                                 self.residual_cache_file_name)
+        if os.path.isfile(file_path):
+            self.residual_cache = np.load(file_path)
+
+    def predict(self, test_points):
+        if not self.can_predict_in_c():
+            return Model.predict(self, test_points)
+        return c_predict(test_points, users=self.get_prediction_users(),
+                         user_offsets=self.stats.user_offsets,
+                         movies=self.movies,
+                         movie_averages=self.stats.movie_averages,
+                         num_features=self.num_features,
+                         num_threads=self.num_threads)
+
+    def recommend(self, users=None, n=10, exclude_rated=True,
+                  rated_index=None):
+        """Returns the n movies with the highest predicted rating for each
+        user, best first, and those ratings. Movies a user rated in
+        rated_index, by default a user-major PointIndex of the train points
+        built once and kept on the model, are skipped; when fewer than n remain the rest of the row
+        is movie -1 with a NaN rating."""
+        if n < 1:
+            raise ValueError('n must be at least 1, not {}'.format(n))
+        if users is None:
+            users = np.arange(self.max_user)
+        users = np.asarray(users, dtype=np.int64)
+        if exclude_rated and rated_index is None:
+            # Saved models and checkpoints do not keep their train points
+            if self.train_points is None or self.train_points.shape[0] == 0:
+                raise ValueError('{} has no train points to exclude rated '
+                                 'movies with; pass rated_index or '
+                                 'exclude_rated=False'
+                                 .format(self.__class__.__name__))
+            rated_index = self.get_rated_index()
+        user_factors = self.get_prediction_users()
+        movie_factors = np.ascontiguousarray(self.movies, dtype=np.float32)
+        num_movies = movie_factors.shape[0]
+        movie_averages = self.stats.movie_averages[:num_movies]
+        n = min(n, num_movies)
+        top_movies = np.empty((users.shape[0], n), dtype=np.int32)
+        top_ratings = np.empty((users.shape[0], n), dtype=np.float32)
+        for start in range(0, users.shape[0], RECOMMEND_BATCH_USERS):
+            batch_users = users[start:start + RECOMMEND_BATCH_USERS]
+            # One matrix product scores every movie for the whole batch
+            scores = np.dot(user_factors[batch_users].astype(np.float32),
+                            movie_factors.T)
+            scores += movie_averages
+            scores += self.stats.user_offsets[batch_users, np.newaxis]
+            if exclude_rated:
+                rated_points, positions = rated_index.gather(batch_users)
+                rated_movies = get_point_column(rated_points, MOVIE_INDEX)
+                known = rated_movies < num_movies
+                scores[positions[known], rated_movies[known]] = -np.inf
+            movies = select_top_n(scores, n)
+            ratings = np.take_along_axis(scores, movies, axis=1)
+            excluded = np.isneginf(ratings)
+            movies[excluded] = -1
+            ratings[excluded] = np.nan
+            top_movies[start:start + batch_users.shape[0]] = movies
+            top_ratings[start:start + batch_users.shape[0]] = np.clip(
+                ratings, MIN_RATING, MAX_RATING)
+        return top_movies, top_ratings
+
+    def save(self, file_name):
+        if self.residual_cache.size > 0:
+            self.residual_cache_file_name = get_residual_cache_file_name(
+                file_name)
+            np.save(os.path.join(MODELS_DIR_PATH,
+                                 self.residual_cache_file_name),
+                    self.residual_cache)
+        Model.save(self, file_name)
+
+    def select_backend(self, kernel_name):
+        if self.backend is not None:
+            return self.backend
+        if not self.run_c:
+            return 'python'
+        # Falling back to the per-point Python loop would take hours
+        if not is_kernel_available(kernel_name, 'c'):
+            raise ValueError('run_c is set but the c kernel {} is not '
+                             'available; build it with make or set run_c '
+                             'to False'.format(kernel_name))
+        return 'c'
+
     def set_stats(self, stats):
         self.stats = stats
+        # Residuals cached with other stats hold the wrong baselines
+        self.residual_cache = np.array([])
+        self.residual_fingerprint = None
 
-    def train_feature_epoch(self, train_points, stats, epochs):
+    def train_feature_epoch(self, train_points, stats, epochs,
+                            num_threads=None, callback=None):
+        if num_threads is not None:
+            self.num_threads = num_threads
         self.set_train_points(train_points)
         self.set_stats(stats)
         self.initialize_users_and_movies()
+        self.initialize_learning_state()
+        self.num_frozen_features = 0
+        self.compute_residual_cache()
         print('Training using feature-epoch order.')
-        for feature in range(self.num_features):
+        self.train_unfrozen_features(epochs, callback=callback)
+
+    def train_more_feature_epoch(self, train_points=None, epochs=1,
+                                 callback=None):
+        if train_points is not None:
+            self.set_train_points(train_points)
+        self.ensure_factor_layout()
+        self.ensure_residual_cache()
+        self.train_unfrozen_features(epochs, callback=callback)
+
+    def train_unfrozen_features(self, epochs, callback=None):
+        # callback gets the number of frozen features after each one
+        self.check_feature_order_options()
+        for feature in range(self.num_frozen_features, self.num_features):
             print('\nFeature #{}'.format(feature+1))
+            if self.learn_rate_schedule is not None:
+                self.learn_rate_schedule.reset()
             for epoch in range(epochs):
-                self.update_feature_in_c(feature)
+                self.update_cached_feature_in_c(feature)
+                self.end_epoch()
                 sys.stdout.write('=')
                 sys.stdout.flush()
                 if (np.isnan(np.sum(self.movies)) or
@@ -80,11 +382,15 @@ class SVD(Model):
                     print("So, I found a NaN..")
                     import pdb
                     pdb.set_trace()
+            self.freeze_feature(feature)
+            if callback is not None:
+                callback(self.num_frozen_features)
 
     def train(self, train_points, stats, epochs=1):
         self.set_train_points(train_points)
         self.set_stats(stats)
         self.initialize_users_and_movies()
+        self.initialize_learning_state()
         for epoch in range(epochs):
             if self.debug:
                 print('Epoch #{}'.format(epoch + 1))
@@ -96,23 +402,31 @@ class SVD(Model):
                     import pdb
                     pdb.set_trace()
             self.update_all_features()
+            self.end_epoch()
 
     def train_more(self, train_points=None, epochs=1):
         if train_points is not None:
             self.set_train_points(train_points)
+        self.ensure_factor_layout()
         for epoch in range(epochs):
             if self.debug:
                 print('Epoch #{}'.format(epoch + 1))
             self.update_all_features()
+            self.end_epoch()
 
     def update_all_features(self):
+        backend = self.select_backend('svd_update_feature')
+        self.check_c_only_options(backend)
+        self.check_feature_order_options()
         for feature in range(self.num_features):
             if self.debug:
                 print('  Feature #{}'.format(feature + 1))
-            if self.run_c:
+            if backend == 'c':
                 self.update_feature_in_c(feature)
-            else:
+            elif backend == 'python':
                 self.update_feature(feature)
+            else:
+                self.update_feature_with_kernel(feature, backend)
             if np.isnan(np.sum(self.movies)) or np.isnan(np.sum(self.users)):
                 print('So, I found a NaN after updating feature {}..'
                       .format(feature))
@@ -149,7 +463,23 @@ class SVD(Model):
             error = self.calculate_prediction_error(user, movie, rating)
             self.update_user_and_movie(user, movie, feature, error)
 
+    def update_cached_feature_in_c(self, feature):
+        order, block_offsets = None, None
+        if self.num_threads > 1:
+            order, block_offsets = self.get_stratified_order()
+        c_svd_update_cached_feature(
+            train_points=self.train_points, users=self.users,
+            movies=self.movies, residual_cache=self.residual_cache,
+            feature=feature, num_features=self.num_features,
+            learn_rate=self.get_epoch_learn_rate(), k_factor=self.k_factor,
+            order=order, block_offsets=block_offsets,
+            num_blocks=self.num_threads, num_threads=self.num_threads,
+            **self.get_adaptive_arguments())
+
     def update_feature_in_c(self, feature):
+        if self.num_threads > 1:
+            self.update_feature_stratified_in_c(feature)
+            return
         c_svd_update_feature(train_points=self.train_points,
                              users=self.users,
                              user_offsets=self.stats.user_offsets,
@@ -157,14 +487,59 @@ class SVD(Model):
                              movie_averages=self.stats.movie_averages,
                              residuals=self.residuals, feature=feature,
                              num_features=self.num_features,
-                             learn_rate=self.learn_rate, k_factor=self.k_factor)
+                             learn_rate=self.get_epoch_learn_rate(),
+                             k_factor=self.k_factor,
+                             **self.get_adaptive_arguments())
+
+    def update_feature_stratified_in_c(self, feature):
+        order, block_offsets = self.get_stratified_order()
+        c_svd_update_feature_stratified(
+            train_points=self.train_points, order=order,
+            block_offsets=block_offsets, num_blocks=self.num_threads,
+            users=self.users, user_offsets=self.stats.user_offsets,
+            movies=self.movies, movie_averages=self.stats.movie_averages,
+            residuals=self.residuals, feature=feature,
+            num_features=self.num_features,
+            learn_rate=self.get_epoch_learn_rate(), k_factor=self.k_factor,
+            num_threads=self.num_threads, **self.get_adaptive_arguments())
+
+    def update_feature_with_kernel(self, feature, backend):
+        _, update_feature = get_kernel('svd_update_feature',
+                                       backends=(backend,))
+        update_feature(train_points=self.train_points, users=self.users,
+                       user_offsets=self.stats.user_offsets,
+                       movies=self.movies,
+                       movie_averages=self.stats.movie_averages,
+                       residuals=self.residuals, feature=feature,
+                       num_features=self.num_features,
+                       learn_rate=self.get_epoch_learn_rate(),
+                       k_factor=self.k_factor)
 
     def update_user_and_movie(self, user, movie, feature, error):
-        user_change = (self.learn_rate *
+        learn_rate = self.get_epoch_learn_rate()
+        user_change = (learn_rate *
                        (error * self.movies[movie, feature] -
                         self.k_factor * self.users[user, feature]))
-        movie_change = (self.learn_rate *
+        movie_change = (learn_rate *
                         (error * self.users[user, feature] -
                          self.k_factor * self.movies[movie, feature]))
         self.users[user, feature] += user_change
         self.movies[movie, feature] += movie_change
+
+
+def get_residual_cache_file_name(model_file_name):
+    return os.path.splitext(model_file_name)[0] + '_residuals.npy'
+
+
+def select_top_n(scores, n):
+    """Returns the columns of the n highest scores of every row, highest
+    first, sorting only those n after a partial selection"""
+    num_columns = scores.shape[1]
+    if n < num_columns:
+        columns = np.argpartition(scores, num_columns - n,
+                                  axis=1)[:, num_columns - n:]
+    else:
+        columns = np.tile(np.arange(num_columns), (scores.shape[0], 1))
+    order = np.argsort(-np.take_along_axis(scores, columns, axis=1), axis=1,
+                       kind='stable')
+    return np.take_along_axis(columns, order, axis=1)
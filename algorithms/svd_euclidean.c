@@ -1,56 +1,184 @@
+#include <pthread.h>
 #include <stdio.h>
+#include <stdlib.h>
+#include "adaptive.h"
+#include "factors.h"
+#include "points.h"
 
-int c_train_epoch(int *train_points, int num_points, float *users, float *user_offsets,
-        int num_users, float *movies, float* movie_averages, int num_movies,
-        float learn_rate, int num_features, float k_factor)
+/* Arguments shared by every worker, plus the slice of points it owns */
+typedef struct {
+    void *train_points;
+    int point_format;
+    const int *order;
+    int start;
+    int stop;
+    void *users;
+    float *user_offsets;
+    void *movies;
+    float *movie_averages;
+    float learn_rate;
+    int num_features;
+    float k_factor;
+    adaptive_rates rates;
+    int factor_format;
+    int user_stride;
+    int movie_stride;
+} epoch_slice;
+
+/* Plain SGD on float32 rows: no loads through the storage format and no
+ * per-feature branches, so the loop vectorizes */
+static void update_float_rows(float *restrict user_values, float *restrict movie_values,
+        int num_features, float learn_rate, float k_factor, float error)
+{
+    int f;
+    float user_value, movie_value;
+
+    for (f = 0; f < num_features; f++) {
+        user_value = user_values[f];
+        movie_value = movie_values[f];
+        user_values[f] = user_value + learn_rate * (error * movie_value - k_factor * user_value);
+        movie_values[f] = movie_value + learn_rate * (error * user_value - k_factor * movie_value);
+    }
+}
+
+static void train_slice(const epoch_slice *slice)
 {
 
 	int p, f;
 	float prediction;
-	float *user_features_cursor, *movie_features_cursor;
+	long user_factors, movie_factors, user_rates, movie_rates;
+	float user_value, movie_value;
 	float error, user_change, movie_change;
-	int *train_cursor = train_points;
 	int user_id, movie_id, time, rating;
+	int num_features = slice->num_features;
+	int factor_format = slice->factor_format;
+	float learn_rate = slice->learn_rate;
+	float k_factor = slice->k_factor;
+	int plain_float = factor_format == FACTOR_FORMAT_FLOAT32 &&
+	    slice->rates.mode == ADAPTIVE_NONE;
 
-	for(p = 0; p < num_points; p++) {
+	for(p = slice->start; p < slice->stop; p++) {
 	    // get user id's locally
-        //user_id = train_points[p*4];
-        //movie_id = train_points[p*4+1];
-        //rating = train_points[p*4+3];
-		user_id    = *(train_cursor++);
-		movie_id   = *(train_cursor++);
-		time       = *(train_cursor++);
-		rating     = *(train_cursor++);
-        // Calculate the prediction error:
-        // start prediction at baseline:
-        prediction = movie_averages[movie_id] + user_offsets[user_id];
-        // then: add features dot product to prediction
-        user_features_cursor = users + user_id * num_features;
-        movie_features_cursor = movies + movie_id * num_features;
-        for (f = 0; f < num_features; f++) {
-            prediction += user_features_cursor[f] * movie_features_cursor[f];
-            if (prediction > 5) {
-                prediction = 5.0;
-            } else if (prediction < 1) {
-                prediction = 1.0;
-            }
+		read_point(slice->train_points, slice->point_format,
+		           slice->order != NULL ? slice->order[p] : p,
+		           &user_id, &movie_id, &time, &rating);
+        user_factors = (long) user_id * slice->user_stride;
+        movie_factors = (long) movie_id * slice->movie_stride;
+        // Calculate the prediction error: baseline plus the features dot
+        // product, clipped once like SVD.calculate_predictions
+        prediction = slice->movie_averages[movie_id] + slice->user_offsets[user_id] +
+            dot_factors(slice->users, slice->movies, factor_format, user_factors,
+                        movie_factors, num_features);
+        if (prediction > 5) {
+            prediction = 5.0;
+        } else if (prediction < 1) {
+            prediction = 1.0;
         }
 
         // Calculate error:
         error = ((float) rating) - prediction;
 
         // Update the features
-        // reset feature cursors
+        // Other workers may write the same rows concurrently (Hogwild);
+        // lost updates are rare on sparse ratings and are tolerated.
+        if (plain_float) {
+            update_float_rows((float *) slice->users + user_factors,
+                              (float *) slice->movies + movie_factors,
+                              num_features, learn_rate, k_factor, error);
+            continue;
+        }
+        // Accumulators are packed, without the factor rows' padding
+        user_rates = (long) user_id * num_features;
+        movie_rates = (long) movie_id * num_features;
         for (f = 0; f < num_features; f++) {
-            user_change = learn_rate * (error * movie_features_cursor[f] 
-                - k_factor * user_features_cursor[f]);
-            movie_features_cursor[f] += learn_rate * (error * user_features_cursor[f] 
-                - k_factor * movie_features_cursor[f]);
-            user_features_cursor[f] += user_change;
+            user_value = load_factor(slice->users, factor_format, user_factors + f);
+            movie_value = load_factor(slice->movies, factor_format, movie_factors + f);
+            user_change = adaptive_step(&slice->rates,
+                slice->rates.user_accumulators, user_rates + f, learn_rate,
+                error * movie_value - k_factor * user_value);
+            movie_change = adaptive_step(&slice->rates,
+                slice->rates.movie_accumulators, movie_rates + f, learn_rate,
+                error * user_value - k_factor * movie_value);
+            store_factor(slice->movies, factor_format, movie_factors + f, movie_value + movie_change);
+            store_factor(slice->users, factor_format, user_factors + f, user_value + user_change);
         }
 
 	}
-    return 0;
 }
 
+static void *train_slice_worker(void *slice)
+{
+    train_slice((const epoch_slice *) slice);
+    return NULL;
+}
+
+/* Trains points order[0], order[1], ... when order is given, else in file
+ * order; each worker takes a contiguous range of the order */
+int c_train_epoch(void *train_points, int point_format, int num_points, int *order, void *users, float *user_offsets,
+        int num_users, void *movies, float* movie_averages, int num_movies,
+        float learn_rate, int num_features, float k_factor, int adaptive_mode,
+        float adaptive_decay, float *user_accumulators, float *movie_accumulators,
+        int num_threads, int factor_format, int user_stride, int movie_stride)
+{
+    int t;
+    int num_started = 0;
+    epoch_slice *slices;
+    pthread_t *threads;
 
+    if (num_threads < 1) {
+        num_threads = 1;
+    }
+    if (num_threads > num_points) {
+        num_threads = num_points > 0 ? num_points : 1;
+    }
+    slices = malloc(num_threads * sizeof(epoch_slice));
+    threads = malloc(num_threads * sizeof(pthread_t));
+    if (slices == NULL || threads == NULL) {
+        free(slices);
+        free(threads);
+        return 1;
+    }
+    for (t = 0; t < num_threads; t++) {
+        slices[t].train_points = train_points;
+        slices[t].point_format = point_format;
+        slices[t].order = order;
+        slices[t].start = (int) ((long) num_points * t / num_threads);
+        slices[t].stop = (int) ((long) num_points * (t + 1) / num_threads);
+        slices[t].users = users;
+        slices[t].user_offsets = user_offsets;
+        slices[t].movies = movies;
+        slices[t].movie_averages = movie_averages;
+        slices[t].learn_rate = learn_rate;
+        slices[t].num_features = num_features;
+        slices[t].k_factor = k_factor;
+        slices[t].rates.mode = adaptive_mode;
+        slices[t].rates.decay = adaptive_decay;
+        slices[t].rates.user_accumulators = user_accumulators;
+        slices[t].rates.movie_accumulators = movie_accumulators;
+        slices[t].factor_format = factor_format;
+        slices[t].user_stride = user_stride;
+        slices[t].movie_stride = movie_stride;
+    }
+    if (num_threads == 1) {
+        train_slice(&slices[0]);
+    } else {
+        /* Slice 0 runs on the calling thread */
+        for (t = 1; t < num_threads; t++) {
+            if (pthread_create(&threads[t], NULL, train_slice_worker, &slices[t]) != 0) {
+                break;
+            }
+            num_started = t;
+        }
+        train_slice(&slices[0]);
+        for (t = 1; t <= num_started; t++) {
+            pthread_join(threads[t], NULL);
+        }
+        /* Finish any slices whose thread could not be started */
+        for (t = num_started + 1; t < num_threads; t++) {
+            train_slice(&slices[t]);
+        }
+    }
+    free(slices);
+    free(threads);
+    return 0;
+}
@@ -4,6 +4,7 @@ import sys
 
 from algorithms.svd import SVD
 from utils.data_io import get_user_movie_time_rating
+from utils.factor_layout import allocate_factors
 import utils.c_interface
 
 
@@ -12,19 +13,24 @@ class SVDEuclidean(SVD):
         self.max_user = self.calculate_max_user()
         self.max_movie = self.calculate_max_movie()
         np.random.seed()
-        self.users = np.array(
-            np.random.normal(loc=0.0, scale=self.feature_initial,
-                             size=(self.max_user, self.num_features)),
-            dtype=np.float32)
-        self.movies = np.array(
-            np.random.normal(loc=0.0, scale=self.feature_initial,
-                             size=(self.max_movie, self.num_features)),
-            dtype=np.float32)
+        self.users = allocate_factors(self.max_user, self.num_features,
+                                      dtype=self.factor_dtype)
+        self.users[:] = np.random.normal(
+            loc=0.0, scale=self.feature_initial,
+            size=(self.max_user, self.num_features))
+        self.movies = allocate_factors(self.max_movie, self.num_features,
+                                       dtype=self.factor_dtype)
+        self.movies[:] = np.random.normal(
+            loc=0.0, scale=self.feature_initial,
+            size=(self.max_movie, self.num_features))
 
-    def train(self, train_points, stats, epochs=1):
+    def train(self, train_points, stats, epochs=1, num_threads=None):
+        if num_threads is not None:
+            self.num_threads = num_threads
         self.set_train_points(train_points=train_points)
         self.set_stats(stats=stats)
         self.initialize_users_and_movies()
+        self.initialize_learning_state()
         for epoch in range(epochs):
             if self.debug:
                 print('Epoch {}'.format(epoch+1))
@@ -34,32 +40,45 @@ class SVDEuclidean(SVD):
                 print("So, I found a NaN..")
                 import pdb
                 pdb.set_trace()
-            if self.run_c:
-                self.train_epoch_in_c()
-            else:
-                self.train_epoch()
+            self.run_epoch()
+            self.end_epoch()
 
-    def train_more(self, train_points=None, epochs=1):
+    def train_more(self, train_points=None, epochs=1, num_threads=None):
+        if num_threads is not None:
+            self.num_threads = num_threads
         if train_points is not None:
             self.set_train_points(train_points)
+        self.ensure_factor_layout()
         for epoch in range(epochs):
-            if self.run_c:
-                self.train_epoch_in_c()
-            else:
-                self.train_epoch()
+            self.run_epoch()
+            self.end_epoch()
 
-    def train_epoch(self):
+    def run_epoch(self):
+        backend = self.select_backend('svd_euclidean_train_epoch')
+        self.check_c_only_options(backend)
+        order = self.get_epoch_order()
+        if backend == 'c':
+            self.train_epoch_in_c(order=order)
+        elif backend == 'python':
+            self.train_epoch(order=order)
+        else:
+            self.train_epoch_with_kernel(backend, order=order)
+
+    def train_epoch(self, order=None):
         count = 0
-        for train_point in self.train_points:
+        if order is None:
+            order = range(self.train_points.shape[0])
+        for index in order:
             count += 1
             if count % 100000 == 0:
                 sys.stdout.write('.')
                 sys.stdout.flush()
-            user, movie, _, rating = get_user_movie_time_rating(train_point)
+            user, movie, _, rating = get_user_movie_time_rating(
+                self.train_points[index])
             self.update_euclidean_all_features(user=user, movie=movie,
                                                rating=rating)
 
-    def train_epoch_in_c(self):
+    def train_epoch_in_c(self, order=None):
         utils.c_interface.c_svd_euclidean_train_epoch(
             train_points=self.train_points,
             users=self.users,
@@ -67,10 +86,24 @@ class SVDEuclidean(SVD):
             movies=self.movies,
             movie_averages=self.stats.movie_averages,
             num_features=self.num_features,
-            learn_rate=self.learn_rate,
-            k_factor=self.k_factor
+            learn_rate=self.get_epoch_learn_rate(),
+            k_factor=self.k_factor,
+            num_threads=self.num_threads,
+            order=order,
+            **self.get_adaptive_arguments()
         )
 
+    def train_epoch_with_kernel(self, backend, order=None):
+        _, train_epoch = utils.c_interface.get_kernel(
+            'svd_euclidean_train_epoch', backends=(backend,))
+        train_epoch(train_points=self.train_points, users=self.users,
+                    user_offsets=self.stats.user_offsets, movies=self.movies,
+                    movie_averages=self.stats.movie_averages,
+                    num_features=self.num_features,
+                    learn_rate=self.get_epoch_learn_rate(),
+                    k_factor=self.k_factor, num_threads=self.num_threads,
+                    order=order)
+
     def update_euclidean_all_features(self, user, movie, rating):
         prediction_error = self.calculate_prediction_error(user=user,
                                                            movie=movie,
@@ -0,0 +1,166 @@
+#include <math.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include "points.h"
+
+/* Optional time effects of timeSVD++, all precomputed per point (indexed by
+ * the point's row in train_points) so no dates are handled here */
+typedef struct {
+    const short *time_bins;       /* item time bin of each point */
+    const int *day_ids;           /* user-day id of each point, -1 if unknown */
+    const float *deviations;      /* dev_u(t) of each point */
+    float *item_bin_biases;       /* num_movies x num_bins */
+    int num_bins;
+    float *user_alphas;           /* user drift coefficient */
+    float *user_day_biases;       /* one per user-day id */
+    float bias_learn_rate;
+    float drift_learn_rate;
+    float bias_k_factor;
+} time_effects;
+
+/* One SVD++ epoch over points grouped by user. user_point_offsets[u] to
+ * user_point_offsets[u + 1] are the positions of user u's ratings, read
+ * through order when it is not NULL. implicit_movies[implicit_offsets[u]]
+ * onwards lists N(u), the movies user u is known to have rated.
+ *
+ * The normalized implicit sum |N(u)|^-1/2 sum y_j is built once per user and
+ * held fixed while the user's ratings are trained; the y gradients are
+ * accumulated and applied to every y_j in N(u) once, after the user. */
+static int train_users(void *train_points, int point_format, int *order,
+        long long *user_point_offsets, int num_users, int *implicit_movies,
+        long long *implicit_offsets, float *users, float *user_offsets, float *movies,
+        float *movie_averages, float *implicit_factors, float learn_rate,
+        int num_features, float k_factor, const time_effects *time_effect)
+{
+    int u, f, user_id, movie_id, time, rating, day;
+    long long q, j, p;
+    float norm, prediction, error, user_value, movie_value;
+    float deviation, day_bias, *bin_bias;
+    float *user_features, *movie_features, *implicit_features;
+    float *effective_user, *y_gradient;
+
+    effective_user = malloc(num_features * sizeof(float));
+    y_gradient = malloc(num_features * sizeof(float));
+    if (effective_user == NULL || y_gradient == NULL) {
+        free(effective_user);
+        free(y_gradient);
+        return 1;
+    }
+    for (u = 0; u < num_users; u++) {
+        if (user_point_offsets[u] == user_point_offsets[u + 1]) {
+            continue;
+        }
+        user_features = users + (long) u * num_features;
+        /* Cache p_u + |N(u)|^-1/2 sum y_j for the whole user */
+        norm = 0;
+        if (implicit_offsets[u + 1] > implicit_offsets[u]) {
+            norm = 1.0f / sqrtf((float) (implicit_offsets[u + 1] - implicit_offsets[u]));
+        }
+        for (f = 0; f < num_features; f++) {
+            effective_user[f] = 0;
+            y_gradient[f] = 0;
+        }
+        for (j = implicit_offsets[u]; j < implicit_offsets[u + 1]; j++) {
+            implicit_features = implicit_factors + (long) implicit_movies[j] * num_features;
+            for (f = 0; f < num_features; f++) {
+                effective_user[f] += implicit_features[f];
+            }
+        }
+        for (f = 0; f < num_features; f++) {
+            effective_user[f] = user_features[f] + norm * effective_user[f];
+        }
+
+        for (q = user_point_offsets[u]; q < user_point_offsets[u + 1]; q++) {
+            p = order != NULL ? order[q] : q;
+            read_point(train_points, point_format, p, &user_id, &movie_id, &time, &rating);
+            movie_features = movies + (long) movie_id * num_features;
+
+            prediction = movie_averages[movie_id] + user_offsets[user_id];
+            if (time_effect != NULL) {
+                bin_bias = time_effect->item_bin_biases
+                    + (long) movie_id * time_effect->num_bins + time_effect->time_bins[p];
+                day = time_effect->day_ids[p];
+                day_bias = day >= 0 ? time_effect->user_day_biases[day] : 0;
+                deviation = time_effect->deviations[p];
+                prediction += *bin_bias + day_bias
+                    + time_effect->user_alphas[user_id] * deviation;
+            }
+            for (f = 0; f < num_features; f++) {
+                prediction += effective_user[f] * movie_features[f];
+            }
+            if (prediction > 5) {
+                prediction = 5;
+            } else if (prediction < 1) {
+                prediction = 1;
+            }
+            error = ((float) rating) - prediction;
+
+            if (time_effect != NULL) {
+                *bin_bias += time_effect->bias_learn_rate
+                    * (error - time_effect->bias_k_factor * *bin_bias);
+                time_effect->user_alphas[user_id] += time_effect->drift_learn_rate
+                    * (error * deviation
+                       - time_effect->bias_k_factor * time_effect->user_alphas[user_id]);
+                if (day >= 0) {
+                    time_effect->user_day_biases[day] += time_effect->bias_learn_rate
+                        * (error - time_effect->bias_k_factor * day_bias);
+                }
+            }
+
+            for (f = 0; f < num_features; f++) {
+                user_value = user_features[f];
+                movie_value = movie_features[f];
+                user_features[f] += learn_rate * (error * movie_value - k_factor * user_value);
+                movie_features[f] += learn_rate * (error * effective_user[f] - k_factor * movie_value);
+                effective_user[f] += user_features[f] - user_value;
+                y_gradient[f] += error * movie_value;
+            }
+        }
+
+        /* Apply the accumulated implicit gradient once per user */
+        for (j = implicit_offsets[u]; j < implicit_offsets[u + 1]; j++) {
+            implicit_features = implicit_factors + (long) implicit_movies[j] * num_features;
+            for (f = 0; f < num_features; f++) {
+                implicit_features[f] += learn_rate * (norm * y_gradient[f]
+                    - k_factor * implicit_features[f]);
+            }
+        }
+    }
+    free(effective_user);
+    free(y_gradient);
+    return 0;
+}
+
+int c_train_epoch_plus_plus(void *train_points, int point_format, int num_points,
+        int *order, long long *user_point_offsets, int num_users,
+        int *implicit_movies, long long *implicit_offsets, float *users,
+        float *user_offsets, float *movies, float *movie_averages, int num_movies,
+        float *implicit_factors, float learn_rate, int num_features, float k_factor)
+{
+    return train_users(train_points, point_format, order, user_point_offsets,
+                       num_users, implicit_movies, implicit_offsets, users,
+                       user_offsets, movies, movie_averages, implicit_factors,
+                       learn_rate, num_features, k_factor, NULL);
+}
+
+/* timeSVD++: the SVD++ epoch plus item time-bin biases, user drift
+ * alpha_u * dev_u(t) and per-user-day biases */
+int c_train_epoch_time_plus_plus(void *train_points, int point_format, int num_points,
+        int *order, long long *user_point_offsets, int num_users,
+        int *implicit_movies, long long *implicit_offsets, float *users,
+        float *user_offsets, float *movies, float *movie_averages, int num_movies,
+        float *implicit_factors, short *time_bins, int *day_ids, float *deviations,
+        float *item_bin_biases, int num_bins, float *user_alphas,
+        float *user_day_biases, float learn_rate, float bias_learn_rate,
+        float drift_learn_rate, int num_features, float k_factor,
+        float bias_k_factor)
+{
+    time_effects time_effect = {time_bins, day_ids, deviations, item_bin_biases,
+                                num_bins, user_alphas, user_day_biases,
+                                bias_learn_rate, drift_learn_rate, bias_k_factor};
+
+    return train_users(train_points, point_format, order, user_point_offsets,
+                       num_users, implicit_movies, implicit_offsets, users,
+                       user_offsets, movies, movie_averages, implicit_factors,
+                       learn_rate, num_features, k_factor, &time_effect);
+}
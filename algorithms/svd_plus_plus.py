@@ -0,0 +1,183 @@
+from __future__ import print_function
+import numpy as np
+
+from algorithms.svd import SVD
+from utils.c_interface import c_svd_plus_plus_train_epoch
+from utils.constants import (MAX_RATING, MIN_RATING, MOVIE_INDEX,
+                             PREDICT_CHUNK_SIZE, SVD_FEATURE_VALUE_INITIAL,
+                             USER_INDEX)
+from utils.data_indexes import compute_index_offsets, split_id_batches
+from utils.data_io import get_point_column
+from utils.dataset import get_points_array
+
+
+class SVDPlusPlus(SVD):
+    def __init__(self, learn_rate=0.001, num_features=3,
+                 feature_initial=SVD_FEATURE_VALUE_INITIAL, k_factor=0.02):
+        SVD.__init__(self, learn_rate=learn_rate, num_features=num_features,
+                     feature_initial=feature_initial, k_factor=k_factor)
+        self.implicit_factors = np.array([])
+        self.effective_users = np.array([])
+        self.implicit_points = None
+        self.implicit_movies = None
+        self.implicit_offsets = None
+        self.user_order = None
+        self.user_point_offsets = None
+
+    def __getstate__(self):
+        # Point-sized groupings are rebuilt from the points when training
+        state = SVD.__getstate__(self)
+        for name in ('implicit_points', 'implicit_movies', 'implicit_offsets',
+                     'user_order', 'user_point_offsets'):
+            state[name] = None
+        return state
+
+    def build_implicit_feedback(self):
+        users = get_point_column(self.train_points, USER_INDEX)
+        movies = get_point_column(self.train_points, MOVIE_INDEX)
+        if self.implicit_points is not None:
+            implicit_users = get_point_column(self.implicit_points, USER_INDEX)
+            implicit_movies = get_point_column(self.implicit_points,
+                                               MOVIE_INDEX)
+            known = ((implicit_users < self.max_user) &
+                     (implicit_movies < self.max_movie))
+            users = np.concatenate((users, implicit_users[known]))
+            movies = np.concatenate((movies, implicit_movies[known]))
+        order = np.argsort(users, kind='mergesort')
+        self.implicit_movies = movies[order].astype(np.int32)
+        self.implicit_offsets = compute_index_offsets(users[order],
+                                                      num_ids=self.max_user)
+
+    def calculate_prediction(self, user, movie):
+        return self.stats.get_baseline(user=user, movie=movie) + np.dot(
+            self.effective_users[user, :], self.movies[movie, :])
+
+    def calculate_predictions(self, users, movies):
+        factor_products = np.einsum('ij,ij->i', self.effective_users[users, :],
+                                    self.movies[movies, :])
+        predictions = (self.stats.get_baselines(users=users, movies=movies) +
+                       factor_products)
+        return np.clip(predictions, MIN_RATING, MAX_RATING)
+
+    def check_supported_options(self):
+        # The SVD++ kernels use a constant learn rate on float32 factors
+        unsupported = [name for name in ('adaptive_method',
+                                         'learn_rate_schedule',
+                                         'training_order')
+                       if getattr(self, name) is not None]
+        if self.factor_dtype != 'float32':
+            unsupported.append('factor_dtype')
+        if unsupported:
+            raise ValueError('{} does not support {}'.format(
+                self.__class__.__name__, ', '.join(unsupported)))
+
+    def compute_effective_users(self):
+        offsets = self.implicit_offsets
+        counts = np.diff(offsets)
+        norms = np.zeros(counts.shape[0])
+        norms[counts > 0] = 1 / np.sqrt(counts[counts > 0])
+        effective_users = np.copy(self.users)
+        for start_id, stop_id in split_id_batches(offsets, PREDICT_CHUNK_SIZE):
+            implicit_rows = self.implicit_factors[
+                self.implicit_movies[offsets[start_id]:offsets[stop_id]]]
+            row_sums = np.zeros((implicit_rows.shape[0] + 1,
+                                 self.num_features))
+            np.cumsum(implicit_rows, axis=0, out=row_sums[1:])
+            local_offsets = offsets[start_id:stop_id + 1] - offsets[start_id]
+            effective_users[start_id:stop_id] += (
+                norms[start_id:stop_id, None] *
+                (row_sums[local_offsets[1:]] - row_sums[local_offsets[:-1]]))
+        self.effective_users = effective_users
+
+    def get_parameter_names(self):
+        return SVD.get_parameter_names(self) + ('implicit_factors',
+                                                'effective_users')
+
+    def get_prediction_users(self):
+        return self.effective_users
+
+    def initialize_users_and_movies(self):
+        self.max_user = self.calculate_max_user()
+        self.max_movie = self.calculate_max_movie()
+        np.random.seed()
+        self.users = np.array(
+            np.random.normal(loc=0.0, scale=self.feature_initial,
+                             size=(self.max_user, self.num_features)),
+            dtype=np.float32)
+        self.movies = np.array(
+            np.random.normal(loc=0.0, scale=self.feature_initial,
+                             size=(self.max_movie, self.num_features)),
+            dtype=np.float32)
+        self.implicit_factors = np.zeros((self.max_movie, self.num_features),
+                                         dtype=np.float32)
+        self.build_implicit_feedback()
+        self.compute_effective_users()
+
+    def set_implicit_points(self, implicit_points):
+        self.implicit_points = get_points_array(implicit_points)
+        self.implicit_movies = None
+
+    def set_train_points(self, train_points):
+        SVD.set_train_points(self, train_points)
+        users = get_point_column(self.train_points, USER_INDEX)
+        if np.all(users[1:] >= users[:-1]):
+            self.user_order = None
+            sorted_users = users
+        else:
+            self.user_order = np.argsort(users, kind='mergesort').astype(
+                np.int32)
+            sorted_users = users[self.user_order]
+        self.user_point_offsets = compute_index_offsets(
+            sorted_users, num_ids=self.max_user or None)
+        self.implicit_movies = None
+
+    def train(self, train_points, stats, epochs=1):
+        self.check_supported_options()
+        self.max_user = 0
+        self.max_movie = 0
+        self.set_train_points(train_points)
+        self.set_stats(stats)
+        self.initialize_users_and_movies()
+        self.initialize_learning_state()
+        self.train_more(epochs=epochs)
+
+    def train_feature_epoch(self, train_points, stats, epochs,
+                            num_threads=None, callback=None):
+        self.reject_feature_epoch()
+
+    def train_more_feature_epoch(self, train_points=None, epochs=1,
+                                 callback=None):
+        self.reject_feature_epoch()
+
+    def reject_feature_epoch(self):
+        # The SVD feature path skips the implicit terms and effective_users
+        raise ValueError('{} trains whole epochs only; feature-epoch '
+                         'training is not supported'
+                         .format(self.__class__.__name__))
+
+    def train_more(self, train_points=None, epochs=1):
+        self.check_supported_options()
+        if train_points is not None:
+            self.set_train_points(train_points)
+        if self.user_point_offsets is None:
+            self.set_train_points(self.train_points)
+        if self.implicit_movies is None:
+            self.build_implicit_feedback()
+        for epoch in range(epochs):
+            if self.debug:
+                print('Epoch #{}'.format(epoch + 1))
+            self.train_epoch_in_c()
+            self.end_epoch()
+        self.compute_effective_users()
+
+    def train_epoch_in_c(self):
+        c_svd_plus_plus_train_epoch(
+            train_points=self.train_points, order=self.user_order,
+            user_point_offsets=self.user_point_offsets,
+            implicit_movies=self.implicit_movies,
+            implicit_offsets=self.implicit_offsets, users=self.users,
+            user_offsets=self.stats.user_offsets, movies=self.movies,
+            movie_averages=self.stats.movie_averages,
+            implicit_factors=self.implicit_factors,
+            num_features=self.num_features, learn_rate=self.learn_rate,
+            k_factor=self.k_factor)
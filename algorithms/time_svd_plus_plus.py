@@ -0,0 +1,128 @@
+from __future__ import print_function
+import numpy as np
+
+from algorithms.svd_plus_plus import SVDPlusPlus
+from utils.c_interface import c_time_svd_plus_plus_train_epoch
+from utils.constants import (MAX_RATING, MIN_RATING, MOVIE_INDEX,
+                             NUM_TIME_BINS, SVD_FEATURE_VALUE_INITIAL,
+                             TIME_INDEX, USER_INDEX)
+from utils.data_io import get_point_column
+from utils.data_time import (compute_day_ids, compute_day_keys,
+                             compute_time_bins, compute_time_deviations,
+                             compute_time_features, compute_user_mean_times)
+
+
+class TimeSVDPlusPlus(SVDPlusPlus):
+    def __init__(self, learn_rate=0.001, num_features=3,
+                 feature_initial=SVD_FEATURE_VALUE_INITIAL, k_factor=0.02,
+                 bias_learn_rate=0.005, drift_learn_rate=0.00001,
+                 bias_k_factor=0.005):
+        SVDPlusPlus.__init__(self, learn_rate=learn_rate,
+                             num_features=num_features,
+                             feature_initial=feature_initial,
+                             k_factor=k_factor)
+        self.bias_learn_rate = bias_learn_rate
+        self.drift_learn_rate = drift_learn_rate
+        self.bias_k_factor = bias_k_factor
+        self.item_bin_biases = np.array([])
+        self.user_alphas = np.array([])
+        self.user_day_biases = np.array([])
+        self.day_keys = None
+        self.user_mean_times = None
+        self.time_features = None
+
+    def __getstate__(self):
+        state = SVDPlusPlus.__getstate__(self)
+        state['time_features'] = None
+        return state
+
+    def can_predict_in_c(self):
+        # The native predict kernel has no time terms
+        return False
+
+    def calculate_time_biases(self, users, movies, times):
+        bins = compute_time_bins(times)
+        days = compute_day_ids(users, times, self.day_keys)
+        deviations = compute_time_deviations(users, times,
+                                             self.user_mean_times)
+        known_users = users < self.user_alphas.shape[0]
+        drifts = np.zeros(users.shape[0], dtype=np.float32)
+        drifts[known_users] = (self.user_alphas[users[known_users]] *
+                               deviations[known_users])
+        day_biases = np.zeros(users.shape[0], dtype=np.float32)
+        day_biases[days >= 0] = self.user_day_biases[days[days >= 0]]
+        return self.item_bin_biases[movies, bins] + drifts + day_biases
+
+    def ensure_time_features(self):
+        if self.day_keys is None:
+            self.day_keys = compute_day_keys(self.train_points)
+            self.user_mean_times = compute_user_mean_times(
+                self.train_points, num_users=self.max_user)
+        if (self.time_features is None or
+                len(self.time_features) != self.train_points.shape[0]):
+            self.time_features = compute_time_features(
+                self.train_points, day_keys=self.day_keys,
+                user_mean_times=self.user_mean_times)
+
+    def get_parameter_names(self):
+        return SVDPlusPlus.get_parameter_names(self) + (
+            'item_bin_biases', 'user_alphas', 'user_day_biases')
+
+    def initialize_users_and_movies(self):
+        SVDPlusPlus.initialize_users_and_movies(self)
+        self.ensure_time_features()
+        self.item_bin_biases = np.zeros((self.max_movie, NUM_TIME_BINS),
+                                        dtype=np.float32)
+        self.user_alphas = np.zeros(self.max_user, dtype=np.float32)
+        self.user_day_biases = np.zeros(self.day_keys.shape[0],
+                                        dtype=np.float32)
+
+    def predict_chunk(self, chunk):
+        users = get_point_column(chunk, USER_INDEX)
+        movies = get_point_column(chunk, MOVIE_INDEX)
+        times = get_point_column(chunk, TIME_INDEX)
+        factor_products = np.einsum('ij,ij->i', self.effective_users[users, :],
+                                    self.movies[movies, :])
+        predictions = (self.stats.get_baselines(users=users, movies=movies) +
+                       self.calculate_time_biases(users, movies, times) +
+                       factor_products)
+        return np.clip(predictions, MIN_RATING, MAX_RATING)
+
+    def set_time_features(self, time_features, day_keys, user_mean_times):
+        self.time_features = time_features
+        self.day_keys = day_keys
+        self.user_mean_times = user_mean_times
+
+    def train(self, train_points, stats, epochs=1):
+        self.check_supported_options()
+        if self.time_features is None:
+            self.day_keys = None
+            self.user_mean_times = None
+        SVDPlusPlus.train(self, train_points=train_points, stats=stats,
+                          epochs=epochs)
+
+    def train_more(self, train_points=None, epochs=1):
+        self.check_supported_options()
+        if train_points is not None:
+            self.set_train_points(train_points)
+            self.time_features = None
+        self.ensure_time_features()
+        SVDPlusPlus.train_more(self, epochs=epochs)
+
+    def train_epoch_in_c(self):
+        c_time_svd_plus_plus_train_epoch(
+            train_points=self.train_points, order=self.user_order,
+            user_point_offsets=self.user_point_offsets,
+            implicit_movies=self.implicit_movies,
+            implicit_offsets=self.implicit_offsets, users=self.users,
+            user_offsets=self.stats.user_offsets, movies=self.movies,
+            movie_averages=self.stats.movie_averages,
+            implicit_factors=self.implicit_factors,
+            time_features=self.time_features,
+            item_bin_biases=self.item_bin_biases,
+            user_alphas=self.user_alphas,
+            user_day_biases=self.user_day_biases,
+            num_features=self.num_features, learn_rate=self.learn_rate,
+            bias_learn_rate=self.bias_learn_rate,
+            drift_learn_rate=self.drift_learn_rate, k_factor=self.k_factor,
+            bias_k_factor=self.bias_k_factor)
@@ -63,14 +63,23 @@ def get_points(rmse_file_paths):
     for rmse_file_path in rmse_file_paths:
         result = Result(rmse_file_path)
         with open(rmse_file_path) as rmse_file:
-            for epoch, line in enumerate(rmse_file):
-                points.append(Point(epoch=epoch + 1,
+            for line_number, line in enumerate(rmse_file):
+                epoch, rmse = parse_rmse_line(line, line_number)
+                points.append(Point(epoch=epoch,
                                     feature=result.info.num_features,
                                     learn_rate=result.info.learn_rate,
-                                    rmse=float(line.strip())))
+                                    rmse=rmse))
     return points
 
 
+def parse_rmse_line(line, line_number):
+    # Early-stopped runs write "EPOCH RMSE" since they skip epochs
+    values = line.split()
+    if len(values) == 1:
+        return line_number + 1, float(values[0])
+    return int(values[0]), float(values[1])
+
+
 class Result:
     def __init__(self, rmse_file_path):
         self.rmse_file_path = rmse_file_path
@@ -0,0 +1,51 @@
+from multiprocessing import cpu_count
+from os.path import abspath, dirname
+import sys
+
+sys.path.append(abspath(dirname(dirname(__file__))))
+from algorithms.als import ALS
+from scripts.run_model import get_argument_value, run
+
+CHECKPOINT_EVERY = 5
+EVAL_EVERY = 1
+K_FACTOR = 0.05
+NUMBER_OF_EPOCHS = 15
+NUMBER_OF_FEATURES = 50
+PATIENCE = None
+TRAIN_SET_NAME = 'base'
+TEST_SET_NAME = 'probe'
+
+create_files = 'nofile' not in sys.argv
+run_multi = 'multi' in sys.argv
+# resume=<checkpoint file name in models/> continues an interrupted run
+resume_checkpoint = next((arg.split('=', 1)[1] for arg in sys.argv
+                          if arg.startswith('resume=')), None)
+# patience=<evaluations> turns on early stopping for multi runs, with the
+# validation RMSE checked every eval_every=<epochs>
+eval_every = int(get_argument_value('eval_every', EVAL_EVERY))
+patience = get_argument_value('patience', PATIENCE)
+if patience is not None:
+    patience = int(patience)
+num_processes = 1 if 'serial' in sys.argv else cpu_count()
+model = ALS(num_features=NUMBER_OF_FEATURES, k_factor=K_FACTOR,
+            num_processes=num_processes)
+
+try:
+    run_name = ''
+    while run_name == '':
+        run_name = input('Please enter a run name:')
+    run(model=model,
+        train_set_name=TRAIN_SET_NAME,
+        test_set_name=TEST_SET_NAME,
+        epochs=NUMBER_OF_EPOCHS,
+        run_name=run_name,
+        create_files=create_files,
+        run_multi=run_multi,
+        eval_every=eval_every,
+        patience=patience,
+        checkpoint_every=CHECKPOINT_EVERY,
+        resume_checkpoint=resume_checkpoint)
+except Exception as the_exception:
+    import pdb
+    local_exception = the_exception
+    pdb.set_trace()
@@ -0,0 +1,32 @@
+from __future__ import print_function
+from os.path import abspath, dirname, join, isfile
+import sys
+
+sys.path.append(abspath(dirname(dirname(__file__))))
+from utils.data_paths import DATA_DIR_PATH
+from utils.data_io import write_compact_points_to_file
+from utils.dataset import load_dataset_from_file
+
+
+def compute_compact_for_data_set(name):
+    data_set_path = join(DATA_DIR_PATH, name + '.npy')
+    compact_path = join(DATA_DIR_PATH, name + '.pts')
+    if isfile(compact_path):
+        raise Exception('Compact file already exists! Please delete compact '
+                        'file to re-compute it for set: \'{}\''.format(name))
+    print('Loading data set from {}...'.format(data_set_path))
+    data_set = load_dataset_from_file(file_path=data_set_path)
+    print('Saving compact points to file: {}'.format(compact_path))
+    write_compact_points_to_file(points=data_set.points,
+                                 file_path=compact_path)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print('\n\tUSAGE:\n')
+        print('\tpython3 scripts/run_compact.py DATASET_NAME')
+        print('\n\t\tDATASET_NAME is the prefix of any of the .npy data files '
+              'in /netflix/data.')
+        print('\n\tEx: python3 scripts/run_compact.py base\n')
+    else:
+        compute_compact_for_data_set(name=sys.argv[1])
@@ -0,0 +1,106 @@
+from __future__ import print_function
+from multiprocessing import cpu_count
+from os.path import abspath, dirname, isfile, join
+import sys
+from time import time
+
+import numpy as np
+
+sys.path.append(abspath(dirname(dirname(__file__))))
+from algorithms.svd_euclidean import SVDEuclidean
+from scripts.run_model import get_data_set_file_path
+from utils.data_paths import DATA_DIR_PATH
+from utils.data_stats import DataStats, load_stats_from_file
+from utils.dataset import load_dataset_from_file
+
+FACTOR_DTYPES = ('float32', 'float16')
+LEARN_RATE = 0.001
+NUMBER_OF_EPOCHS = 10
+NUMBER_OF_FEATURES = 200
+TEST_SET_NAME = 'probe'
+TRAIN_SET_NAME = 'base'
+
+
+def load_stats(train_set_name, train_points):
+    stats_file_path = join(DATA_DIR_PATH, 'old_stats',
+                           train_set_name + '_stats.p')
+    if isfile(stats_file_path):
+        return load_stats_from_file(stats_file_path)
+    stats = DataStats()
+    stats.load_data_set(train_points)
+    stats.compute_stats()
+    return stats
+
+
+def benchmark_factor_dtypes(train_points, test_points, stats, epochs,
+                            num_threads):
+    reference = SVDEuclidean(learn_rate=LEARN_RATE,
+                             num_features=NUMBER_OF_FEATURES)
+    reference.set_train_points(train_points)
+    reference.initialize_users_and_movies()
+    results = {}
+    for factor_dtype in FACTOR_DTYPES:
+        model = SVDEuclidean(learn_rate=LEARN_RATE,
+                             num_features=NUMBER_OF_FEATURES)
+        model.run_c = True
+        model.num_threads = num_threads
+        model.factor_dtype = factor_dtype
+        model.set_train_points(train_points)
+        model.set_stats(stats)
+        # Both runs start from the same factors, rounded to the storage dtype
+        model.max_user = reference.max_user
+        model.max_movie = reference.max_movie
+        model.users = reference.users.astype(factor_dtype)
+        model.movies = reference.movies.astype(factor_dtype)
+        epoch_seconds = []
+        rmses = []
+        for epoch in range(epochs):
+            start = time()
+            model.run_epoch()
+            epoch_seconds.append(time() - start)
+            rmses.append(model.calculate_rmse(test_points))
+            print('{dtype} epoch {epoch}: {seconds:.3f}s, RMSE {rmse:.5f}'
+                  .format(dtype=factor_dtype, epoch=epoch + 1,
+                          seconds=epoch_seconds[-1], rmse=rmses[-1]))
+        results[factor_dtype] = {
+            'factor_bytes': model.users.nbytes + model.movies.nbytes,
+            'epoch_seconds': np.median(epoch_seconds),
+            'rmses': rmses}
+    return results
+
+
+def print_comparison(results):
+    baseline = results['float32']
+    print('\ndtype    factor MB  median epoch s  speedup  final RMSE  '
+          'RMSE change')
+    for factor_dtype in FACTOR_DTYPES:
+        result = results[factor_dtype]
+        print('{dtype:<8} {mb:>9.1f}  {seconds:>14.3f}  {speedup:>7.2f}  '
+              '{rmse:>10.5f}  {change:>+11.5f}'
+              .format(dtype=factor_dtype, mb=result['factor_bytes'] / 2 ** 20,
+                      seconds=result['epoch_seconds'],
+                      speedup=(baseline['epoch_seconds'] /
+                               result['epoch_seconds']),
+                      rmse=result['rmses'][-1],
+                      change=result['rmses'][-1] - baseline['rmses'][-1]))
+
+
+if __name__ == '__main__':
+    if '-h' in sys.argv or '--help' in sys.argv:
+        print('\n\tUSAGE:\n')
+        print('\tpython3 scripts/run_factor_dtype_benchmark.py '
+              '[TRAIN_SET_NAME [TEST_SET_NAME]] [threads]')
+        print('\n\t\tTrains SVDEuclidean with float32 and float16 factors '
+              'from the same start and compares epoch time and test RMSE.')
+        sys.exit()
+    set_names = [arg for arg in sys.argv[1:] if arg != 'threads']
+    train_set_name = set_names[0] if len(set_names) > 0 else TRAIN_SET_NAME
+    test_set_name = set_names[1] if len(set_names) > 1 else TEST_SET_NAME
+    num_threads = cpu_count() if 'threads' in sys.argv else 1
+    train_points = load_dataset_from_file(
+        get_data_set_file_path(train_set_name))
+    test_points = load_dataset_from_file(get_data_set_file_path(test_set_name))
+    stats = load_stats(train_set_name, train_points)
+    print_comparison(benchmark_factor_dtypes(
+        train_points, test_points, stats, epochs=NUMBER_OF_EPOCHS,
+        num_threads=num_threads))
@@ -0,0 +1,108 @@
+from __future__ import print_function
+from os.path import abspath, dirname
+import sys
+from time import time
+
+import numpy as np
+
+sys.path.append(abspath(dirname(dirname(__file__))))
+from utils import c_interface
+from utils.factor_layout import align_factors
+
+FEATURE_COUNTS = (10, 16, 32, 50, 64, 100, 128, 200, 256)
+LEARN_RATE = 0.001
+NUMBER_OF_MOVIES = 17770
+NUMBER_OF_POINTS = 2 ** 20
+NUMBER_OF_REPEATS = 3
+NUMBER_OF_USERS = 100000
+
+
+def make_problem(num_features, random_state):
+    points = np.column_stack((
+        random_state.randint(0, NUMBER_OF_USERS, NUMBER_OF_POINTS),
+        random_state.randint(0, NUMBER_OF_MOVIES, NUMBER_OF_POINTS),
+        np.zeros(NUMBER_OF_POINTS),
+        random_state.randint(1, 6, NUMBER_OF_POINTS))).astype(np.int32)
+    factor_arrays = {
+        'users': random_state.normal(
+            scale=0.1, size=(NUMBER_OF_USERS, num_features)).astype(
+                np.float32),
+        'user_offsets': np.zeros(NUMBER_OF_USERS, dtype=np.float32),
+        'movies': random_state.normal(
+            scale=0.1, size=(NUMBER_OF_MOVIES, num_features)).astype(
+                np.float32),
+        'movie_averages': np.full(NUMBER_OF_MOVIES, 3.6, dtype=np.float32),
+        'num_features': num_features}
+    return points, factor_arrays
+
+
+def time_kernels(points, factor_arrays, aligned):
+    arrays = dict(factor_arrays)
+    if aligned:
+        arrays['users'] = align_factors(arrays['users'])
+        arrays['movies'] = align_factors(arrays['movies'])
+    else:
+        arrays['users'] = arrays['users'].copy()
+        arrays['movies'] = arrays['movies'].copy()
+    epoch_seconds = []
+    rmse_seconds = []
+    for _ in range(NUMBER_OF_REPEATS):
+        start = time()
+        c_interface.c_svd_euclidean_train_epoch(
+            points, learn_rate=LEARN_RATE, k_factor=0.02, **arrays)
+        epoch_seconds.append(time() - start)
+        start = time()
+        c_interface.c_rmse(points, **arrays)
+        rmse_seconds.append(time() - start)
+    return np.median(epoch_seconds), np.median(rmse_seconds)
+
+
+def benchmark_kernel_isas(feature_counts=FEATURE_COUNTS):
+    levels = c_interface.KERNEL_ISA_LEVELS
+    supported = levels[levels.index(c_interface.get_kernel_isa()):]
+    # The packed layout is the plain build on unpadded, unaligned rows
+    variants = [('sse2', False)] + [(isa, True) for isa in reversed(supported)]
+    results = {}
+    try:
+        for num_features in feature_counts:
+            points, factor_arrays = make_problem(
+                num_features, np.random.RandomState(num_features))
+            for isa, aligned in variants:
+                c_interface.set_kernel_isa(isa)
+                results[num_features, isa, aligned] = time_kernels(
+                    points, factor_arrays, aligned)
+                print('{} features, {}{}: epoch {:.3f}s, rmse {:.3f}s'.format(
+                    num_features, isa, '' if aligned else ' packed',
+                    *results[num_features, isa, aligned]))
+    finally:
+        c_interface.set_kernel_isa()
+    return variants, results
+
+
+def print_comparison(feature_counts, variants, results):
+    names = ['{}{}'.format(isa, '' if aligned else '/packed')
+             for isa, aligned in variants]
+    for column, title in ((0, 'train epoch'), (1, 'rmse')):
+        print('\n{} speedup over {} (baseline seconds)'.format(title,
+                                                              names[0]))
+        print('features  baseline s  ' +
+              '  '.join('{:>12}'.format(name) for name in names[1:]))
+        for num_features in feature_counts:
+            baseline = results[(num_features,) + variants[0]][column]
+            print('{:>8}  {:>10.3f}  '.format(num_features, baseline) +
+                  '  '.join('{:>12.2f}'.format(
+                      baseline / results[(num_features,) + variant][column])
+                      for variant in variants[1:]))
+
+
+if __name__ == '__main__':
+    if '-h' in sys.argv or '--help' in sys.argv:
+        print('\n\tUSAGE:\n')
+        print('\tpython3 scripts/run_kernel_benchmark.py [FEATURE_COUNT ...]')
+        print('\n\t\tTimes the SVDEuclidean epoch and RMSE kernels of each '
+              'ISA build the CPU supports on random ratings, against the '
+              'plain build on packed rows.')
+        sys.exit()
+    feature_counts = tuple(int(arg) for arg in sys.argv[1:]) or FEATURE_COUNTS
+    variants, results = benchmark_kernel_isas(feature_counts)
+    print_comparison(feature_counts, variants, results)
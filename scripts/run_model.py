@@ -1,13 +1,16 @@
 from __future__ import print_function
 from math import sqrt
-from os.path import abspath, dirname, join
+from os.path import abspath, dirname, isfile, join
 import sys
 from time import localtime, strftime
 from git import Repo
 import json
 
 sys.path.append(abspath(dirname(dirname(__file__))))
-from utils.data_io import load_numpy_array_from_file
+from algorithms.early_stopping import EarlyStopping
+from utils.constants import RATING_INDEX
+from utils.data_io import get_point_column
+from utils.dataset import get_points_array, load_dataset_from_file
 from utils.data_stats import load_stats_from_file
 from utils.data_paths import DATA_DIR_PATH, RESULTS_DIR_PATH
 
@@ -16,11 +19,25 @@ def calculate_rmse(true_ratings, predictions):
     return sqrt(((predictions - true_ratings) ** 2).mean())
 
 
+def get_argument_value(name, default=None):
+    # Values passed as name=<value>, e.g. resume=<checkpoint file name>
+    return next((arg.split('=', 1)[1] for arg in sys.argv
+                 if arg.startswith(name + '=')), default)
+
+
+def get_data_set_file_path(data_set_name):
+    compact_file_path = join(DATA_DIR_PATH, data_set_name + '.pts')
+    if isfile(compact_file_path):
+        return compact_file_path
+    return join(DATA_DIR_PATH, data_set_name + '.npy')
+
+
 def predict_and_save_rmse(model, test_points, rmse_file_path,
                           keep_predictions=False,
                           predictions_file_name='noname'):
     predictions = model.predict(test_points)
-    true_ratings = test_points[:, 3]
+    true_ratings = get_point_column(get_points_array(test_points),
+                                    RATING_INDEX)
     rmse = calculate_rmse(true_ratings, predictions)
     print('RMSE:', rmse)
     save_rmse(rmse, rmse_file_path, append=True)
@@ -28,6 +45,12 @@ def predict_and_save_rmse(model, test_points, rmse_file_path,
         save_predictions(predictions, predictions_file_name)
 
 
+def save_checkpoint(model, checkpoint_file_name, epoch):
+    print('Saving checkpoint after epoch {} to {}'.format(
+        epoch, checkpoint_file_name))
+    model.save_checkpoint(checkpoint_file_name, metadata={'epoch': epoch})
+
+
 def save_model(model, model_file_name):
     print('Saving model to {}'.format(model_file_name))
     model.save(model_file_name)
@@ -35,7 +58,9 @@ def save_model(model, model_file_name):
 
 def save_run_info(model, test_set_name, train_set_name, date_string,
                   time_string, feature_epoch_order, create_files,
-                  epochs, run_multi, run_name, commit):
+                  epochs, run_multi, run_name, commit, eval_every=1,
+                  patience=None, checkpoint_every=None,
+                  resume_checkpoint=None):
     info_file_name = ('{model_class}_{run_name}_{short_commit}_{start_time}'
                       '_info.json'
                       .format(model_class=model.__class__.__name__,
@@ -46,10 +71,22 @@ def save_run_info(model, test_set_name, train_set_name, date_string,
     info_file_path = join(RESULTS_DIR_PATH, info_file_name)
     # Create a dict of data
     excluded_params = ['users', 'movies', 'train_points', 'residuals',
-                       'stats', 'max_movie', 'max_user']
+                       'stats', 'max_movie', 'max_user', 'stratified_order',
+                       'block_offsets', 'residual_cache', 'user_groups',
+                       'movie_groups', 'implicit_factors', 'effective_users',
+                       'implicit_points', 'implicit_movies',
+                       'implicit_offsets', 'user_order', 'user_point_offsets',
+                       'item_bin_biases', 'user_alphas', 'user_day_biases',
+                       'day_keys', 'user_mean_times', 'time_features',
+                       'user_accumulators', 'movie_accumulators',
+                       'learn_rate_schedule', 'training_order']
     run_info = {key: value for key, value in model.__dict__.items()
                 if key not in excluded_params}
     run_info['algorithm'] = model.__class__.__name__
+    if getattr(model, 'learn_rate_schedule', None) is not None:
+        run_info['learn_rate_schedule'] = model.learn_rate_schedule.schedule
+    if getattr(model, 'training_order', None) is not None:
+        run_info['training_order'] = model.training_order.strategy
     run_info['last_commit'] = commit
     run_info['train_set_name'] = train_set_name
     run_info['name'] = run_name
@@ -60,13 +97,25 @@ def save_run_info(model, test_set_name, train_set_name, date_string,
     run_info['create_files'] = create_files
     run_info['run_multi'] = run_multi
     run_info['feature_epoch_order'] = feature_epoch_order
+    run_info['eval_every'] = eval_every
+    run_info['patience'] = patience
+    run_info['checkpoint_every'] = checkpoint_every
+    run_info['resume_checkpoint'] = resume_checkpoint
     json.dump(run_info, open(info_file_path, 'w'), indent=4,
               sort_keys=True)
     return info_file_path
 
 
 def run(model, train_set_name, test_set_name, run_name, epochs=None,
-        feature_epoch_order=False, create_files=True, run_multi=False):
+        feature_epoch_order=False, create_files=True, run_multi=False,
+        eval_every=1, patience=None, checkpoint_every=None,
+        resume_checkpoint=None):
+    # Multi runs can only checkpoint at the epochs they evaluate
+    if (run_multi and checkpoint_every is not None and
+            checkpoint_every % eval_every):
+        raise ValueError('checkpoint_every ({}) must be a multiple of '
+                         'eval_every ({})'.format(checkpoint_every,
+                                                  eval_every))
     print('Training {model_class} on "{train}" ratings'
           .format(model_class=model.__class__.__name__, train=train_set_name))
     if not create_files:
@@ -81,15 +130,20 @@ def run(model, train_set_name, test_set_name, run_name, epochs=None,
         print('Number of epochs:', epochs)
     if model.num_features is not None:
         print('Number of features:', model.num_features)
-    train_file_path = join(DATA_DIR_PATH, train_set_name + '.npy')
+    train_file_path = get_data_set_file_path(train_set_name)
     stats_file_path = join(DATA_DIR_PATH, 'old_stats', train_set_name +
                            '_stats.p')
 
     model.debug = True
-    train_points = load_numpy_array_from_file(train_file_path)
+    train_points = load_dataset_from_file(train_file_path)
     stats = load_stats_from_file(stats_file_path)
-    test_file_path = join(DATA_DIR_PATH, test_set_name + '.npy')
-    test_points = load_numpy_array_from_file(test_file_path)
+    test_file_path = get_data_set_file_path(test_set_name)
+    test_points = load_dataset_from_file(test_file_path)
+    start_epoch = 0
+    if resume_checkpoint is not None:
+        start_epoch = model.restore_checkpoint(resume_checkpoint)['epoch']
+        print('Resuming from {} after epoch {}'.format(resume_checkpoint,
+                                                      start_epoch))
 
     # Save run information in [...]_info.txt file
     date_format = '%b-%d'
@@ -107,38 +161,75 @@ def run(model, train_set_name, test_set_name, run_name, epochs=None,
         create_files=create_files,
         run_multi=run_multi,
         run_name=run_name,
-        commit=latest_commit
+        commit=latest_commit,
+        eval_every=eval_every,
+        patience=patience,
+        checkpoint_every=checkpoint_every,
+        resume_checkpoint=resume_checkpoint
     )
     print('Wrote run info to ', run_info_file_path)
     rmse_file_path = run_info_file_path.replace('info.json', 'rmse.txt')
     predictions_file_name = (run_info_file_path.split('/')[-1]
                              .replace('info.json', 'predictions.dta'))
+    checkpoint_file_name = (run_info_file_path.split('/')[-1]
+                            .replace('info.json', 'checkpoint.ckpt'))
+    if not create_files:
+        checkpoint_every = None
     if not run_multi:
         if not feature_epoch_order:
-            model.train(train_points, stats=stats, epochs=epochs)
+            train_with_checkpoints(
+                model, train_points, stats=stats, epochs=epochs,
+                checkpoint_every=checkpoint_every,
+                checkpoint_file_name=checkpoint_file_name,
+                start_epoch=start_epoch)
         else:
-            model.train_feature_epoch(train_points=train_points, stats=stats,
-                                      epochs=epochs)
+            # Feature-epoch runs save a checkpoint after every frozen feature
+            checkpoint_feature = None
+            if checkpoint_every is not None:
+                def checkpoint_feature(num_frozen_features):
+                    save_checkpoint(model, checkpoint_file_name,
+                                    epoch=num_frozen_features * epochs)
+            if resume_checkpoint is not None:
+                # Continues after the features frozen in the checkpoint
+                model.train_more_feature_epoch(train_points=train_points,
+                                               epochs=epochs,
+                                               callback=checkpoint_feature)
+            else:
+                model.train_feature_epoch(train_points=train_points,
+                                          stats=stats, epochs=epochs,
+                                          callback=checkpoint_feature)
     else:
         print("Training multi!")
-        for epoch in range(epochs):
-            if epoch == 0:
-                model.train(train_points, stats=stats, epochs=1)
-            else:
-                model.train_more(epochs=1)
+        early_stopping = EarlyStopping(model, validation_points=test_points,
+                                       eval_every=eval_every,
+                                       patience=patience)
+
+        def report_rmse(epoch, rmse):
+            print('Epoch {epoch} "{test}" RMSE: {rmse}'
+                  .format(epoch=epoch, test=test_set_name, rmse=rmse))
             if create_files:
-                print('Predicting "{test}" ratings'.format(test=test_set_name))
-                predict_and_save_rmse(
-                    model, test_points=test_points,
-                    rmse_file_path=rmse_file_path,
-                    keep_predictions=(create_files and epoch == epochs-1),
-                    predictions_file_name=predictions_file_name
-                )
+                save_rmse(rmse, rmse_file_path, append=True, epoch=epoch)
+            if checkpoint_every is not None and epoch % checkpoint_every == 0:
+                save_checkpoint(model, checkpoint_file_name, epoch)
+
+        best_epoch = early_stopping.train(train_points, stats=stats,
+                                          epochs=epochs, callback=report_rmse,
+                                          start_epoch=start_epoch)
+        print('Best "{test}" RMSE {rmse} after epoch {epoch}'
+              .format(test=test_set_name, rmse=early_stopping.best_rmse,
+                      epoch=best_epoch))
+        if create_files:
+            save_predictions(model.predict(test_points),
+                             predictions_file_name)
     model.train_points = None
+    model.stratified_order = None
     if create_files:
         model_file_name = (run_info_file_path.split('/')[-1]
                            .replace('info.json', 'model.p'))
         save_model(model, model_file_name)
+        # The memory-mappable copy loads near-instantly for predictions
+        model.save_checkpoint(run_info_file_path.split('/')[-1]
+                              .replace('info.json', 'model.ckpt'))
         if not run_multi:
             # duplicate save if run_multi
             print('Predicting "{test}" ratings'.format(test=test_set_name))
@@ -148,6 +239,25 @@ def run(model, train_set_name, test_set_name, run_name, epochs=None,
                                   predictions_file_name=predictions_file_name)
 
 
+def train_with_checkpoints(model, train_points, stats, epochs,
+                           checkpoint_every=None, checkpoint_file_name=None,
+                           start_epoch=0):
+    trained_epochs = start_epoch
+    while trained_epochs < epochs:
+        block_epochs = epochs - trained_epochs
+        if checkpoint_every is not None:
+            block_epochs = min(checkpoint_every, block_epochs)
+        if trained_epochs == 0:
+            model.train(train_points, stats=stats, epochs=block_epochs)
+        elif trained_epochs == start_epoch:
+            model.train_more(train_points=train_points, epochs=block_epochs)
+        else:
+            model.train_more(epochs=block_epochs)
+        trained_epochs += block_epochs
+        if checkpoint_every is not None:
+            save_checkpoint(model, checkpoint_file_name, trained_epochs)
+
+
 def save_predictions(predictions, predictions_file_name):
     print('Saving predictions to {}'.format(predictions_file_name))
     predictions_file_path = join(RESULTS_DIR_PATH, predictions_file_name)
@@ -155,9 +265,12 @@ def save_predictions(predictions, predictions_file_name):
         predictions_file.writelines(['{:.3f}\n'.format(p) for p in predictions])
 
 
-def save_rmse(rmse, rmse_file_path, append=True):
+def save_rmse(rmse, rmse_file_path, append=True, epoch=None):
     write_format = 'w+'
     if append:
         write_format = 'a+'
     with open(rmse_file_path, write_format) as rmse_file:
-        rmse_file.write('{}\n'.format(rmse))
+        if epoch is None:
+            rmse_file.write('{}\n'.format(rmse))
+        else:
+            rmse_file.write('{} {}\n'.format(epoch, rmse))
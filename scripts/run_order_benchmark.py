@@ -0,0 +1,110 @@
+from __future__ import print_function
+from multiprocessing import cpu_count
+from os.path import abspath, dirname
+import sys
+from time import time
+
+import numpy as np
+
+sys.path.append(abspath(dirname(dirname(__file__))))
+from algorithms.svd_euclidean import SVDEuclidean
+from scripts.run_factor_dtype_benchmark import load_stats
+from scripts.run_model import get_data_set_file_path
+from utils.data_ordering import TRAINING_ORDERS, TrainingOrder
+from utils.dataset import load_dataset_from_file
+
+LEARN_RATE = 0.001
+NUMBER_OF_EPOCHS = 10
+NUMBER_OF_FEATURES = 50
+TEST_SET_NAME = 'probe'
+TRAIN_SET_NAME = 'base'
+
+
+def benchmark_training_orders(train_points, test_points, stats, epochs,
+                              num_threads, strategies=TRAINING_ORDERS):
+    reference = SVDEuclidean(learn_rate=LEARN_RATE,
+                             num_features=NUMBER_OF_FEATURES)
+    reference.set_train_points(train_points)
+    reference.initialize_users_and_movies()
+    results = {}
+    for strategy in strategies:
+        model = SVDEuclidean(learn_rate=LEARN_RATE,
+                             num_features=NUMBER_OF_FEATURES)
+        model.run_c = True
+        model.num_threads = num_threads
+        model.training_order = TrainingOrder(strategy, seed=0)
+        model.set_train_points(train_points)
+        model.set_stats(stats)
+        # Every strategy starts from the same factors
+        model.max_user = reference.max_user
+        model.max_movie = reference.max_movie
+        model.users = reference.users.copy()
+        model.movies = reference.movies.copy()
+        model.ensure_factor_layout()
+        order_seconds = []
+        train_seconds = []
+        rmses = []
+        for epoch in range(epochs):
+            start = time()
+            order = model.get_epoch_order()
+            order_seconds.append(time() - start)
+            start = time()
+            model.train_epoch_in_c(order=order)
+            train_seconds.append(time() - start)
+            rmses.append(model.calculate_rmse(test_points))
+            print('{strategy} epoch {epoch}: order {order:.3f}s, train '
+                  '{train:.3f}s, RMSE {rmse:.5f}'
+                  .format(strategy=strategy, epoch=epoch + 1,
+                          order=order_seconds[-1], train=train_seconds[-1],
+                          rmse=rmses[-1]))
+        results[strategy] = {
+            'order_seconds': np.median(order_seconds),
+            'train_seconds': np.median(train_seconds),
+            'wall_seconds': np.cumsum(np.add(order_seconds, train_seconds)),
+            'rmses': rmses}
+    return results
+
+
+def get_seconds_to_rmse(result, target_rmse):
+    for wall_seconds, rmse in zip(result['wall_seconds'], result['rmses']):
+        if rmse <= target_rmse:
+            return wall_seconds
+    return float('inf')
+
+
+def print_comparison(results, strategies=TRAINING_ORDERS):
+    # The worst final RMSE is one every strategy reaches
+    target_rmse = max(results[strategy]['rmses'][-1]
+                      for strategy in strategies)
+    print('\nstrategy    order s  train s  final RMSE  seconds to RMSE '
+          '{:.5f}'.format(target_rmse))
+    for strategy in strategies:
+        result = results[strategy]
+        print('{strategy:<10} {order:>8.3f} {train:>8.3f}  {rmse:>10.5f}  '
+              '{seconds:>15.1f}'
+              .format(strategy=strategy, order=result['order_seconds'],
+                      train=result['train_seconds'],
+                      rmse=result['rmses'][-1],
+                      seconds=get_seconds_to_rmse(result, target_rmse)))
+
+
+if __name__ == '__main__':
+    if '-h' in sys.argv or '--help' in sys.argv:
+        print('\n\tUSAGE:\n')
+        print('\tpython3 scripts/run_order_benchmark.py '
+              '[TRAIN_SET_NAME [TEST_SET_NAME]] [threads]')
+        print('\n\t\tTrains SVDEuclidean in each training order from the '
+              'same start and compares time per epoch and test RMSE per '
+              'wall-second.')
+        sys.exit()
+    set_names = [arg for arg in sys.argv[1:] if arg != 'threads']
+    train_set_name = set_names[0] if len(set_names) > 0 else TRAIN_SET_NAME
+    test_set_name = set_names[1] if len(set_names) > 1 else TEST_SET_NAME
+    num_threads = cpu_count() if 'threads' in sys.argv else 1
+    train_points = load_dataset_from_file(
+        get_data_set_file_path(train_set_name))
+    test_points = load_dataset_from_file(get_data_set_file_path(test_set_name))
+    stats = load_stats(train_set_name, train_points)
+    print_comparison(benchmark_training_orders(
+        train_points, test_points, stats, epochs=NUMBER_OF_EPOCHS,
+        num_threads=num_threads))
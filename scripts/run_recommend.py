@@ -0,0 +1,63 @@
+from __future__ import print_function
+from os.path import abspath, dirname, isfile, join, splitext
+import sys
+from time import time
+
+import numpy as np
+
+sys.path.append(abspath(dirname(dirname(__file__))))
+from algorithms.model import Model
+from scripts.run_model import get_data_set_file_path
+from utils.data_indexes import build_user_index, load_point_index_from_file
+from utils.data_paths import DATA_DIR_PATH, RESULTS_DIR_PATH
+from utils.dataset import load_dataset_from_file
+
+NUMBER_OF_RECOMMENDATIONS = 10
+RATED_SET_NAME = 'base'
+
+
+def load_model(model_file_name):
+    if splitext(model_file_name)[1] == '.ckpt':
+        return Model.load_checkpoint(model_file_name)
+    return Model.load(model_file_name)
+
+
+def load_rated_index(rated_set_name, num_users):
+    # The user-major sort written by run_sort.py is used as is when present
+    sorted_file_path = join(DATA_DIR_PATH, rated_set_name + '_um.npy')
+    if isfile(sorted_file_path):
+        return load_point_index_from_file(sorted_file_path)
+    return build_user_index(
+        load_dataset_from_file(get_data_set_file_path(rated_set_name)),
+        num_users=num_users)
+
+
+def recommend_for_all_users(model_file_name, rated_set_name, n):
+    model = load_model(model_file_name)
+    rated_index = load_rated_index(rated_set_name, model.max_user)
+    start = time()
+    movies, ratings = model.recommend(n=n, rated_index=rated_index)
+    print('Recommended {n} movies to {users} users in {seconds:.1f}s'
+          .format(n=n, users=movies.shape[0], seconds=time() - start))
+    results_file_path = join(
+        RESULTS_DIR_PATH,
+        '{}_top{}.npz'.format(splitext(model_file_name)[0], n))
+    np.savez(results_file_path, movies=movies, ratings=ratings)
+    print('Saved recommendations to file: {}'.format(results_file_path))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or '-h' in sys.argv or '--help' in sys.argv:
+        print('\n\tUSAGE:\n')
+        print('\tpython3 scripts/run_recommend.py MODEL_FILE_NAME '
+              '[RATED_SET_NAME] [N]')
+        print('\n\t\tWrites the N best unrated movies of every user for a '
+              'model in /netflix/models (.p or .ckpt), skipping movies '
+              'rated in RATED_SET_NAME (default {}).'.format(RATED_SET_NAME))
+        sys.exit()
+    numbers = [arg for arg in sys.argv[2:] if arg.isdigit()]
+    set_names = [arg for arg in sys.argv[2:] if not arg.isdigit()]
+    recommend_for_all_users(
+        model_file_name=sys.argv[1],
+        rated_set_name=set_names[0] if set_names else RATED_SET_NAME,
+        n=int(numbers[0]) if numbers else NUMBER_OF_RECOMMENDATIONS)
@@ -4,43 +4,43 @@ import sys
 
 sys.path.append(abspath(dirname(dirname(__file__))))
 from utils.data_paths import DATA_DIR_PATH
-from utils.data_io import load_numpy_array_from_file
-from utils.data_splitting import write_numpy_array_to_file
-import numpy as np
+from utils.data_indexes import SORT_ORDERS, get_index_file_path
+from utils.data_sorting import external_sort
 
 
-def compute_sort_for_data_set(name, no_time=False):
+def compute_sort_for_data_set(name, no_time=False, order='um',
+                              num_workers=None):
     data_set_path = join(DATA_DIR_PATH, name + '.npy')
     time_string = '_notime' if no_time else ''
-    sort_path = join(DATA_DIR_PATH, name + '_um{}.npy'.format(time_string))
+    sort_path = join(DATA_DIR_PATH,
+                     name + '_{}{}.npy'.format(order, time_string))
     if isfile(sort_path):
         raise Exception('Sorted file already exists! Please delete sort file ' +
                         'to re-compute sort for set: \'{}\''.format(name))
-    print('Loading data set from {}...'.format(data_set_path))
-    data_set = load_numpy_array_from_file(file_name=data_set_path)
-    print('Computing sort...')
     if no_time:
         print('(Excluding time from final numpy)')
         keep_columns = (0, 1, 3)
     else:
-        keep_columns = (0, 1, 2, 3)
-    sorted_set = np.sort(data_set.view('i4,i4,i4,i4'),
-                         order=['f0', 'f1'],
-                         kind='mergesort',
-                         axis=0).view(np.int32)[:, keep_columns]
-    print('Got sort: ')
-    print(sorted_set)
-    print('Saving sort to file: {}'.format(sort_path))
-    write_numpy_array_to_file(file_path=sort_path, array=sorted_set)
+        keep_columns = None
+    print('Sorting {} into {}...'.format(data_set_path, sort_path))
+    external_sort(input_file_path=data_set_path, output_file_path=sort_path,
+                  order=order, keep_columns=keep_columns, write_index=True,
+                  num_workers=num_workers)
+    print('Saved sort to file: {}'.format(sort_path))
+    print('Saved index to file: {}'.format(get_index_file_path(sort_path)))
 
 
 if __name__ == '__main__':
     if len(sys.argv) < 2:
         print('\n\tUSAGE:\n')
-        print('\tpython3 scripts/run_sort.py DATASET_NAME [notime]')
+        print('\tpython3 scripts/run_sort.py DATASET_NAME [notime] [ORDER]')
         print('\n\t\tDATASET_NAME is the prefix of any of the .npy data files '
               'in /netflix/data.')
+        print('\n\t\tORDER is one of: um (user-major, default), mu '
+              '(movie-major), du (date-major).')
         print('\n\tEx: python3 scripts/run_sort.py valid\n')
     else:
+        orders = [arg for arg in sys.argv[2:] if arg in SORT_ORDERS]
         compute_sort_for_data_set(name=sys.argv[1],
-                                  no_time=('notime' in sys.argv))
+                                  no_time=('notime' in sys.argv),
+                                  order=(orders[0] if orders else 'um'))
@@ -0,0 +1,37 @@
+from __future__ import print_function
+from os.path import abspath, dirname, join, isfile
+import sys
+
+sys.path.append(abspath(dirname(dirname(__file__))))
+from utils.data_paths import (ALL_DATA_FILE_PATH, ALL_INDEX_FILE_PATH,
+                              DATA_DIR_PATH)
+from utils.data_splitting import SPLIT_NAMES, split_points_by_index
+
+
+def compute_splits(names):
+    split_file_paths = {}
+    for split_index, name in SPLIT_NAMES.items():
+        if name not in names:
+            continue
+        split_path = join(DATA_DIR_PATH, name + '.npy')
+        if isfile(split_path):
+            raise Exception('Split file already exists! Please delete split '
+                            'file to re-compute split: \'{}\''.format(name))
+        split_file_paths[split_index] = split_path
+    print('Splitting {}...'.format(ALL_DATA_FILE_PATH))
+    split_points_by_index(split_file_paths=split_file_paths,
+                          data_file_path=ALL_DATA_FILE_PATH,
+                          index_file_path=ALL_INDEX_FILE_PATH)
+
+
+if __name__ == '__main__':
+    unknown_names = [name for name in sys.argv[1:]
+                     if name not in SPLIT_NAMES.values()]
+    if unknown_names:
+        print('\n\tUSAGE:\n')
+        print('\tpython3 scripts/run_split.py [SPLIT_NAME ...]')
+        print('\n\t\tSPLIT_NAME is any of: {}. All splits are written when '
+              'none are given.'.format(', '.join(SPLIT_NAMES.values())))
+        print('\n\tEx: python3 scripts/run_split.py base probe\n')
+    else:
+        compute_splits(names=sys.argv[1:] or list(SPLIT_NAMES.values()))
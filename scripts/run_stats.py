@@ -5,31 +5,39 @@ import sys
 sys.path.append(abspath(dirname(dirname(__file__))))
 from utils.data_stats import DataStats
 from utils.data_paths import DATA_DIR_PATH
-from utils.data_io import load_numpy_array_from_file
+from utils.dataset import load_dataset_from_file
 
 
-def compute_stats_for_data_set_name(name):
-    data_set_path = join(DATA_DIR_PATH, name + '.npy')
-    stats_path = join(DATA_DIR_PATH, name + '_stats.p')
+def compute_stats_for_data_set_names(names):
+    stats_path = join(DATA_DIR_PATH, '_'.join(names) + '_stats.p')
     if isfile(stats_path):
         raise Exception('Stats file already exists! Please delete stats file ' +
-                        'to re-compute stats for set: \'{}\''.format(name))
+                        'to re-compute stats for set: \'{}\''
+                        .format('+'.join(names)))
     stats = DataStats()
-    print('Loading data set from {}...'.format(data_set_path))
-    data_set = load_numpy_array_from_file(file_name=data_set_path)
-    stats.load_data_set(data_set)
+    data_sets = []
+    for name in names:
+        data_set_path = join(DATA_DIR_PATH, name + '.npy')
+        print('Loading data set from {}...'.format(data_set_path))
+        data_sets.append(load_dataset_from_file(file_path=data_set_path))
+    stats.load_data_set(data_sets)
     print('Computing stats ...')
     stats.compute_stats()
     print('Saving stats to file: {}'.format(stats_path))
     stats.write_stats_to_file(file_path=stats_path)
 
 
+def compute_stats_for_data_set_name(name):
+    compute_stats_for_data_set_names([name])
+
+
 if __name__ == '__main__':
-    if len(sys.argv) != 2:
+    if len(sys.argv) < 2:
         print('\n\tUSAGE:\n')
-        print('\tpython3 scripts/run_stats.py DATASET_NAME')
+        print('\tpython3 scripts/run_stats.py DATASET_NAME [DATASET_NAME ...]')
         print('\n\t\tDATASET_NAME is the prefix of any of the .npy data files '
-              'in /netflix/data.')
-        print('\n\tEx: python3 scripts/run_stats.py valid\n')
+              'in /netflix/data. Several names compute the stats of the '
+              'combined sets.')
+        print('\n\tEx: python3 scripts/run_stats.py base valid hidden\n')
     else:
-        compute_stats_for_data_set_name(name=sys.argv[1])
+        compute_stats_for_data_set_names(names=sys.argv[1:])
@@ -1,27 +1,80 @@
-from os.path import abspath, dirname
+from multiprocessing import cpu_count
+from os.path import abspath, dirname, isfile
 import sys
 
 sys.path.append(abspath(dirname(dirname(__file__))))
+from algorithms.learning_rates import LearnRateSchedule
 from algorithms.svd import SVD
 from algorithms.svd_euclidean import SVDEuclidean
-from scripts.run_model import run
+from algorithms.svd_plus_plus import SVDPlusPlus
+from algorithms.time_svd_plus_plus import TimeSVDPlusPlus
+from scripts.run_model import (get_argument_value,
+                               get_data_set_file_path, run)
+from utils.data_ordering import TRAINING_ORDERS, TrainingOrder
+from utils.data_time import (get_time_features_file_path, load_time_context,
+                             load_time_features)
+from utils.dataset import load_dataset_from_file
 
+CHECKPOINT_EVERY = 10
+EVAL_EVERY = 1
 LEARN_RATE = 0.001
 NUMBER_OF_EPOCHS = 200
 NUMBER_OF_FEATURES = 50
+PATIENCE = None
 TRAIN_SET_NAME = 'base'
 TEST_SET_NAME = 'probe'
+IMPLICIT_SET_NAME = 'qual'
 
 feature_epoch = 'order' in sys.argv
 euclidean = 'euclidean' in sys.argv
+plus_plus = 'plusplus' in sys.argv
+time_plus_plus = 'timeplusplus' in sys.argv
 create_files = 'nofile' not in sys.argv
 run_multi = 'multi' in sys.argv
+# resume=<checkpoint file name in models/> continues an interrupted run
+resume_checkpoint = next((arg.split('=', 1)[1] for arg in sys.argv
+                          if arg.startswith('resume=')), None)
+# patience=<evaluations> turns on early stopping for multi runs, with the
+# validation RMSE checked every eval_every=<epochs>
+eval_every = int(get_argument_value('eval_every', EVAL_EVERY))
+patience = get_argument_value('patience', PATIENCE)
+if patience is not None:
+    patience = int(patience)
 run_c = 'noc' not in sys.argv
-if euclidean:
+num_threads = cpu_count() if 'threads' in sys.argv else 1
+if time_plus_plus:
+    model = TimeSVDPlusPlus(learn_rate=LEARN_RATE,
+                            num_features=NUMBER_OF_FEATURES)
+    model.set_implicit_points(
+        load_dataset_from_file(get_data_set_file_path(IMPLICIT_SET_NAME)))
+    if isfile(get_time_features_file_path(TRAIN_SET_NAME, 'bins')):
+        day_keys, user_mean_times = load_time_context(TRAIN_SET_NAME)
+        model.set_time_features(load_time_features(TRAIN_SET_NAME),
+                                day_keys=day_keys,
+                                user_mean_times=user_mean_times)
+elif plus_plus:
+    model = SVDPlusPlus(learn_rate=LEARN_RATE, num_features=NUMBER_OF_FEATURES)
+    model.set_implicit_points(
+        load_dataset_from_file(get_data_set_file_path(IMPLICIT_SET_NAME)))
+elif euclidean:
     model = SVDEuclidean(learn_rate=LEARN_RATE, num_features=NUMBER_OF_FEATURES)
 else:
     model = SVD(learn_rate=LEARN_RATE, num_features=NUMBER_OF_FEATURES)
 model.run_c = run_c
+if 'numpy' in sys.argv:
+    model.backend = 'numpy'
+model.num_threads = num_threads
+if 'float16' in sys.argv:
+    model.factor_dtype = 'float16'
+for adaptive_method in ('adagrad', 'rmsprop'):
+    if adaptive_method in sys.argv:
+        model.adaptive_method = adaptive_method
+for schedule in ('exponential', 'step', 'bold_driver'):
+    if schedule in sys.argv:
+        model.learn_rate_schedule = LearnRateSchedule(schedule)
+for strategy in TRAINING_ORDERS[1:]:
+    if strategy in sys.argv:
+        model.training_order = TrainingOrder(strategy)
 
 try:
     run_name = ''
@@ -34,7 +87,11 @@ try:
         feature_epoch_order=feature_epoch,
         run_name=run_name,
         create_files=create_files,
-        run_multi=run_multi)
+        run_multi=run_multi,
+        eval_every=eval_every,
+        patience=patience,
+        checkpoint_every=CHECKPOINT_EVERY,
+        resume_checkpoint=resume_checkpoint)
 except Exception as the_exception:
     import pdb
     local_exception = the_exception
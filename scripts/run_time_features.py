@@ -0,0 +1,40 @@
+from __future__ import print_function
+from os.path import abspath, dirname, join
+import sys
+
+sys.path.append(abspath(dirname(dirname(__file__))))
+from utils.data_paths import DATA_DIR_PATH
+from utils.data_time import (compute_day_keys, compute_time_features,
+                             compute_user_mean_times, write_time_context,
+                             write_time_features)
+from utils.dataset import load_dataset_from_file
+
+
+def compute_time_features_for_data_set_names(train_set_name, names):
+    train_set_path = join(DATA_DIR_PATH, train_set_name + '.npy')
+    print('Loading training set from {}...'.format(train_set_path))
+    train_set = load_dataset_from_file(file_path=train_set_path)
+    print('Computing user-day keys and user mean dates...')
+    day_keys = compute_day_keys(train_set)
+    user_mean_times = compute_user_mean_times(train_set)
+    write_time_context(day_keys, user_mean_times, train_set_name)
+    for name in [train_set_name] + names:
+        data_set_path = join(DATA_DIR_PATH, name + '.npy')
+        print('Computing time features of {}...'.format(data_set_path))
+        time_features = compute_time_features(
+            load_dataset_from_file(file_path=data_set_path),
+            day_keys=day_keys, user_mean_times=user_mean_times)
+        write_time_features(time_features, name)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('\n\tUSAGE:\n')
+        print('\tpython3 scripts/run_time_features.py TRAIN_SET_NAME '
+              '[DATASET_NAME ...]')
+        print('\n\t\tUser-day ids and user mean dates come from '
+              'TRAIN_SET_NAME; the other sets are mapped onto them.')
+        print('\n\tEx: python3 scripts/run_time_features.py base probe qual\n')
+    else:
+        compute_time_features_for_data_set_names(train_set_name=sys.argv[1],
+                                                 names=sys.argv[2:])
@@ -0,0 +1,31 @@
+import numpy as np
+
+from utils import data_stats
+
+
+def make_low_rank_train_points(num_users=60, num_movies=40, num_features=2,
+                               num_points=1500):
+    random_state = np.random.RandomState(3)
+    user_factors = random_state.normal(size=(num_users, num_features))
+    movie_factors = random_state.normal(size=(num_movies, num_features))
+    users = random_state.randint(0, num_users, num_points)
+    movies = random_state.randint(0, num_movies, num_points)
+    ratings = np.clip(np.round(3 + 0.5 * np.einsum(
+        'ij,ij->i', user_factors[users], movie_factors[movies])), 1, 5)
+    return np.column_stack((users, movies, np.zeros(num_points),
+                            ratings)).astype(np.int32)
+
+
+def make_stats(train_points):
+    stats = data_stats.DataStats()
+    stats.load_data_set(data_set=train_points)
+    stats.compute_stats()
+    return stats
+
+
+def initialize_model(model, train_points, implicit_points=None):
+    if implicit_points is not None:
+        model.set_implicit_points(implicit_points)
+    model.set_train_points(train_points)
+    model.set_stats(make_stats(train_points))
+    model.initialize_users_and_movies()
@@ -0,0 +1,96 @@
+import numpy as np
+try:
+    from unittest import mock
+except ImportError:  # Python 2
+    import mock
+
+from algorithms import als
+from algorithms import model as model_algorithm
+from tests.helpers import make_low_rank_train_points, make_stats
+
+
+def test_als_init_instances_are_model_instances():
+    assert isinstance(als.ALS(), model_algorithm.Model)
+
+
+def test_group_points_orders_rows_by_id():
+    points = make_low_rank_train_points()
+    order, offsets = als.group_points(points, column_index=0)
+    for user in range(offsets.shape[0] - 1):
+        rows = order[offsets[user]:offsets[user + 1]]
+        assert np.all(points[rows, 0] == user)
+
+
+def test_als_solve_factors_matches_regularized_normal_equations():
+    train_points = make_low_rank_train_points()
+    model = als.ALS(num_features=3, k_factor=0.1)
+    model.train(train_points, make_stats(train_points), epochs=1)
+    users = model.solve_factors(0)
+    user = 7
+    rows = train_points[train_points[:, 0] == user]
+    fixed_rows = model.movies[rows[:, 1]].astype(np.float64)
+    residuals = rows[:, 3] - model.stats.get_baselines(users=rows[:, 0],
+                                                       movies=rows[:, 1])
+    gram = fixed_rows.T.dot(fixed_rows) + 0.1 * rows.shape[0] * np.eye(3)
+    expected_user = np.linalg.solve(gram, fixed_rows.T.dot(residuals))
+    np.testing.assert_array_almost_equal(users[user], expected_user,
+                                         decimal=4)
+
+
+def test_als_train_reduces_train_rmse():
+    train_points = make_low_rank_train_points()
+    stats = make_stats(train_points)
+    model = als.ALS(num_features=2, k_factor=0.02)
+    model.train(train_points, stats, epochs=1)
+    ratings = train_points[:, 3]
+    first_rmse = np.sqrt(np.mean((model.predict(train_points) - ratings) ** 2))
+    model.train_more(epochs=10)
+    last_rmse = np.sqrt(np.mean((model.predict(train_points) - ratings) ** 2))
+    assert last_rmse < first_rmse
+
+
+def test_als_solve_factors_matches_per_id_systems_and_skips_unrated_ids():
+    train_points = make_low_rank_train_points()
+    train_points = train_points[train_points[:, 0] != 5]
+    model = als.ALS(num_features=2, k_factor=0.1)
+    model.train(train_points, make_stats(train_points), epochs=1)
+    with mock.patch('algorithms.als.ALS_BATCH_POINTS', 100):
+        users = model.solve_factors(0)
+    np.testing.assert_array_equal(users[5], np.zeros(2))
+    for user in np.unique(train_points[:, 0]):
+        rows = train_points[train_points[:, 0] == user]
+        fixed_rows = model.movies[rows[:, 1]].astype(np.float64)
+        residuals = rows[:, 3] - model.stats.get_baselines(
+            users=rows[:, 0], movies=rows[:, 1])
+        gram = fixed_rows.T.dot(fixed_rows) + (
+            0.1 * rows.shape[0] * np.eye(2))
+        np.testing.assert_array_almost_equal(
+            users[user], np.linalg.solve(gram, fixed_rows.T.dot(residuals)),
+            decimal=4)
+
+
+def test_als_process_pool_matches_serial_solve():
+    train_points = make_low_rank_train_points()
+    stats = make_stats(train_points)
+    model = als.ALS(num_features=2)
+    model.train(train_points, stats, epochs=1)
+    serial_users = model.solve_factors(0)
+    model.num_processes = 2
+    solver_pool = model.open_solver_pool()
+    try:
+        with mock.patch('algorithms.als.ALS_BATCH_POINTS', 100):
+            pooled_users = model.solve_factors(0, solver_pool=solver_pool)
+    finally:
+        solver_pool.close()
+    np.testing.assert_array_almost_equal(pooled_users, serial_users)
+
+
+def test_als_train_more_starts_one_pool_for_all_sweeps():
+    train_points = make_low_rank_train_points()
+    model = als.ALS(num_features=2)
+    model.num_processes = 2
+    with mock.patch('algorithms.als.ALS_BATCH_POINTS', 100), \
+            mock.patch('algorithms.als.SolverPool',
+                       side_effect=als.SolverPool) as solver_pool_class:
+        model.train(train_points, make_stats(train_points), epochs=3)
+    assert solver_pool_class.call_count == 1
@@ -0,0 +1,276 @@
+import numpy as np
+try:
+    from unittest import mock
+except ImportError:  # Python 2
+    import mock
+
+from utils import c_interface, data_io
+
+
+def make_simple_factor_arrays(num_users=3, num_movies=4, num_features=2):
+    return {
+        'users': np.zeros((num_users, num_features), dtype=np.float32),
+        'user_offsets': np.zeros(num_users, dtype=np.float32),
+        'movies': np.zeros((num_movies, num_features), dtype=np.float32),
+        'movie_averages': np.zeros(num_movies, dtype=np.float32),
+        'num_features': num_features
+    }
+
+
+def make_random_prediction_problem(num_points=500, num_features=4):
+    random_state = np.random.RandomState(3)
+    factor_arrays = make_simple_factor_arrays(num_users=20, num_movies=15,
+                                              num_features=num_features)
+    for name in ('users', 'user_offsets', 'movies', 'movie_averages'):
+        factor_arrays[name][:] = random_state.normal(
+            scale=1.0, size=factor_arrays[name].shape)
+    factor_arrays['movie_averages'] += 3
+    points = np.column_stack((
+        random_state.randint(0, 20, num_points),
+        random_state.randint(0, 15, num_points),
+        random_state.randint(1, 100, num_points),
+        random_state.randint(1, 6, num_points))).astype(np.int32)
+    return points, factor_arrays
+
+
+def test_check_factor_arrays_accepts_float32_contiguous_arrays():
+    c_interface.check_factor_arrays(**make_simple_factor_arrays())
+
+
+def test_check_factor_arrays_rejects_float64_arrays():
+    factor_arrays = make_simple_factor_arrays()
+    factor_arrays['users'] = factor_arrays['users'].astype(np.float64)
+    try:
+        c_interface.check_factor_arrays(**factor_arrays)
+    except ValueError as error:
+        assert 'users' in str(error)
+    else:
+        raise Exception('float64 users should be rejected.')
+
+
+def test_check_factor_arrays_rejects_non_contiguous_arrays():
+    factor_arrays = make_simple_factor_arrays()
+    factor_arrays['movies'] = np.zeros((2, 4), dtype=np.float32).T
+    try:
+        c_interface.check_factor_arrays(**factor_arrays)
+    except ValueError as error:
+        assert 'movies' in str(error)
+    else:
+        raise Exception('Non-contiguous movies should be rejected.')
+
+
+def test_check_factor_arrays_rejects_short_offsets():
+    factor_arrays = make_simple_factor_arrays()
+    factor_arrays['user_offsets'] = np.zeros(2, dtype=np.float32)
+    try:
+        c_interface.check_factor_arrays(**factor_arrays)
+    except ValueError as error:
+        assert 'user_offsets' in str(error)
+    else:
+        raise Exception('Short user offsets should be rejected.')
+
+
+def test_check_points_accepts_int32_and_compact_points():
+    points = np.array([[1, 2, 3, 4]], dtype=np.int32)
+    c_interface.check_points(points)
+    c_interface.check_points(data_io.compact_points_from_array(points))
+
+
+def test_check_points_rejects_wrong_dtype():
+    try:
+        c_interface.check_points(np.zeros((2, 4), dtype=np.int64))
+    except ValueError:
+        pass
+    else:
+        raise Exception('int64 points should be rejected.')
+
+
+def test_get_c_function_loads_each_library_once():
+    c_interface.get_c_function(
+        'svd.so', 'c_update_feature',
+        c_interface.make_svd_update_feature_argtypes)
+    with mock.patch('ctypes.cdll.LoadLibrary') as mock_load_library:
+        for _ in range(3):
+            c_interface.get_c_function(
+                'svd.so', 'c_update_feature',
+                c_interface.make_svd_update_feature_argtypes)
+    assert mock_load_library.call_count == 0
+
+
+def test_get_kernel_prefers_available_backends_in_order():
+    def python_kernel():
+        pass
+
+    def c_kernel():
+        pass
+
+    c_interface.register_kernel('test_kernel', 'python', python_kernel)
+    c_interface.register_kernel('test_kernel', 'c', c_kernel,
+                                is_available=lambda: False)
+    try:
+        assert c_interface.get_kernel('test_kernel') == ('python',
+                                                         python_kernel)
+        assert not c_interface.is_kernel_available('test_kernel', 'c')
+        c_interface.register_kernel('test_kernel', 'c', c_kernel)
+        assert c_interface.get_kernel('test_kernel') == ('c', c_kernel)
+    finally:
+        del c_interface._kernels['test_kernel']
+
+
+def test_get_kernel_raises_without_available_backend():
+    try:
+        c_interface.get_kernel('missing_kernel')
+    except ValueError as error:
+        assert 'missing_kernel' in str(error)
+    else:
+        raise Exception('Missing kernels should raise.')
+
+
+def test_svd_kernels_are_registered_for_c_backend():
+    assert c_interface.is_kernel_available('svd_update_feature', 'c')
+    assert c_interface.is_kernel_available('svd_euclidean_train_epoch', 'c')
+
+
+def test_c_predict_matches_clipped_baseline_plus_dot_product():
+    points, factor_arrays = make_random_prediction_problem()
+    users, movies = points[:, 0], points[:, 1]
+    expected_predictions = np.clip(
+        factor_arrays['movie_averages'][movies] +
+        factor_arrays['user_offsets'][users] +
+        np.einsum('ij,ij->i', factor_arrays['users'][users],
+                  factor_arrays['movies'][movies]), 1, 5)
+    for num_threads in (1, 3):
+        predictions = c_interface.c_predict(points, num_threads=num_threads,
+                                            **factor_arrays)
+        np.testing.assert_array_almost_equal(predictions,
+                                             expected_predictions, decimal=5)
+    compact_predictions = c_interface.c_predict(
+        data_io.compact_points_from_array(points), **factor_arrays)
+    np.testing.assert_array_almost_equal(compact_predictions,
+                                         expected_predictions, decimal=5)
+
+
+def test_c_rmse_matches_rmse_of_c_predictions():
+    points, factor_arrays = make_random_prediction_problem()
+    predictions = c_interface.c_predict(points, **factor_arrays)
+    expected_rmse = np.sqrt(np.mean((predictions - points[:, 3]) ** 2))
+    for num_threads in (1, 4):
+        rmse = c_interface.c_rmse(points, num_threads=num_threads,
+                                  **factor_arrays)
+        np.testing.assert_almost_equal(rmse, expected_rmse, decimal=5)
+
+
+def test_c_predict_rejects_points_outside_the_factor_matrices():
+    points, factor_arrays = make_random_prediction_problem()
+    points[7, 0] = factor_arrays['users'].shape[0]
+    try:
+        c_interface.c_rmse(points, **factor_arrays)
+    except c_interface.CException as error:
+        assert error.err_no == 2
+    else:
+        raise Exception('Out of range users should be rejected.')
+
+
+def test_c_predict_reads_float16_factors_as_their_float32_values():
+    points, factor_arrays = make_random_prediction_problem()
+    half_arrays = dict(factor_arrays)
+    half_arrays['users'] = factor_arrays['users'].astype(np.float16)
+    half_arrays['movies'] = factor_arrays['movies'].astype(np.float16)
+    half_arrays['users'][0] = [6e-8, -3e-5, 65504, np.inf]
+    factor_arrays['users'] = half_arrays['users'].astype(np.float32)
+    factor_arrays['movies'] = half_arrays['movies'].astype(np.float32)
+    np.testing.assert_array_equal(
+        c_interface.c_predict(points, **half_arrays),
+        c_interface.c_predict(points, **factor_arrays))
+
+
+def test_c_predict_rejects_mixed_factor_dtypes():
+    points, factor_arrays = make_random_prediction_problem()
+    factor_arrays['users'] = factor_arrays['users'].astype(np.float16)
+    try:
+        c_interface.c_predict(points, **factor_arrays)
+    except ValueError as error:
+        assert 'dtype' in str(error)
+    else:
+        raise Exception('Mixed factor dtypes should be rejected.')
+
+
+def make_padded_factor_arrays(factor_arrays):
+    from utils.factor_layout import align_factors
+    padded_arrays = dict(factor_arrays)
+    padded_arrays['users'] = align_factors(factor_arrays['users'])
+    padded_arrays['movies'] = align_factors(factor_arrays['movies'])
+    return padded_arrays
+
+
+def test_c_predict_reads_padded_factor_rows():
+    points, factor_arrays = make_random_prediction_problem(num_features=20)
+    padded_arrays = make_padded_factor_arrays(factor_arrays)
+    assert c_interface.get_row_stride(padded_arrays['users']) == 32
+    np.testing.assert_array_equal(
+        c_interface.c_predict(points, **padded_arrays),
+        c_interface.c_predict(points, **factor_arrays))
+
+
+def test_c_svd_euclidean_train_epoch_matches_on_padded_factor_rows():
+    points, factor_arrays = make_random_prediction_problem(num_features=20)
+    padded_arrays = make_padded_factor_arrays(factor_arrays)
+    for adaptive_method in (None, 'adagrad'):
+        for arrays in (factor_arrays, padded_arrays):
+            arrays['user_accumulators'] = np.zeros((20, 20), dtype=np.float32)
+            arrays['movie_accumulators'] = np.zeros((15, 20),
+                                                    dtype=np.float32)
+            c_interface.c_svd_euclidean_train_epoch(
+                points, learn_rate=0.01, k_factor=0.02,
+                adaptive_method=adaptive_method, **arrays)
+        for name in ('users', 'movies', 'user_accumulators',
+                     'movie_accumulators'):
+            np.testing.assert_array_equal(padded_arrays[name],
+                                          factor_arrays[name])
+
+
+def test_select_kernel_isa_picks_the_widest_level_the_cpu_supports():
+    assert c_interface.select_kernel_isa(
+        frozenset(['sse2', 'avx2', 'avx512f'])) == 'avx512'
+    assert c_interface.select_kernel_isa(frozenset(['sse2', 'avx2'])) == 'avx2'
+    assert c_interface.select_kernel_isa(frozenset()) == 'sse2'
+
+
+def test_get_library_file_path_falls_back_to_the_plain_build():
+    import os
+    try:
+        c_interface.set_kernel_isa('avx512')
+        with mock.patch('os.path.isfile',
+                        side_effect=lambda path: 'avx2' in path):
+            assert os.path.basename(c_interface.get_library_file_path(
+                'svd.so')) == 'svd_avx2.so'
+        with mock.patch('os.path.isfile', return_value=False):
+            assert os.path.basename(c_interface.get_library_file_path(
+                'svd.so')) == 'svd.so'
+        c_interface.set_kernel_isa('sse2')
+        with mock.patch('os.path.isfile', return_value=True):
+            assert os.path.basename(c_interface.get_library_file_path(
+                'svd.so')) == 'svd.so'
+    finally:
+        c_interface.set_kernel_isa()
+
+
+def test_every_kernel_isa_build_trains_the_same_factors():
+    points, factor_arrays = make_random_prediction_problem(num_features=40)
+    supported = c_interface.KERNEL_ISA_LEVELS[
+        c_interface.KERNEL_ISA_LEVELS.index(c_interface.get_kernel_isa()):]
+    results = []
+    try:
+        for isa in supported:
+            c_interface.set_kernel_isa(isa)
+            arrays = make_padded_factor_arrays(factor_arrays)
+            c_interface.c_svd_euclidean_train_epoch(
+                points, learn_rate=0.01, k_factor=0.02, **arrays)
+            results.append((arrays['users'], arrays['movies'],
+                            c_interface.c_predict(points, **arrays)))
+    finally:
+        c_interface.set_kernel_isa()
+    for users, movies, predictions in results[1:]:
+        np.testing.assert_array_equal(users, results[0][0])
+        np.testing.assert_array_equal(movies, results[0][1])
+        np.testing.assert_array_equal(predictions, results[0][2])
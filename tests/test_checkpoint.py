@@ -0,0 +1,96 @@
+import numpy as np
+import os
+import pytest
+import shutil
+import tempfile
+try:
+    from unittest import mock
+except ImportError:  # Python 2
+    import mock
+
+from utils import checkpoint
+from utils.constants import FACTOR_ROW_ALIGNMENT
+from utils.factor_layout import align_factors, is_aligned_layout
+
+
+def make_arrays():
+    return {'users': align_factors(
+                np.arange(15, dtype=np.float32).reshape(5, 3)),
+            'movie_averages': np.linspace(1, 5, 7, dtype=np.float32),
+            'stats.movie_counts': np.arange(4, dtype=np.int64),
+            'empty': np.zeros((0, 3), dtype=np.float32)}
+
+
+@pytest.mark.parametrize('mmap_mode', ['r', None])
+def test_checkpoint_round_trip_keeps_values_dtypes_and_padding(mmap_mode):
+    arrays = make_arrays()
+    directory = tempfile.mkdtemp()
+    file_path = os.path.join(directory, 'test.ckpt')
+    try:
+        checkpoint.save_checkpoint(file_path, arrays, header={'epoch': 3})
+        header, loaded_arrays = checkpoint.load_checkpoint(
+            file_path, mmap_mode=mmap_mode)
+        assert header['epoch'] == 3
+        assert sorted(loaded_arrays) == sorted(arrays)
+        for name, array in arrays.items():
+            assert loaded_arrays[name].dtype == array.dtype
+            np.testing.assert_array_equal(loaded_arrays[name], array)
+        assert is_aligned_layout(loaded_arrays['users'])
+        assert (isinstance(loaded_arrays['users'], np.memmap) ==
+                (mmap_mode is not None))
+        del loaded_arrays
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_checkpoint_arrays_start_on_aligned_offsets():
+    directory = tempfile.mkdtemp()
+    file_path = os.path.join(directory, 'test.ckpt')
+    try:
+        checkpoint.save_checkpoint(file_path, make_arrays(), header={})
+        header, data_start = checkpoint.read_checkpoint_header(file_path)
+        assert data_start % FACTOR_ROW_ALIGNMENT == 0
+        for entry in header['arrays'].values():
+            assert entry['offset'] % FACTOR_ROW_ALIGNMENT == 0
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_read_checkpoint_header_rejects_other_files():
+    directory = tempfile.mkdtemp()
+    file_path = os.path.join(directory, 'test.p')
+    try:
+        with open(file_path, 'wb') as other_file:
+            other_file.write(b'not a checkpoint at all')
+        with pytest.raises(ValueError):
+            checkpoint.read_checkpoint_header(file_path)
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_read_checkpoint_header_rejects_unknown_versions():
+    directory = tempfile.mkdtemp()
+    file_path = os.path.join(directory, 'test.ckpt')
+    try:
+        with mock.patch.object(checkpoint, 'CHECKPOINT_VERSION', 0):
+            checkpoint.save_checkpoint(file_path, make_arrays(), header={})
+        with pytest.raises(ValueError):
+            checkpoint.read_checkpoint_header(file_path)
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_failed_save_keeps_the_previous_checkpoint_and_no_temp_file():
+    directory = tempfile.mkdtemp()
+    file_path = os.path.join(directory, 'test.ckpt')
+    try:
+        checkpoint.save_checkpoint(file_path, make_arrays(), header={'a': 1})
+        with mock.patch.object(os, 'fsync', side_effect=OSError):
+            with pytest.raises(OSError):
+                checkpoint.save_checkpoint(file_path, make_arrays(),
+                                           header={'a': 2})
+        assert os.listdir(directory) == ['test.ckpt']
+        header, _ = checkpoint.read_checkpoint_header(file_path)
+        assert header['a'] == 1
+    finally:
+        shutil.rmtree(directory)
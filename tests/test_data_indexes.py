@@ -0,0 +1,103 @@
+import numpy as np
+import os
+
+from utils import constants, data_indexes, data_paths
+
+
+def make_simple_user_sorted_points():
+    sorted_points = np.array([[0, 1, 0, 5],
+                              [0, 3, 0, 3],
+                              [2, 0, 0, 4],
+                              [2, 1, 0, 2],
+                              [2, 4, 0, 5],
+                              [3, 2, 0, 1]],
+                             dtype=np.int32)
+    return sorted_points
+
+
+def test_compute_index_offsets_returns_expected_offsets():
+    sorted_points = make_simple_user_sorted_points()
+    offsets = data_indexes.compute_index_offsets(
+        sorted_points[:, constants.USER_INDEX])
+    np.testing.assert_array_equal(offsets, [0, 2, 2, 5, 6])
+
+
+def test_compute_index_offsets_pads_to_num_ids():
+    sorted_points = make_simple_user_sorted_points()
+    offsets = data_indexes.compute_index_offsets(
+        sorted_points[:, constants.USER_INDEX], num_ids=6)
+    np.testing.assert_array_equal(offsets, [0, 2, 2, 5, 6, 6, 6])
+
+
+def test_compute_index_offsets_rejects_unsorted_columns():
+    try:
+        data_indexes.compute_index_offsets(np.array([0, 2, 1]))
+    except ValueError:
+        pass
+    else:
+        raise Exception('Unsorted columns should be rejected.')
+
+
+def test_point_index_returns_zero_copy_slices_per_id():
+    sorted_points = make_simple_user_sorted_points()
+    index = data_indexes.build_point_index(sorted_points,
+                                           constants.USER_INDEX)
+    assert index.num_ids == 4
+    for user in range(index.num_ids):
+        user_points = index[user]
+        assert user_points.base is sorted_points
+        np.testing.assert_array_equal(
+            user_points,
+            sorted_points[sorted_points[:, constants.USER_INDEX] == user])
+        assert index.count(user) == user_points.shape[0]
+    np.testing.assert_array_equal(index.counts(), [2, 0, 3, 1])
+
+
+def test_load_point_index_from_file_returns_written_index():
+    sorted_points = make_simple_user_sorted_points()
+    sorted_file_path = os.path.join(data_paths.DATA_DIR_PATH,
+                                    'index_test_um.npy')
+    index_file_path = data_indexes.get_index_file_path(sorted_file_path)
+    assert not os.path.isfile(index_file_path), ('{} is for test use only'
+                                                 .format(index_file_path))
+    try:
+        np.save(sorted_file_path, sorted_points)
+        offsets = data_indexes.compute_index_offsets(
+            sorted_points[:, constants.USER_INDEX])
+        data_indexes.write_index_offsets_to_file(offsets, sorted_file_path)
+        index = data_indexes.load_point_index_from_file(sorted_file_path)
+        np.testing.assert_array_equal(index.offsets, offsets)
+        np.testing.assert_array_equal(index[2], sorted_points[2:5])
+        del index
+    finally:
+        for file_path in (sorted_file_path, index_file_path):
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+
+
+def test_split_id_batches_covers_all_ids_in_order():
+    offsets = np.array([0, 5, 5, 12, 13, 30, 31], dtype=np.int64)
+    batches = data_indexes.split_id_batches(offsets, batch_points=10)
+    assert batches[0][0] == 0 and batches[-1][1] == 6
+    for (_, stop_id), (start_id, _) in zip(batches[:-1], batches[1:]):
+        assert stop_id == start_id
+
+
+def test_build_user_index_sorts_points_by_user_stably():
+    sorted_points = make_simple_user_sorted_points()
+    shuffled_points = sorted_points[[5, 2, 0, 3, 1, 4]]
+    index = data_indexes.build_user_index(shuffled_points, num_users=5)
+    np.testing.assert_array_equal(index.offsets, [0, 2, 2, 5, 6, 6])
+    np.testing.assert_array_equal(index[0], sorted_points[:2])
+    np.testing.assert_array_equal(index[2], sorted_points[[2, 3, 4]])
+
+
+def test_point_index_gather_returns_points_and_key_positions():
+    sorted_points = make_simple_user_sorted_points()
+    index = data_indexes.build_point_index(sorted_points,
+                                           constants.USER_INDEX)
+    points, positions = index.gather([3, 1, 0, 9])
+    np.testing.assert_array_equal(points, sorted_points[[5, 0, 1]])
+    np.testing.assert_array_equal(positions, [0, 2, 2])
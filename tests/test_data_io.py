@@ -1,6 +1,7 @@
 import itertools
 import numpy as np
 import os
+import pytest
 import random
 import types
 
@@ -32,6 +33,10 @@ def test_all_points_first_ten_are_correct():
         assert actual_data_point == expected_data_point
 
 
+def test_all_point_blocks_returns_a_generator():
+    assert isinstance(data_io.all_point_blocks(), types.GeneratorType)
+
+
 def test_base_points_returns_a_generator():
     assert isinstance(data_io.base_points(), types.GeneratorType)
 
@@ -41,6 +46,72 @@ def test_base_points_first_ten_are_correct():
                                 index=constants.BASE_INDEX)
 
 
+def test_compact_points_from_array_round_trips():
+    points = np.array([[458293, 17770, 2243, 5], [1, 1, 1, 0]],
+                      dtype=np.int32)
+    compact_points = data_io.compact_points_from_array(points)
+    assert compact_points.dtype == data_io.COMPACT_POINT_DTYPE
+    assert compact_points.dtype.itemsize == 9
+    np.testing.assert_array_equal(
+        data_io.array_from_compact_points(compact_points), points)
+
+
+def test_compact_points_from_array_rejects_values_that_do_not_fit():
+    points = np.array([[1, 40000, 1, 1]], dtype=np.int32)
+    try:
+        data_io.compact_points_from_array(points)
+    except ValueError:
+        pass
+    else:
+        raise Exception('Movie ids above int16 should have been rejected.')
+
+
+def test_data_point_blocks_first_points_are_correct():
+    expected_points = data_io.data_points(data_paths.ALL_DATA_FILE_PATH)
+    point_blocks = data_io.data_point_blocks(data_paths.ALL_DATA_FILE_PATH,
+                                             block_size=1000)
+    for block in itertools.islice(point_blocks, 0, 10):
+        assert block.dtype == np.int32
+        assert block.shape[1] == 4
+        for actual_point in block:
+            expected_point = [int(x) for x in next(expected_points)]
+            assert list(actual_point) == expected_point
+
+
+def test_data_point_blocks_parses_file_without_final_newline():
+    data_file_name = 'test.dta'
+    data_file_path = os.path.join(data_paths.DATA_DIR_PATH, data_file_name)
+    expected_array = np.array([[1, 2, 3, 4], [10, 20, 300, 5], [7, 8, 9, 0]],
+                              dtype=np.int32)
+    with open(data_file_path, 'w') as data_file:
+        data_file.write('1 2 3 4\n10 20 300 5\n7 8 9 0')
+    try:
+        actual_array = np.concatenate(list(
+            data_io.data_point_blocks(data_file_path, block_size=5)
+        ))
+        np.testing.assert_array_equal(actual_array, expected_array)
+    finally:
+        try:
+            os.remove(data_file_path)
+        except FileNotFoundError:
+            pass
+
+
+def test_data_point_blocks_rejects_tokens_that_are_not_integers():
+    data_file_name = 'test.dta'
+    data_file_path = os.path.join(data_paths.DATA_DIR_PATH, data_file_name)
+    with open(data_file_path, 'w') as data_file:
+        data_file.write('1 2 3 4\n10 20 30 5\nx 8 9 0\n1 2 3 4\n')
+    try:
+        with pytest.raises(ValueError):
+            list(data_io.data_point_blocks(data_file_path, block_size=64))
+    finally:
+        try:
+            os.remove(data_file_path)
+        except FileNotFoundError:
+            pass
+
+
 def test_data_points_returns_a_generator():
     assert isinstance(data_io.data_points(data_paths.ALL_DATA_FILE_PATH),
                       types.GeneratorType)
@@ -82,6 +153,16 @@ def test_hidden_points_returns_a_generator():
     assert isinstance(data_io.hidden_points(), types.GeneratorType)
 
 
+def test_index_blocks_first_indices_are_correct():
+    expected_indices = data_io.indices(data_paths.ALL_INDEX_FILE_PATH)
+    index_blocks = data_io.index_blocks(data_paths.ALL_INDEX_FILE_PATH,
+                                        block_size=100)
+    for block in itertools.islice(index_blocks, 0, 10):
+        assert block.dtype == np.int32
+        for actual_index in block:
+            assert actual_index == next(expected_indices)
+
+
 def test_indices_first_ten_correct():
     indices_generator = data_io.indices(data_paths.ALL_INDEX_FILE_PATH)
 
@@ -120,6 +201,48 @@ def test_load_numpy_array_from_file_returns_correct_array():
             pass
 
 
+def test_load_compact_points_from_file_returns_written_points():
+    points = np.random.randint(0, 6, (10, 4)).astype(np.int32)
+    points_file_path = os.path.join(data_paths.DATA_DIR_PATH, 'test.pts')
+    try:
+        data_io.write_compact_points_to_file(points, points_file_path,
+                                             chunk_size=3)
+        assert data_io.is_compact_points_file(points_file_path)
+        for mmap_mode in ('r', None):
+            compact_points = data_io.load_compact_points_from_file(
+                points_file_path, mmap_mode=mmap_mode)
+            assert compact_points.dtype == data_io.COMPACT_POINT_DTYPE
+            np.testing.assert_array_equal(
+                data_io.array_from_compact_points(compact_points), points)
+            del compact_points
+    finally:
+        try:
+            os.remove(points_file_path)
+        except FileNotFoundError:
+            pass
+
+
+def test_load_compact_points_from_file_rejects_other_versions():
+    points_file_path = os.path.join(data_paths.DATA_DIR_PATH, 'test.pts')
+    try:
+        data_io.write_compact_points_to_file(
+            np.ones((2, 4), dtype=np.int32), points_file_path)
+        with open(points_file_path, 'r+b') as points_file:
+            points_file.seek(len(data_io.COMPACT_FORMAT_MAGIC))
+            points_file.write(b'\xff\xff')
+        try:
+            data_io.load_compact_points_from_file(points_file_path)
+        except ValueError:
+            pass
+        else:
+            raise Exception('Unknown format versions should be rejected.')
+    finally:
+        try:
+            os.remove(points_file_path)
+        except FileNotFoundError:
+            pass
+
+
 def test_probe_points_first_ten_are_correct():
     first_n_indices_are_correct(data_io.probe_points(), number_of_points=10,
                                 index=constants.PROBE_INDEX)
@@ -0,0 +1,110 @@
+import numpy as np
+
+from utils import data_ordering
+
+
+def make_random_points(num_points=500, num_users=40, num_movies=30):
+    random_state = np.random.RandomState(7)
+    return np.column_stack((
+        random_state.randint(0, num_users, num_points),
+        random_state.randint(0, num_movies, num_points),
+        np.zeros(num_points, dtype=np.int32),
+        random_state.randint(1, 6, num_points)
+    )).astype(np.int32)
+
+
+def test_compute_balanced_bins_keeps_ids_together_and_in_range():
+    ids = np.array([0, 0, 0, 1, 2, 2, 3, 3, 3, 3], dtype=np.int32)
+    bins = data_ordering.compute_balanced_bins(ids, num_bins=2)
+    assert bins.min() >= 0 and bins.max() <= 1
+    for id_value in np.unique(ids):
+        assert np.unique(bins[ids == id_value]).shape[0] == 1
+    assert np.all(np.diff(bins[np.argsort(ids, kind='mergesort')]) >= 0)
+
+
+def test_compute_stratified_order_is_permutation_grouped_by_block():
+    points = make_random_points()
+    num_blocks = 3
+    order, block_offsets = data_ordering.compute_stratified_order(
+        points, num_blocks=num_blocks)
+    np.testing.assert_array_equal(np.sort(order), np.arange(points.shape[0]))
+    assert order.dtype == np.int32
+    assert block_offsets.shape == (num_blocks ** 2 + 1,)
+    assert block_offsets[-1] == points.shape[0]
+    user_bins = data_ordering.compute_balanced_bins(points[:, 0], num_blocks)
+    movie_bins = data_ordering.compute_balanced_bins(points[:, 1], num_blocks)
+    for block in range(num_blocks ** 2):
+        rows = order[block_offsets[block]:block_offsets[block + 1]]
+        assert np.all(user_bins[rows] == block // num_blocks)
+        assert np.all(movie_bins[rows] == block % num_blocks)
+
+
+def test_get_stratum_blocks_do_not_share_rows_or_columns():
+    num_blocks = 4
+    covered_blocks = []
+    for stratum in range(num_blocks):
+        blocks = data_ordering.get_stratum_blocks(stratum, num_blocks)
+        assert np.unique(blocks // num_blocks).shape[0] == num_blocks
+        assert np.unique(blocks % num_blocks).shape[0] == num_blocks
+        covered_blocks.extend(blocks)
+    np.testing.assert_array_equal(np.sort(covered_blocks),
+                                  np.arange(num_blocks ** 2))
+
+
+def test_training_order_in_file_order_returns_none():
+    training_order = data_ordering.TrainingOrder('file')
+    assert training_order.get_epoch_order(make_random_points()) is None
+
+
+def test_training_order_rejects_unknown_strategies():
+    try:
+        data_ordering.TrainingOrder('sorted')
+    except ValueError as error:
+        assert 'sorted' in str(error)
+    else:
+        raise Exception('Unknown training orders should be rejected.')
+
+
+def test_training_orders_are_new_permutations_every_epoch():
+    points = make_random_points()
+    for strategy in data_ordering.TRAINING_ORDERS[1:]:
+        training_order = data_ordering.TrainingOrder(
+            strategy, chunk_points=64, tile_points=64, seed=5)
+        first = training_order.get_epoch_order(points).copy()
+        second = training_order.get_epoch_order(points)
+        for order in (first, second):
+            assert order.dtype == np.int32
+            np.testing.assert_array_equal(np.sort(order),
+                                          np.arange(points.shape[0]))
+        assert not np.array_equal(first, second)
+        repeated = data_ordering.TrainingOrder(
+            strategy, chunk_points=64, tile_points=64, seed=5)
+        np.testing.assert_array_equal(repeated.get_epoch_order(points), first)
+
+
+def test_chunks_order_keeps_each_chunk_together():
+    points = make_random_points()
+    order = data_ordering.TrainingOrder(
+        'chunks', chunk_points=64, seed=1).get_epoch_order(points)
+    chunks = order // 64
+    assert np.count_nonzero(np.diff(chunks)) == (points.shape[0] - 1) // 64
+    assert not np.all(np.diff(chunks) >= 0)
+
+
+def test_user_tiles_hold_whole_users_and_are_trained_one_at_a_time():
+    points = make_random_points()
+    order, tile_offsets = data_ordering.compute_user_tiles(points,
+                                                           tile_points=100)
+    sorted_users = points[order, 0]
+    assert np.all(np.diff(sorted_users) >= 0)
+    assert tile_offsets[0] == 0 and tile_offsets[-1] == points.shape[0]
+    for start in tile_offsets[1:-1]:
+        assert sorted_users[start - 1] != sorted_users[start]
+    assert tile_offsets.shape[0] - 1 == points.shape[0] // 100
+    tiles = np.zeros(points.shape[0], dtype=np.int64)
+    tiles[order] = np.searchsorted(tile_offsets, np.arange(points.shape[0]),
+                                   side='right')
+    epoch_order = data_ordering.TrainingOrder(
+        'user_tiles', tile_points=100, seed=2).get_epoch_order(points)
+    assert (np.count_nonzero(np.diff(tiles[epoch_order])) ==
+            tile_offsets.shape[0] - 2)
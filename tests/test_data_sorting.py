@@ -0,0 +1,127 @@
+import numpy as np
+import os
+
+from utils import constants, data_indexes, data_io, data_paths, data_sorting
+
+
+def make_random_points(num_points=500):
+    points = np.zeros(shape=(num_points, 4), dtype=np.int32)
+    points[:, constants.USER_INDEX] = np.random.randint(0, 40, num_points)
+    points[:, constants.MOVIE_INDEX] = np.random.randint(0, 30, num_points)
+    points[:, constants.TIME_INDEX] = np.random.randint(0, 20, num_points)
+    points[:, constants.RATING_INDEX] = np.random.randint(1, 6, num_points)
+    return points
+
+
+def expected_sort(points, order):
+    primary_column, secondary_column = data_indexes.SORT_ORDERS[order]
+    return points[np.lexsort((points[:, secondary_column],
+                              points[:, primary_column]))]
+
+
+def remove_files(*file_paths):
+    for file_path in file_paths:
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+
+
+def sort_test_file_paths():
+    input_file_path = os.path.join(data_paths.DATA_DIR_PATH, 'sort_test.npy')
+    output_file_path = os.path.join(data_paths.DATA_DIR_PATH,
+                                    'sort_test_sorted.npy')
+    index_file_path = data_indexes.get_index_file_path(output_file_path)
+    for file_path in (input_file_path, output_file_path, index_file_path):
+        assert not os.path.isfile(file_path), ('{} is for test use only'
+                                               .format(file_path))
+    return input_file_path, output_file_path, index_file_path
+
+
+def test_merge_sorted_runs_is_a_stable_merge():
+    points = make_random_points()
+    runs = [expected_sort(points[start:start + 70], 'um')
+            for start in range(0, points.shape[0], 70)]
+    merged = np.concatenate(list(
+        data_sorting.merge_sorted_runs(runs, 'um', block_size=9)))
+    np.testing.assert_array_equal(merged, expected_sort(points, 'um'))
+
+
+def test_external_sort_sorts_every_order_and_writes_index():
+    points = make_random_points()
+    input_file_path, output_file_path, index_file_path = sort_test_file_paths()
+    try:
+        np.save(input_file_path, points)
+        for order in data_indexes.SORT_ORDERS:
+            for num_workers in (1, 2):
+                offsets = data_sorting.external_sort(
+                    input_file_path, output_file_path, order=order,
+                    chunk_size=64, block_size=16, num_workers=num_workers)
+                sorted_points = np.load(output_file_path)
+                np.testing.assert_array_equal(sorted_points,
+                                              expected_sort(points, order))
+                primary_column = data_indexes.SORT_ORDERS[order][0]
+                np.testing.assert_array_equal(
+                    offsets, data_indexes.compute_index_offsets(
+                        sorted_points[:, primary_column]))
+                np.testing.assert_array_equal(np.load(index_file_path),
+                                              offsets)
+    finally:
+        remove_files(input_file_path, output_file_path, index_file_path)
+
+
+def test_external_sort_keeps_only_requested_columns():
+    points = make_random_points()
+    input_file_path, output_file_path, index_file_path = sort_test_file_paths()
+    try:
+        np.save(input_file_path, points)
+        data_sorting.external_sort(input_file_path, output_file_path,
+                                   keep_columns=(0, 1, 3), chunk_size=100,
+                                   num_workers=1)
+        np.testing.assert_array_equal(
+            np.load(output_file_path),
+            expected_sort(points, 'um')[:, (0, 1, 3)])
+    finally:
+        remove_files(input_file_path, output_file_path, index_file_path)
+
+
+def test_external_sort_sorts_compact_points():
+    points = make_random_points()
+    input_file_path, output_file_path, index_file_path = sort_test_file_paths()
+    input_file_path = input_file_path.replace('.npy', '.pts')
+    output_file_path = output_file_path.replace('.npy', '.pts')
+    try:
+        data_io.write_compact_points_to_file(points, input_file_path)
+        data_sorting.external_sort(input_file_path, output_file_path,
+                                   order='mu', chunk_size=128, num_workers=1,
+                                   write_index=False)
+        sorted_points = data_io.load_compact_points_from_file(
+            output_file_path, mmap_mode=None)
+        np.testing.assert_array_equal(
+            data_io.array_from_compact_points(sorted_points),
+            expected_sort(points, 'mu'))
+    finally:
+        remove_files(input_file_path, output_file_path, index_file_path)
+
+
+def test_external_sort_of_compact_points_writes_a_loadable_index():
+    points = make_random_points()
+    input_file_path, output_file_path, _ = sort_test_file_paths()
+    input_file_path = input_file_path.replace('.npy', '.pts')
+    output_file_path = output_file_path.replace('.npy', '.pts')
+    index_file_path = data_indexes.get_index_file_path(output_file_path)
+    assert not os.path.isfile(index_file_path), ('{} is for test use only'
+                                                 .format(index_file_path))
+    try:
+        data_io.write_compact_points_to_file(points, input_file_path)
+        data_sorting.external_sort(input_file_path, output_file_path,
+                                   order='um', chunk_size=128, num_workers=1)
+        index = data_indexes.load_point_index_from_file(output_file_path)
+        sorted_points = data_io.array_from_compact_points(index.points)
+        for user in range(index.offsets.shape[0] - 1):
+            rows = sorted_points[index.offsets[user]:index.offsets[user + 1]]
+            assert np.all(rows[:, constants.USER_INDEX] == user)
+        assert index.offsets[-1] == points.shape[0]
+        del index
+    finally:
+        remove_files(input_file_path, output_file_path, index_file_path)
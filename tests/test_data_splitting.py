@@ -1,5 +1,6 @@
 import numpy as np
 import os
+import pytest
 
 from utils import data_paths, data_splitting
 
@@ -54,28 +55,97 @@ def test_write_numpy_array_to_file_creates_expected_file():
             pass
 
 
-def test_create_numpy_array_from_generator_returns_numpy_array():
-    overestimated_shape = (10, 1)
+def write_simple_data_and_index_files(data_file_path, index_file_path):
+    points = np.random.randint(0, 999, (50, 4)).astype(np.int32)
+    indices = np.random.randint(1, 6, (50,)).astype(np.int32)
+    with open(data_file_path, 'w') as data_file:
+        data_file.writelines(['{} {} {} {}\n'.format(*point)
+                              for point in points])
+    with open(index_file_path, 'w') as index_file:
+        index_file.writelines(['{}\n'.format(index) for index in indices])
+    return points, indices
 
-    def input_generator():
-        yield 0
-    return_value = data_splitting.create_numpy_array_from_generator(
-        generator=input_generator,
-        overestimated_shape=overestimated_shape
-    )
-    assert isinstance(return_value, np.ndarray)
-    assert return_value.dtype == np.int32
 
+def test_count_points_by_index_returns_expected_counts():
+    data_file_path = os.path.join(data_paths.DATA_DIR_PATH, 'test.dta')
+    index_file_path = os.path.join(data_paths.DATA_DIR_PATH, 'test.idx')
+    try:
+        _, indices = write_simple_data_and_index_files(data_file_path,
+                                                       index_file_path)
+        expected_counts = np.bincount(indices, minlength=6)
+        actual_counts = data_splitting.count_points_by_index(index_file_path,
+                                                             block_size=16)
+        np.testing.assert_array_equal(actual_counts, expected_counts)
+    finally:
+        for file_path in (data_file_path, index_file_path):
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+
+
+def test_split_points_by_index_writes_every_split_in_order():
+    data_file_path = os.path.join(data_paths.DATA_DIR_PATH, 'test.dta')
+    index_file_path = os.path.join(data_paths.DATA_DIR_PATH, 'test.idx')
+    split_file_paths = {
+        index: os.path.join(data_paths.DATA_DIR_PATH,
+                            'split_test_{}.npy'.format(name))
+        for index, name in data_splitting.SPLIT_NAMES.items()
+    }
+    for split_file_path in split_file_paths.values():
+        assert not os.path.isfile(split_file_path), (
+            '{} is for test use only'.format(split_file_path))
+    try:
+        points, indices = write_simple_data_and_index_files(data_file_path,
+                                                            index_file_path)
+        data_splitting.split_points_by_index(
+            split_file_paths=split_file_paths,
+            data_file_path=data_file_path,
+            index_file_path=index_file_path,
+            block_size=64
+        )
+        for index, split_file_path in split_file_paths.items():
+            actual_array = np.load(split_file_path)
+            assert actual_array.dtype == np.int32
+            np.testing.assert_array_equal(actual_array,
+                                          points[indices == index])
+    finally:
+        for file_path in ([data_file_path, index_file_path] +
+                          list(split_file_paths.values())):
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
 
-def test_create_numpy_array_from_generator_returns_expected_array():
-    expected_array = np.random.randint(0, 999, (5, 4)).astype(np.int32)
-    overestimated_shape = (10, 4)
 
-    def input_generator():
-        for thing in expected_array:
-            yield thing
-    actual_array = data_splitting.create_numpy_array_from_generator(
-        generator=input_generator,
-        overestimated_shape=overestimated_shape
-    )
-    np.testing.assert_array_equal(actual_array, expected_array)
+def test_split_points_by_index_rejects_data_file_shorter_than_index():
+    data_file_path = os.path.join(data_paths.DATA_DIR_PATH, 'test.dta')
+    index_file_path = os.path.join(data_paths.DATA_DIR_PATH, 'test.idx')
+    split_file_paths = {
+        index: os.path.join(data_paths.DATA_DIR_PATH,
+                            'split_test_{}.npy'.format(name))
+        for index, name in data_splitting.SPLIT_NAMES.items()
+    }
+    for split_file_path in split_file_paths.values():
+        assert not os.path.isfile(split_file_path), (
+            '{} is for test use only'.format(split_file_path))
+    try:
+        points, _ = write_simple_data_and_index_files(data_file_path,
+                                                      index_file_path)
+        with open(data_file_path, 'w') as data_file:
+            data_file.writelines(['{} {} {} {}\n'.format(*point)
+                                  for point in points[:-5]])
+        with pytest.raises(ValueError):
+            data_splitting.split_points_by_index(
+                split_file_paths=split_file_paths,
+                data_file_path=data_file_path,
+                index_file_path=index_file_path,
+                block_size=64
+            )
+    finally:
+        for file_path in ([data_file_path, index_file_path] +
+                          list(split_file_paths.values())):
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
@@ -135,6 +135,114 @@ def test_compute_stats_calculates_expected_stats():
                                          expected_user_offset_sum)
 
 
+def test_compute_stats_in_chunks_matches_single_pass():
+    data_set = np.random.randint(1, 6, (1000, 4)).astype(np.int32)
+    data_set[:, constants.USER_INDEX] = np.random.randint(0, 50, 1000)
+    data_set[:, constants.MOVIE_INDEX] = np.random.randint(0, 20, 1000)
+    single_pass_stats = data_stats.DataStats()
+    single_pass_stats.load_data_set(data_set)
+    single_pass_stats.compute_stats()
+    chunked_stats = data_stats.DataStats(chunk_size=7)
+    chunked_stats.load_data_set(data_set)
+    chunked_stats.compute_stats()
+    np.testing.assert_almost_equal(chunked_stats.global_average,
+                                   single_pass_stats.global_average)
+    np.testing.assert_array_almost_equal(chunked_stats.movie_averages,
+                                         single_pass_stats.movie_averages)
+    np.testing.assert_array_almost_equal(chunked_stats.user_offsets,
+                                         single_pass_stats.user_offsets)
+    np.testing.assert_array_equal(chunked_stats.user_rating_count,
+                                  single_pass_stats.user_rating_count)
+
+
+def test_compute_stats_of_several_data_sets_matches_their_concatenation():
+    data_set = make_simple_test_set()
+    combined_stats = data_stats.DataStats()
+    combined_stats.load_data_set(data_set)
+    combined_stats.compute_stats()
+    split_stats = data_stats.DataStats(chunk_size=2)
+    split_stats.load_data_set([data_set[:2], data_set[2:]])
+    split_stats.compute_stats()
+    assert split_stats.num_users == combined_stats.num_users
+    assert split_stats.num_movies == combined_stats.num_movies
+    np.testing.assert_array_almost_equal(split_stats.movie_averages,
+                                         combined_stats.movie_averages)
+    np.testing.assert_array_almost_equal(split_stats.user_offsets,
+                                         combined_stats.user_offsets)
+
+
+def test_merge_matches_stats_of_combined_movies_and_counts():
+    data_set = make_simple_test_set()
+    first_stats = data_stats.DataStats()
+    first_stats.load_data_set(data_set[:3])
+    first_stats.compute_stats()
+    second_stats = data_stats.DataStats()
+    second_stats.load_data_set(data_set[3:])
+    second_stats.compute_stats()
+    combined_stats = make_simple_stats()
+    first_stats.merge(second_stats)
+    assert first_stats.num_users == combined_stats.num_users
+    assert first_stats.num_movies == combined_stats.num_movies
+    np.testing.assert_almost_equal(first_stats.global_average,
+                                   combined_stats.global_average)
+    np.testing.assert_array_almost_equal(first_stats.movie_averages,
+                                         combined_stats.movie_averages)
+    np.testing.assert_array_equal(first_stats.user_rating_count,
+                                  combined_stats.user_rating_count)
+    assert first_stats.user_offsets.shape == combined_stats.user_offsets.shape
+
+
+def test_update_adds_new_points_and_new_ids():
+    data_set = make_simple_test_set()
+    new_points = np.array([[3, 2, 0, 1]], dtype=np.int32)
+    stats = make_simple_stats()
+    stats.update(new_points)
+    combined_stats = data_stats.DataStats()
+    combined_stats.load_data_set(np.concatenate((data_set, new_points)))
+    combined_stats.compute_stats()
+    assert stats.num_users == 4
+    assert stats.num_movies == 3
+    np.testing.assert_almost_equal(stats.global_average,
+                                   combined_stats.global_average)
+    np.testing.assert_array_almost_equal(stats.movie_averages,
+                                         combined_stats.movie_averages)
+    np.testing.assert_array_equal(stats.movie_rating_count,
+                                  combined_stats.movie_rating_count)
+    np.testing.assert_array_equal(stats.user_rating_count,
+                                  combined_stats.user_rating_count)
+    assert stats.user_offsets.shape == combined_stats.user_offsets.shape
+
+
+def test_stats_pickled_without_chunk_size_can_be_updated_and_merged():
+    file_name = 'test_stats.p'
+    file_path = os.path.join(data_paths.DATA_DIR_PATH, file_name)
+    assert not os.path.isfile(file_path), ('{} is for test use only'
+                                           .format(file_path))
+    old_stats = make_simple_stats()
+    del old_stats.chunk_size
+    try:
+        old_stats.write_stats_to_file(file_path)
+        stats = data_stats.load_stats_from_file(file_path)
+    finally:
+        os.remove(file_path)
+    assert stats.chunk_size == constants.STATS_CHUNK_SIZE
+    stats.update(np.array([[3, 2, 0, 1]], dtype=np.int32))
+    stats.merge(make_simple_stats())
+    assert stats.num_users == 4
+
+
+def test_derive_averages_does_not_read_the_data_set():
+    stats = make_simple_stats()
+    expected_movie_averages = np.copy(stats.movie_averages)
+    expected_user_offsets = np.copy(stats.user_offsets)
+    stats.data_set = np.array([])
+    stats.derive_averages()
+    np.testing.assert_array_almost_equal(stats.movie_averages,
+                                         expected_movie_averages)
+    np.testing.assert_array_almost_equal(stats.user_offsets,
+                                         expected_user_offsets)
+
+
 @mock.patch('utils.data_stats.compute_simple_indexed_sum_and_count')
 @mock.patch('utils.data_stats.compute_blended_indexed_averages')
 @mock.patch('utils.data_stats.compute_offsets')
@@ -167,6 +275,18 @@ def test_compute_simple_indexed_sum_and_count_returns_correct_values():
                                   expected_indexed_count)
 
 
+def test_compute_simple_indexed_sum_and_count_pads_to_array_length():
+    test_data = np.array([1, 2, 3], dtype=np.float32)
+    index_array = np.array([0, 2, 0], dtype=np.int32)
+    test_indexed_sum, test_indexed_count = data_stats.compute_simple_indexed_sum_and_count(
+        data_indices=index_array,
+        data_values=test_data,
+        array_length=5
+    )
+    np.testing.assert_almost_equal(test_indexed_sum, [4, 0, 2, 0, 0])
+    np.testing.assert_array_equal(test_indexed_count, [2, 0, 1, 0, 0])
+
+
 def test_compute_offsets_returns_correct_array():
     test_data = make_simple_test_set()
     # Test Set:
@@ -247,6 +367,26 @@ def test_get_baseline_returns_expected_baseline():
                                    decimal=5)
 
 
+def test_get_baselines_matches_get_baseline():
+    stats = make_simple_stats()
+    users = np.array([0, 1, 2, 2], dtype=np.int32)
+    movies = np.array([1, 0, 0, 1], dtype=np.int32)
+    expected_baselines = [stats.get_baseline(user=user, movie=movie)
+                          for user, movie in zip(users, movies)]
+    np.testing.assert_array_almost_equal(
+        stats.get_baselines(users=users, movies=movies), expected_baselines)
+
+
+def test_get_baseline_raises_without_averages():
+    stats = data_stats.DataStats()
+    try:
+        stats.get_baseline(user=0, movie=0)
+    except Exception as exception:
+        assert 'Missing Movie averages' in str(exception)
+    else:
+        raise Exception('get_baseline should need movie averages.')
+
+
 def test_data_stats_init_can_create_blank_instance():
     stats = data_stats.DataStats()
     assert isinstance(stats, data_stats.DataStats)
@@ -0,0 +1,81 @@
+import numpy as np
+import os
+
+from utils import constants, data_time
+
+
+def make_timed_points():
+    return np.array([[0, 1, 1, 3],
+                     [0, 2, 11, 4],
+                     [1, 1, 5, 2],
+                     [1, 0, 5, 5],
+                     [3, 2, constants.NUM_DAYS, 1]], dtype=np.int32)
+
+
+def test_compute_time_bins_cover_all_days_in_order():
+    times = np.arange(1, constants.NUM_DAYS + 1)
+    bins = data_time.compute_time_bins(times)
+    assert bins[0] == 0
+    assert bins[-1] == constants.NUM_TIME_BINS - 1
+    assert np.all(np.diff(bins) >= 0)
+    assert bins.dtype == np.int16
+
+
+def test_compute_day_ids_maps_known_days_and_marks_unknown_ones():
+    points = make_timed_points()
+    day_keys = data_time.compute_day_keys(points, chunk_size=2)
+    assert day_keys.shape[0] == 4
+    day_ids = data_time.compute_day_ids(points[:, 0], points[:, 2], day_keys)
+    assert day_ids[2] == day_ids[3]
+    assert len(set(day_ids)) == 4
+    unknown_ids = data_time.compute_day_ids(np.array([0, 2]),
+                                            np.array([5, 1]), day_keys)
+    np.testing.assert_array_equal(unknown_ids, [-1, -1])
+
+
+def test_compute_user_mean_times_averages_each_users_dates():
+    points = make_timed_points()
+    user_mean_times = data_time.compute_user_mean_times(points, chunk_size=2)
+    np.testing.assert_array_almost_equal(
+        user_mean_times, [6, 5, 0, constants.NUM_DAYS])
+
+
+def test_compute_time_deviations_follow_sign_and_power_of_date_offset():
+    user_mean_times = np.array([6, 5], dtype=np.float32)
+    deviations = data_time.compute_time_deviations(
+        np.array([0, 0, 1, 7]), np.array([1, 11, 5, 9]), user_mean_times)
+    exponent = constants.TIME_DEVIATION_EXPONENT
+    np.testing.assert_array_almost_equal(
+        deviations, [-5 ** exponent, 5 ** exponent, 0, 0])
+
+
+def test_write_time_features_round_trips_through_files():
+    points = make_timed_points()
+    day_keys = data_time.compute_day_keys(points)
+    user_mean_times = data_time.compute_user_mean_times(points)
+    time_features = data_time.compute_time_features(points, day_keys,
+                                                    user_mean_times)
+    name = 'test_time'
+    file_paths = [data_time.get_time_features_file_path(name, feature_name)
+                  for feature_name in data_time.TIME_FEATURE_NAMES]
+    file_paths += [data_time.get_time_context_file_path(name, context_name)
+                   for context_name in ('day_keys', 'user_mean_times')]
+    for file_path in file_paths:
+        assert not os.path.isfile(file_path), ('{} is for test use only'
+                                               .format(file_path))
+    try:
+        data_time.write_time_features(time_features, name)
+        data_time.write_time_context(day_keys, user_mean_times, name)
+        loaded_features = data_time.load_time_features(name)
+        loaded_day_keys, loaded_user_mean_times = (
+            data_time.load_time_context(name))
+        for feature_name in data_time.TIME_FEATURE_NAMES:
+            np.testing.assert_array_equal(
+                getattr(loaded_features, feature_name),
+                getattr(time_features, feature_name))
+        np.testing.assert_array_equal(loaded_day_keys, day_keys)
+        np.testing.assert_array_equal(loaded_user_mean_times, user_mean_times)
+    finally:
+        for file_path in file_paths:
+            if os.path.isfile(file_path):
+                os.remove(file_path)
@@ -0,0 +1,133 @@
+import numpy as np
+import os
+
+from algorithms import svd
+from utils import constants, data_io, data_paths, data_stats, dataset
+
+
+def make_simple_data_set():
+    data_set = np.array([[0, 1, 10, 5],
+                         [0, 0, 11, 3],
+                         [1, 1, 12, 4],
+                         [2, 1, 13, 2],
+                         [2, 0, 14, 5]],
+                        dtype=np.int32)
+    return data_set
+
+
+def save_and_load_simple_data_set(file_path):
+    assert not os.path.isfile(file_path), ('{} is for test use only'
+                                           .format(file_path))
+    np.save(file_path, make_simple_data_set())
+    return dataset.load_dataset_from_file(file_path)
+
+
+def remove_file(file_path):
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+
+
+def test_load_dataset_from_file_memory_maps_the_array():
+    file_path = os.path.join(data_paths.DATA_DIR_PATH, 'dataset_test.npy')
+    try:
+        data_set = save_and_load_simple_data_set(file_path)
+        assert isinstance(data_set, dataset.Dataset)
+        assert isinstance(data_set.points, np.memmap)
+        np.testing.assert_array_equal(data_set.points, make_simple_data_set())
+    finally:
+        remove_file(file_path)
+
+
+def test_load_dataset_from_file_opens_compact_points_files():
+    file_path = os.path.join(data_paths.DATA_DIR_PATH, 'dataset_test.pts')
+    assert not os.path.isfile(file_path), ('{} is for test use only'
+                                           .format(file_path))
+    points = make_simple_data_set()
+    try:
+        data_io.write_compact_points_to_file(points, file_path)
+        data_set = dataset.load_dataset_from_file(file_path)
+        assert data_set.points.dtype == data_io.COMPACT_POINT_DTYPE
+        assert data_set.num_points == 5
+        assert data_set.num_users == 3
+        np.testing.assert_array_equal(data_set.users,
+                                      points[:, constants.USER_INDEX])
+        np.testing.assert_array_equal(data_set.ratings,
+                                      points[:, constants.RATING_INDEX])
+        del data_set
+    finally:
+        remove_file(file_path)
+
+
+def test_dataset_columns_are_views_of_the_points():
+    points = make_simple_data_set()
+    data_set = dataset.Dataset(points)
+    columns = ((data_set.users, constants.USER_INDEX),
+               (data_set.movies, constants.MOVIE_INDEX),
+               (data_set.times, constants.TIME_INDEX),
+               (data_set.ratings, constants.RATING_INDEX))
+    for column, column_index in columns:
+        assert np.may_share_memory(column, points)
+        np.testing.assert_array_equal(column, points[:, column_index])
+
+
+def test_dataset_metadata_is_correct():
+    data_set = dataset.Dataset(make_simple_data_set())
+    assert data_set.num_points == 5
+    assert len(data_set) == 5
+    assert data_set.num_users == 3
+    assert data_set.num_movies == 2
+    assert data_set.shape == (5, 4)
+
+
+def test_dataset_rows_and_chunks_are_lazy_slices():
+    points = make_simple_data_set()
+    data_set = dataset.Dataset(points)
+    rows = data_set.rows(1, 3)
+    assert isinstance(rows, dataset.Dataset)
+    assert np.may_share_memory(rows.points, points)
+    np.testing.assert_array_equal(rows.points, points[1:3])
+    chunks = list(data_set.chunks(chunk_size=2))
+    assert [chunk.num_points for chunk in chunks] == [2, 2, 1]
+    np.testing.assert_array_equal(
+        np.concatenate([chunk.points for chunk in chunks]), points)
+
+
+def test_svd_set_train_points_accepts_dataset_without_copy():
+    file_path = os.path.join(data_paths.DATA_DIR_PATH, 'dataset_test.npy')
+    try:
+        data_set = save_and_load_simple_data_set(file_path)
+        model = svd.SVD()
+        model.set_train_points(data_set)
+        assert model.train_points is data_set.points
+    finally:
+        remove_file(file_path)
+
+
+def test_data_stats_load_data_set_accepts_dataset_without_copy():
+    data_set = dataset.Dataset(make_simple_data_set())
+    stats = data_stats.DataStats()
+    stats.load_data_set(data_set)
+    assert stats.data_set is data_set.points
+    assert stats.num_users == 3
+    assert stats.num_movies == 2
+
+
+def test_compute_points_fingerprint_changes_with_points():
+    points = np.arange(40, dtype=np.int32).reshape(10, 4)
+    fingerprint = dataset.compute_points_fingerprint(points)
+    assert fingerprint == dataset.compute_points_fingerprint(
+        dataset.Dataset(np.copy(points)))
+    points[-1, 3] += 1
+    assert fingerprint != dataset.compute_points_fingerprint(points)
+    assert fingerprint != dataset.compute_points_fingerprint(points[:-1])
+
+
+def test_compute_points_fingerprint_hashes_every_chunk():
+    points = np.arange(400, dtype=np.int32).reshape(100, 4)
+    fingerprint = dataset.compute_points_fingerprint(points, chunk_size=7)
+    assert fingerprint == dataset.compute_points_fingerprint(points)
+    points[50, 1] += 1
+    assert fingerprint != dataset.compute_points_fingerprint(points,
+                                                             chunk_size=7)
@@ -0,0 +1,130 @@
+import numpy as np
+import pytest
+try:
+    from unittest import mock
+except ImportError:  # Python 2
+    import mock
+
+from algorithms import (early_stopping, learning_rates, svd_euclidean,
+                        svd_plus_plus)
+from tests.helpers import make_low_rank_train_points, make_stats
+
+
+def make_mock_model(rmses):
+    model = mock.Mock()
+    model.users = np.zeros((2, 2), dtype=np.float32)
+    model.movies = np.zeros((3, 2), dtype=np.float32)
+    model.get_parameter_names.return_value = ('users', 'movies')
+    model.learn_rate_schedule = None
+    model.calculate_rmse.side_effect = rmses
+
+    def train_more(train_points=None, epochs=1):
+        model.users += epochs
+        model.movies += epochs
+    model.train.side_effect = (
+        lambda train_points, stats, epochs=1: train_more(epochs=epochs))
+    model.train_more.side_effect = train_more
+    return model
+
+
+def test_early_stopping_rejects_non_positive_eval_every():
+    with pytest.raises(ValueError):
+        early_stopping.EarlyStopping(mock.Mock(), np.zeros((1, 4), np.int32),
+                                     eval_every=0)
+
+
+def test_early_stopping_evaluates_every_n_epochs_without_patience():
+    model = make_mock_model([1.0, 0.9, 0.8, 0.7])
+    stopper = early_stopping.EarlyStopping(
+        model, np.zeros((1, 4), np.int32), eval_every=3)
+    best_epoch = stopper.train(None, stats=None, epochs=10)
+    assert stopper.epoch_history == [3, 6, 9, 10]
+    assert stopper.rmse_history == [1.0, 0.9, 0.8, 0.7]
+    assert best_epoch == 10
+    assert model.train.call_count == 1
+    assert model.train_more.call_count == 3
+    np.testing.assert_array_equal(model.users, 10)
+
+
+def test_early_stopping_without_patience_keeps_the_last_epoch():
+    model = make_mock_model([1.0, 0.8, 0.9])
+    stopper = early_stopping.EarlyStopping(model, np.zeros((1, 4), np.int32))
+    best_epoch = stopper.train(None, stats=None, epochs=3)
+    assert best_epoch == 2
+    assert stopper.epoch_history == [1, 2, 3]
+    np.testing.assert_array_equal(model.users, 3)
+
+
+def test_early_stopping_stops_after_patience_and_restores_best_factors():
+    model = make_mock_model([1.0, 0.8, 0.9, 0.85, 0.7])
+    callback = mock.Mock()
+    stopper = early_stopping.EarlyStopping(
+        model, np.zeros((1, 4), np.int32), eval_every=2, patience=2)
+    best_epoch = stopper.train(None, stats=None, epochs=20,
+                               callback=callback)
+    assert best_epoch == 4
+    assert stopper.best_rmse == 0.8
+    assert stopper.epoch_history == [2, 4, 6, 8]
+    assert callback.call_count == 4
+    callback.assert_called_with(8, 0.85)
+    np.testing.assert_array_equal(model.users, 4)
+    np.testing.assert_array_equal(model.movies, 4)
+
+
+def test_early_stopping_snapshot_is_copied_into_the_same_buffers():
+    model = make_mock_model([1.0, 0.5])
+    stopper = early_stopping.EarlyStopping(model, np.zeros((1, 4), np.int32))
+    stopper.evaluate(1)
+    users_buffer = stopper.snapshot['users']
+    assert users_buffer is not model.users
+    model.users += 1
+    stopper.evaluate(2)
+    assert stopper.snapshot['users'] is users_buffer
+    np.testing.assert_array_equal(users_buffer, model.users)
+
+
+def test_early_stopping_restores_every_svd_plus_plus_parameter():
+    train_points = make_low_rank_train_points(num_points=300)
+    model = svd_plus_plus.SVDPlusPlus(learn_rate=0.05)
+    model.set_train_points(train_points)
+    model.set_stats(make_stats(train_points))
+    model.initialize_users_and_movies()
+    stopper = early_stopping.EarlyStopping(model, train_points)
+    stopper.evaluate(1)
+    expected_parameters = {name: np.copy(getattr(model, name))
+                           for name in model.get_parameter_names()}
+    model.train_more(epochs=2)
+    stopper.restore_best()
+    for name, parameters in expected_parameters.items():
+        np.testing.assert_array_equal(getattr(model, name), parameters)
+
+
+def test_early_stopping_resumes_with_train_more_from_start_epoch():
+    model = make_mock_model([0.9, 0.8])
+    train_points = np.zeros((1, 4), np.int32)
+    stopper = early_stopping.EarlyStopping(model, train_points,
+                                           eval_every=2)
+    stopper.train(train_points, stats=None, epochs=8, start_epoch=4)
+    model.train.assert_not_called()
+    assert model.train_more.call_args_list == [
+        mock.call(train_points=train_points, epochs=2), mock.call(epochs=2)]
+    assert stopper.epoch_history == [6, 8]
+
+
+def test_early_stopping_restores_accumulators_and_schedule_of_best_epoch():
+    train_points = make_low_rank_train_points(num_points=300)
+    model = svd_euclidean.SVDEuclidean(learn_rate=0.05)
+    model.run_c = True
+    model.adaptive_method = 'adagrad'
+    model.learn_rate_schedule = learning_rates.LearnRateSchedule(
+        'exponential')
+    model.train(train_points, stats=make_stats(train_points), epochs=1)
+    stopper = early_stopping.EarlyStopping(model, train_points)
+    stopper.evaluate(1)
+    accumulators = np.copy(model.user_accumulators)
+    schedule_state = model.learn_rate_schedule.get_state()
+    model.train_more(epochs=2)
+    assert model.learn_rate_schedule.epoch == 3
+    stopper.restore_best()
+    np.testing.assert_array_equal(model.user_accumulators, accumulators)
+    assert model.learn_rate_schedule.get_state() == schedule_state
@@ -0,0 +1,41 @@
+import numpy as np
+
+from utils.constants import FACTOR_ROW_ALIGNMENT
+from utils import factor_layout
+
+
+def test_get_padded_num_features_rounds_rows_up_to_the_alignment():
+    assert factor_layout.get_padded_num_features(1) == 16
+    assert factor_layout.get_padded_num_features(16) == 16
+    assert factor_layout.get_padded_num_features(50) == 64
+    assert factor_layout.get_padded_num_features(50, 'float16') == 64
+    assert factor_layout.get_padded_num_features(70, 'float16') == 96
+
+
+def test_allocate_factors_aligns_every_row_and_zeroes_the_padding():
+    factors = factor_layout.allocate_factors(7, 50, fill_value=0.5)
+    assert factors.shape == (7, 50)
+    assert factors.dtype == np.float32
+    assert factors.ctypes.data % FACTOR_ROW_ALIGNMENT == 0
+    assert factors.strides[0] == 64 * 4
+    assert factor_layout.is_aligned_layout(factors)
+    np.testing.assert_array_equal(factors, np.full((7, 50), 0.5))
+    padded = np.lib.stride_tricks.as_strided(factors, shape=(7, 64))
+    np.testing.assert_array_equal(padded[:, 50:], 0)
+
+
+def test_align_factors_copies_contiguous_factors_into_the_aligned_layout():
+    factors = np.arange(30, dtype=np.float16).reshape(5, 6)
+    aligned = factor_layout.align_factors(factors)
+    assert aligned.dtype == np.float16
+    assert factor_layout.is_aligned_layout(aligned)
+    np.testing.assert_array_equal(aligned, factors)
+    assert factor_layout.align_factors(aligned) is aligned
+
+
+def test_has_padded_rows_rejects_transposed_and_overlapping_rows():
+    assert factor_layout.has_padded_rows(np.zeros((3, 4), dtype=np.float32))
+    assert not factor_layout.has_padded_rows(
+        np.zeros((4, 3), dtype=np.float32).T)
+    assert not factor_layout.has_padded_rows(np.lib.stride_tricks.as_strided(
+        np.zeros(8, dtype=np.float32), shape=(3, 4), strides=(8, 4)))
@@ -0,0 +1,47 @@
+import pytest
+
+from algorithms import learning_rates
+
+
+def test_learn_rate_schedule_rejects_unknown_schedules():
+    with pytest.raises(ValueError):
+        learning_rates.LearnRateSchedule('cosine')
+
+
+def test_constant_schedule_keeps_the_learn_rate():
+    schedule = learning_rates.LearnRateSchedule()
+    for _ in range(5):
+        schedule.end_epoch()
+    assert schedule.get_learn_rate(0.01) == 0.01
+
+
+def test_exponential_schedule_decays_every_epoch():
+    schedule = learning_rates.LearnRateSchedule('exponential', decay=0.5)
+    schedule.end_epoch()
+    schedule.end_epoch()
+    assert schedule.get_learn_rate(1.0) == pytest.approx(0.25)
+
+
+def test_step_schedule_decays_every_step_epochs():
+    schedule = learning_rates.LearnRateSchedule('step', decay=0.5,
+                                                step_epochs=3)
+    learn_rates = []
+    for _ in range(7):
+        schedule.end_epoch()
+        learn_rates.append(schedule.get_learn_rate(1.0))
+    assert learn_rates == [1.0, 1.0, 0.5, 0.5, 0.5, 0.25, 0.25]
+
+
+def test_bold_driver_speeds_up_on_improvement_and_backs_off_otherwise():
+    schedule = learning_rates.LearnRateSchedule('bold_driver', decay=0.5,
+                                                increase=1.1)
+    assert schedule.needs_loss()
+    schedule.end_epoch(loss=1.0)
+    assert schedule.get_learn_rate(1.0) == 1.0
+    schedule.end_epoch(loss=0.9)
+    assert schedule.get_learn_rate(1.0) == pytest.approx(1.1)
+    schedule.end_epoch(loss=0.95)
+    assert schedule.get_learn_rate(1.0) == pytest.approx(0.55)
+    schedule.reset()
+    assert schedule.get_learn_rate(1.0) == 1.0
+    assert schedule.last_loss is None
@@ -1,9 +1,13 @@
 import numpy as np
 import os
 import pickle
+import pytest
 import random
 
 from algorithms import model as model_algorithm
+from algorithms import svd, svd_euclidean
+from tests.helpers import (initialize_model, make_low_rank_train_points,
+                           make_stats)
 from utils import data_paths
 
 
@@ -52,3 +56,94 @@ def test_model_save_writes_the_expected_file():
             os.remove(save_file_path)
         except FileNotFoundError:
             pass
+
+
+def test_checkpoint_round_trip_predicts_like_the_saved_model():
+    model = svd_euclidean.SVDEuclidean(learn_rate=0.05, num_features=3)
+    model.run_c = True
+    train_points = make_low_rank_train_points()
+    model.train(train_points, stats=make_stats(train_points), epochs=2)
+    file_name = 'test.ckpt'
+    file_path = os.path.join(data_paths.MODELS_DIR_PATH, file_name)
+    assert not os.path.isfile(file_path), ('{} is for test use only'
+                                           .format(file_path))
+    try:
+        model.save_checkpoint(file_name, metadata={'epoch': 2})
+        loaded_model = model_algorithm.Model.load_checkpoint(file_name)
+        assert isinstance(loaded_model, svd_euclidean.SVDEuclidean)
+        assert isinstance(loaded_model.users, np.memmap)
+        assert loaded_model.learn_rate == model.learn_rate
+        np.testing.assert_array_equal(loaded_model.stats.movie_averages,
+                                      model.stats.movie_averages)
+        np.testing.assert_array_equal(
+            loaded_model.predict(train_points), model.predict(train_points))
+        del loaded_model
+    finally:
+        if os.path.isfile(file_path):
+            os.remove(file_path)
+
+
+def test_restore_checkpoint_rejects_another_model_class():
+    model = svd_euclidean.SVDEuclidean(num_features=3)
+    initialize_model(model, make_low_rank_train_points())
+    file_name = 'test.ckpt'
+    file_path = os.path.join(data_paths.MODELS_DIR_PATH, file_name)
+    assert not os.path.isfile(file_path), ('{} is for test use only'
+                                           .format(file_path))
+    try:
+        model.save_checkpoint(file_name)
+        with pytest.raises(ValueError):
+            svd.SVD().restore_checkpoint(file_name)
+    finally:
+        if os.path.isfile(file_path):
+            os.remove(file_path)
+
+
+def test_training_resumed_from_checkpoint_matches_uninterrupted_training():
+    train_points = make_low_rank_train_points()
+    model = svd_euclidean.SVDEuclidean(learn_rate=0.05, num_features=3)
+    model.adaptive_method = 'rmsprop'
+    model.run_c = True
+    model.train(train_points, stats=make_stats(train_points), epochs=2)
+    file_name = 'test.ckpt'
+    file_path = os.path.join(data_paths.MODELS_DIR_PATH, file_name)
+    assert not os.path.isfile(file_path), ('{} is for test use only'
+                                           .format(file_path))
+    try:
+        model.save_checkpoint(file_name, metadata={'epoch': 2})
+        resumed_model = svd_euclidean.SVDEuclidean()
+        resumed_model.run_c = True
+        metadata = resumed_model.restore_checkpoint(file_name)
+    finally:
+        if os.path.isfile(file_path):
+            os.remove(file_path)
+    assert metadata == {'epoch': 2}
+    model.train_more(epochs=2)
+    resumed_model.train_more(train_points=train_points, epochs=2)
+    np.testing.assert_array_equal(resumed_model.users, model.users)
+    np.testing.assert_array_equal(resumed_model.movies, model.movies)
+    np.testing.assert_array_equal(resumed_model.user_accumulators,
+                                  model.user_accumulators)
+
+
+def test_restore_checkpoint_keeps_the_runtime_settings_of_the_model():
+    model = svd_euclidean.SVDEuclidean(num_features=3)
+    initialize_model(model, make_low_rank_train_points())
+    model.run_c = True
+    model.num_threads = 4
+    file_name = 'test.ckpt'
+    file_path = os.path.join(data_paths.MODELS_DIR_PATH, file_name)
+    assert not os.path.isfile(file_path), ('{} is for test use only'
+                                           .format(file_path))
+    try:
+        model.save_checkpoint(file_name)
+        resumed_model = svd_euclidean.SVDEuclidean()
+        resumed_model.num_threads = 2
+        resumed_model.restore_checkpoint(file_name)
+        loaded_model = model_algorithm.Model.load_checkpoint(file_name)
+    finally:
+        if os.path.isfile(file_path):
+            os.remove(file_path)
+    assert resumed_model.num_threads == 2 and not resumed_model.run_c
+    assert resumed_model.num_features == 3
+    assert loaded_model.num_threads == 4 and loaded_model.run_c
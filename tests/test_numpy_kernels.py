@@ -0,0 +1,123 @@
+import numpy as np
+
+from algorithms import svd, svd_euclidean
+from tests.helpers import initialize_model, make_low_rank_train_points
+from utils import c_interface, numpy_kernels
+
+
+def test_scatter_add_sums_changes_of_repeated_ids():
+    target = np.zeros((4, 2), dtype=np.float32)
+    ids = np.array([3, 1, 3, 0, 3], dtype=np.int32)
+    changes = np.arange(10, dtype=np.float32).reshape(5, 2)
+    numpy_kernels.scatter_add(target, ids, changes)
+    expected_target = np.zeros((4, 2), dtype=np.float32)
+    np.add.at(expected_target, ids, changes)
+    np.testing.assert_array_equal(target, expected_target)
+
+
+def test_scatter_add_sums_ids_repeated_past_the_direct_rounds():
+    target = np.ones((3, 2), dtype=np.float32)
+    ids = np.array([2, 0] * (numpy_kernels.NUMPY_SCATTER_ROUNDS + 3) + [1],
+                   dtype=np.int32)
+    changes = np.arange(ids.shape[0] * 2, dtype=np.float32).reshape(-1, 2)
+    expected_target = np.copy(target)
+    np.add.at(expected_target, ids, changes)
+    numpy_kernels.scatter_add(target, ids, changes,
+                              updated_rows=target[ids] + changes)
+    np.testing.assert_array_equal(target, expected_target)
+
+
+def test_numpy_kernels_are_registered_for_numpy_backend():
+    assert c_interface.is_kernel_available('svd_update_feature', 'numpy')
+    assert c_interface.is_kernel_available('svd_euclidean_train_epoch',
+                                           'numpy')
+
+
+def test_numpy_train_epoch_with_unit_batches_matches_c_kernel():
+    train_points = make_low_rank_train_points(num_points=300)
+    c_model = svd_euclidean.SVDEuclidean(learn_rate=0.01, num_features=3)
+    numpy_model = svd_euclidean.SVDEuclidean(learn_rate=0.01, num_features=3)
+    initialize_model(c_model, train_points)
+    initialize_model(numpy_model, train_points)
+    numpy_model.users = np.copy(c_model.users)
+    numpy_model.movies = np.copy(c_model.movies)
+    c_model.train_epoch_in_c()
+    numpy_kernels.numpy_svd_euclidean_train_epoch(
+        train_points=train_points, users=numpy_model.users,
+        user_offsets=numpy_model.stats.user_offsets, movies=numpy_model.movies,
+        movie_averages=numpy_model.stats.movie_averages, num_features=3,
+        learn_rate=0.01, k_factor=numpy_model.k_factor, batch_size=1)
+    np.testing.assert_array_almost_equal(numpy_model.users, c_model.users,
+                                         decimal=4)
+    np.testing.assert_array_almost_equal(numpy_model.movies, c_model.movies,
+                                         decimal=4)
+
+
+def test_svd_euclidean_numpy_backend_reduces_train_error():
+    train_points = make_low_rank_train_points()
+    model = svd_euclidean.SVDEuclidean(learn_rate=0.02, num_features=2,
+                                       feature_initial=0.1)
+    model.backend = 'numpy'
+    initialize_model(model, train_points)
+    ratings = train_points[:, 3]
+    first_rmse = np.sqrt(np.mean((model.predict(train_points) - ratings) ** 2))
+    model.train_more(epochs=20)
+    last_rmse = np.sqrt(np.mean((model.predict(train_points) - ratings) ** 2))
+    assert last_rmse < first_rmse
+
+
+def test_svd_numpy_backend_only_updates_the_trained_feature():
+    train_points = make_low_rank_train_points()
+    model = svd.SVD(learn_rate=0.02, num_features=3)
+    model.backend = 'numpy'
+    initialize_model(model, train_points)
+    initial_users = np.copy(model.users)
+    model.update_all_features()
+    assert not np.allclose(model.users, initial_users)
+    model.users[:, 1:] = initial_users[:, 1:]
+    model.update_feature_with_kernel(0, 'numpy')
+    np.testing.assert_array_equal(model.users[:, 1:], initial_users[:, 1:])
+
+
+def test_numpy_train_epoch_follows_order_like_reordered_points():
+    train_points = make_low_rank_train_points(num_points=300)
+    order = np.random.RandomState(4).permutation(300).astype(np.int32)
+    ordered_model = svd_euclidean.SVDEuclidean(learn_rate=0.01,
+                                               num_features=3)
+    initialize_model(ordered_model, train_points)
+    users = np.copy(ordered_model.users)
+    movies = np.copy(ordered_model.movies)
+    arguments = {'user_offsets': ordered_model.stats.user_offsets,
+                 'movie_averages': ordered_model.stats.movie_averages,
+                 'num_features': 3, 'learn_rate': 0.01,
+                 'k_factor': ordered_model.k_factor, 'batch_size': 64}
+    numpy_kernels.numpy_svd_euclidean_train_epoch(
+        train_points=train_points, users=ordered_model.users,
+        movies=ordered_model.movies, order=order, **arguments)
+    numpy_kernels.numpy_svd_euclidean_train_epoch(
+        train_points=train_points[order], users=users, movies=movies,
+        **arguments)
+    np.testing.assert_array_equal(ordered_model.users, users)
+    np.testing.assert_array_equal(ordered_model.movies, movies)
+
+
+def test_numpy_update_feature_follows_order_like_reordered_points():
+    train_points = make_low_rank_train_points(num_points=300)
+    order = np.random.RandomState(4).permutation(300).astype(np.int32)
+    ordered_model = svd.SVD(learn_rate=0.01, num_features=3)
+    initialize_model(ordered_model, train_points)
+    users = np.copy(ordered_model.users)
+    movies = np.copy(ordered_model.movies)
+    arguments = {'user_offsets': ordered_model.stats.user_offsets,
+                 'movie_averages': ordered_model.stats.movie_averages,
+                 'residuals': ordered_model.residuals, 'feature': 1,
+                 'num_features': 3, 'learn_rate': 0.01,
+                 'k_factor': ordered_model.k_factor, 'batch_size': 64}
+    numpy_kernels.numpy_svd_update_feature(
+        train_points=train_points, users=ordered_model.users,
+        movies=ordered_model.movies, order=order, **arguments)
+    numpy_kernels.numpy_svd_update_feature(
+        train_points=train_points[order], users=users, movies=movies,
+        **arguments)
+    np.testing.assert_array_equal(ordered_model.users, users)
+    np.testing.assert_array_equal(ordered_model.movies, movies)
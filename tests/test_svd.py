@@ -1,4 +1,5 @@
 import numpy as np
+import pytest
 import random
 try:
     from unittest import mock
@@ -189,6 +190,92 @@ def test_svd_predict_returns_expected_ratings():
     np.testing.assert_array_almost_equal(actual_ratings, expected_ratings)
 
 
+def test_svd_predict_in_chunks_matches_clipped_point_predictions():
+    model = svd.SVD(num_features=4)
+    initialize_model_with_simple_train_points_but_do_not_train(model)
+    model.users = np.random.normal(scale=1.0, size=model.users.shape)
+    model.movies = np.random.normal(scale=1.0, size=model.movies.shape)
+    test_points = np.random.randint(1, 6, (101, 4)).astype(np.int32)
+    expected_ratings = np.array(
+        [min(max(model.calculate_prediction(user, movie), 1), 5)
+         for user, movie, _, _ in test_points], dtype=np.float32)
+    with mock.patch('algorithms.model.PREDICT_CHUNK_SIZE', 16):
+        actual_ratings = model.predict(test_points)
+    np.testing.assert_array_almost_equal(actual_ratings, expected_ratings,
+                                         decimal=5)
+
+
+def test_svd_calculate_rmse_in_chunks_matches_rmse_of_predictions():
+    model = svd.SVD(num_features=4)
+    initialize_model_with_simple_train_points_but_do_not_train(model)
+    model.movies = np.random.normal(scale=1.0, size=model.movies.shape)
+    test_points = np.random.randint(1, 6, (101, 4)).astype(np.int32)
+    errors = model.predict(test_points) - test_points[:, 3]
+    with mock.patch('algorithms.model.PREDICT_CHUNK_SIZE', 16):
+        rmse = model.calculate_rmse(test_points)
+    np.testing.assert_almost_equal(rmse, np.sqrt(np.mean(errors ** 2)),
+                                   decimal=5)
+
+
+def test_svd_predict_and_rmse_in_c_match_python_predictions():
+    model = svd.SVD(num_features=4)
+    initialize_model_with_simple_train_points_but_do_not_train(model)
+    model.movies[:] = np.random.normal(scale=1.0, size=model.movies.shape)
+    test_points = np.random.randint(1, 6, (101, 4)).astype(np.int32)
+    expected_ratings = model.predict(test_points)
+    expected_rmse = model.calculate_rmse(test_points)
+    model.run_c = True
+    model.num_threads = 2
+    with mock.patch('algorithms.svd.c_predict',
+                    side_effect=svd.c_predict) as c_predict:
+        actual_ratings = model.predict(test_points)
+    assert c_predict.call_count == 1
+    np.testing.assert_array_almost_equal(actual_ratings, expected_ratings,
+                                         decimal=5)
+    np.testing.assert_almost_equal(model.calculate_rmse(test_points),
+                                   expected_rmse, decimal=5)
+
+
+def test_svd_update_feature_in_c_with_adagrad_only_accumulates_that_feature():
+    model = svd.SVD(learn_rate=0.05, num_features=3)
+    initialize_model_with_simple_train_points_but_do_not_train(model)
+    model.adaptive_method = 'adagrad'
+    model.movies[:] = np.random.normal(scale=0.1, size=model.movies.shape)
+    model.update_feature_in_c(0)
+    assert np.all(model.user_accumulators[[1, 2, 3, 4, 5], 0] > 0)
+    assert not np.any(model.user_accumulators[:, 1:])
+    assert not np.any(model.movie_accumulators[:, 1:])
+    model.num_threads = 2
+    model.update_feature_in_c(1)
+    assert np.all(model.movie_accumulators[[1, 2, 3, 4, 5], 1] > 0)
+
+
+def test_svd_train_with_adaptive_rates_reduces_train_rmse():
+    train_points = make_simple_train_points()
+    model = svd.SVD(learn_rate=0.05, num_features=2)
+    model.adaptive_method = 'rmsprop'
+    model.run_c = True
+    model.train(train_points, stats=make_simple_stats(), epochs=1)
+    first_rmse = model.calculate_rmse(train_points)
+    model.train_more(epochs=20)
+    assert model.calculate_rmse(train_points) < first_rmse
+
+
+def test_svd_trains_and_predicts_with_float16_factors():
+    train_points = make_simple_train_points()
+    model = svd.SVD(learn_rate=0.05, num_features=2)
+    model.factor_dtype = 'float16'
+    model.run_c = True
+    model.train(train_points, stats=make_simple_stats(), epochs=1)
+    assert model.users.dtype == np.float16
+    first_rmse = model.calculate_rmse(train_points)
+    model.train_more(epochs=20)
+    python_predictions = model_algorithm.Model.predict(model, train_points)
+    np.testing.assert_array_almost_equal(model.predict(train_points),
+                                         python_predictions, decimal=5)
+    assert model.calculate_rmse(train_points) < first_rmse
+
+
 def test_svd_train_more_does_not_set_train_points_when_none_passed():
     model = svd.SVD()
     model.initialize_users_and_movies = MockThatAvoidsErrors()
@@ -331,6 +418,24 @@ def test_svd_update_feature_in_c_modifies_users_and_movies_as_expected():
                                              decimal=4)
 
 
+def test_svd_update_feature_in_c_clips_the_first_prediction_once():
+    model = svd.SVD(num_features=2, learn_rate=0.1, k_factor=0)
+    model.set_train_points(np.array([(1, 2, 0, 4)], dtype=np.int32))
+    model.set_stats(make_simple_stats())
+    model.initialize_users_and_movies()
+    # The partial sum leaves the rating range only before the second term
+    model.users[1, :2] = (2, 2)
+    model.movies[2, :2] = (2, -2)
+    baseline = model.stats.get_baseline(user=1, movie=2)
+    error = 4 - np.clip(baseline + np.dot(model.users[1, :2],
+                                          model.movies[2, :2]), 1, 5)
+    expected_user = 2 + 0.1 * error * 2
+    expected_movie = 2 + 0.1 * error * 2
+    model.update_feature_in_c(0)
+    assert model.users[1, 0] == pytest.approx(expected_user, abs=1e-5)
+    assert model.movies[2, 0] == pytest.approx(expected_movie, abs=1e-5)
+
+
 def test_svd_update_user_and_movie_modifies_matrices_as_expected():
     from utils.data_io import get_user_movie_time_rating
     model = svd.SVD(learn_rate=10, k_factor=0.5)
@@ -358,3 +463,289 @@ def test_svd_update_user_and_movie_modifies_matrices_as_expected():
             actual_movies = model.movies
             np.testing.assert_array_almost_equal(actual_users, expected_users)
             np.testing.assert_array_almost_equal(actual_movies, expected_movies)
+
+
+def test_svd_update_feature_in_c_reads_compact_points():
+    int32_model = svd.SVD()
+    compact_model = svd.SVD()
+    initialize_model_with_simple_train_points_but_do_not_train(int32_model)
+    initialize_model_with_simple_train_points_but_do_not_train(compact_model)
+    compact_model.set_train_points(
+        data_io.compact_points_from_array(make_simple_train_points()))
+    for feature in range(int32_model.num_features):
+        int32_model.update_feature_in_c(feature)
+        compact_model.update_feature_in_c(feature)
+    np.testing.assert_array_equal(compact_model.users, int32_model.users)
+    np.testing.assert_array_equal(compact_model.movies, int32_model.movies)
+
+
+def test_svd_update_feature_stratified_in_c_matches_serial_block_order():
+    from utils.data_ordering import (compute_stratified_order,
+                                     get_stratum_blocks)
+    from tests.test_data_ordering import make_random_points
+    train_points = make_random_points()
+    stats = data_stats.DataStats()
+    stats.load_data_set(data_set=train_points)
+    stats.compute_stats()
+    num_blocks = 3
+    order, block_offsets = compute_stratified_order(train_points, num_blocks)
+    serial_order = np.concatenate(
+        [order[block_offsets[block]:block_offsets[block + 1]]
+         for stratum in range(num_blocks)
+         for block in get_stratum_blocks(stratum, num_blocks)])
+    serial_model = svd.SVD(learn_rate=0.05, num_features=3)
+    parallel_model = svd.SVD(learn_rate=0.05, num_features=3)
+    serial_model.set_train_points(np.ascontiguousarray(
+        train_points[serial_order]))
+    parallel_model.set_train_points(train_points)
+    parallel_model.num_threads = num_blocks
+    for model in (serial_model, parallel_model):
+        model.set_stats(stats)
+        model.initialize_users_and_movies()
+    for feature in range(serial_model.num_features):
+        serial_model.update_feature_in_c(feature)
+        parallel_model.update_feature_in_c(feature)
+    np.testing.assert_array_equal(parallel_model.users, serial_model.users)
+    np.testing.assert_array_equal(parallel_model.movies, serial_model.movies)
+
+
+def test_svd_compute_residual_cache_holds_baseline_and_frozen_features():
+    model = svd.SVD(num_features=3)
+    initialize_model_with_simple_train_points_but_do_not_train(model)
+    model.users = np.random.normal(size=model.users.shape).astype(np.float32)
+    model.movies = np.random.normal(size=model.movies.shape).astype(
+        np.float32)
+    model.num_frozen_features = 2
+    model.compute_residual_cache()
+    for p, (user, movie, _, _) in enumerate(model.train_points):
+        expected_residual = (model.stats.get_baseline(user, movie) +
+                             np.dot(model.users[user, :2],
+                                    model.movies[movie, :2]))
+        np.testing.assert_almost_equal(model.residual_cache[p],
+                                       expected_residual, decimal=5)
+
+
+def test_svd_update_cached_feature_in_c_matches_python_reference():
+    model = svd.SVD(learn_rate=0.05, num_features=3)
+    initialize_model_with_simple_train_points_but_do_not_train(model)
+    model.num_frozen_features = 1
+    model.compute_residual_cache()
+    feature = 1
+    expected_users = np.copy(model.users)
+    expected_movies = np.copy(model.movies)
+    for p, (user, movie, _, rating) in enumerate(model.train_points):
+        prediction = min(max(model.residual_cache[p] +
+                             expected_users[user, feature] *
+                             expected_movies[movie, feature], 1), 5)
+        error = rating - prediction
+        user_value = expected_users[user, feature]
+        movie_value = expected_movies[movie, feature]
+        expected_users[user, feature] += model.learn_rate * (
+            error * movie_value - model.k_factor * user_value)
+        expected_movies[movie, feature] += model.learn_rate * (
+            error * user_value - model.k_factor * movie_value)
+    model.update_cached_feature_in_c(feature)
+    np.testing.assert_array_almost_equal(model.users, expected_users)
+    np.testing.assert_array_almost_equal(model.movies, expected_movies)
+
+
+def test_svd_train_feature_epoch_freezes_every_feature_into_the_cache():
+    model = svd.SVD(learn_rate=0.05, num_features=3)
+    model.train_feature_epoch(make_simple_train_points(), make_simple_stats(),
+                              epochs=2)
+    assert model.num_frozen_features == model.num_features
+    expected_cache = np.copy(model.residual_cache)
+    model.compute_residual_cache()
+    np.testing.assert_array_almost_equal(model.residual_cache, expected_cache,
+                                         decimal=5)
+
+
+def test_svd_train_more_feature_epoch_reuses_saved_residual_cache():
+    import os
+    from utils.data_paths import MODELS_DIR_PATH
+    model = svd.SVD(learn_rate=0.05, num_features=3)
+    initialize_model_with_simple_train_points_but_do_not_train(model)
+    model.compute_residual_cache()
+    model.update_cached_feature_in_c(0)
+    model.freeze_feature(0)
+    model_file_name = 'test_residual_cache.p'
+    residual_file_path = os.path.join(
+        MODELS_DIR_PATH, svd.get_residual_cache_file_name(model_file_name))
+    model_file_path = os.path.join(MODELS_DIR_PATH, model_file_name)
+    assert not os.path.isfile(model_file_path), ('{} is for test use only'
+                                                 .format(model_file_path))
+    try:
+        model.save(model_file_name)
+        loaded_model = svd.SVD.load(model_file_name)
+        assert loaded_model.residual_cache.size == 0
+        loaded_model.compute_residual_cache = mock.Mock()
+        loaded_model.train_more_feature_epoch(make_simple_train_points(),
+                                              epochs=1)
+        assert loaded_model.compute_residual_cache.call_count == 0
+        assert loaded_model.num_frozen_features == loaded_model.num_features
+    finally:
+        for file_path in (model_file_path, residual_file_path):
+            if os.path.isfile(file_path):
+                os.remove(file_path)
+
+
+def test_svd_residual_cache_is_recomputed_for_edited_points_or_new_stats():
+    model = svd.SVD(learn_rate=0.05, num_features=3)
+    initialize_model_with_simple_train_points_but_do_not_train(model)
+    model.compute_residual_cache()
+    model.compute_residual_cache = mock.Mock()
+    model.ensure_residual_cache()
+    assert model.compute_residual_cache.call_count == 0
+    edited_points = make_simple_train_points()
+    edited_points[3, 3] = 5
+    model.set_train_points(edited_points)
+    model.ensure_residual_cache()
+    assert model.compute_residual_cache.call_count == 1
+    svd.SVD.compute_residual_cache(model)
+    stats = make_simple_stats()
+    stats.user_offsets = stats.user_offsets + 0.5
+    model.set_stats(stats)
+    assert model.residual_cache.size == 0
+    model.ensure_residual_cache()
+    assert model.compute_residual_cache.call_count == 2
+
+def test_svd_feature_epoch_resumed_from_checkpoint_trains_remaining_features():
+    import os
+    from utils.data_paths import MODELS_DIR_PATH
+    model = svd.SVD(learn_rate=0.05, num_features=3)
+    model.run_c = True
+    checkpoints = []
+
+    def save_after_first_feature(num_frozen_features):
+        checkpoints.append(num_frozen_features)
+        if num_frozen_features == 1:
+            model.save_checkpoint(file_name)
+    file_name = 'test.ckpt'
+    file_path = os.path.join(MODELS_DIR_PATH, file_name)
+    assert not os.path.isfile(file_path), ('{} is for test use only'
+                                           .format(file_path))
+    try:
+        model.train_feature_epoch(make_simple_train_points(),
+                                  make_simple_stats(), epochs=2,
+                                  callback=save_after_first_feature)
+        resumed_model = svd.SVD()
+        resumed_model.run_c = True
+        resumed_model.restore_checkpoint(file_name)
+    finally:
+        if os.path.isfile(file_path):
+            os.remove(file_path)
+    assert checkpoints == [1, 2, 3]
+    assert resumed_model.num_frozen_features == 1
+    resumed_checkpoints = []
+    resumed_model.train_more_feature_epoch(
+        make_simple_train_points(), epochs=2,
+        callback=resumed_checkpoints.append)
+    assert resumed_checkpoints == [2, 3]
+    np.testing.assert_array_almost_equal(resumed_model.users, model.users,
+                                         decimal=5)
+    np.testing.assert_array_almost_equal(resumed_model.movies, model.movies,
+                                         decimal=5)
+
+
+def make_model_with_random_factors():
+    model = svd.SVD(num_features=4)
+    initialize_model_with_simple_train_points_but_do_not_train(model)
+    model.users[:] = np.random.normal(scale=1.0, size=model.users.shape)
+    model.movies[:] = np.random.normal(scale=1.0, size=model.movies.shape)
+    return model
+
+
+def test_svd_recommend_matches_sorted_unrated_predictions():
+    model = make_model_with_random_factors()
+    train_points = make_simple_train_points()
+    users = np.arange(model.max_user)
+    with mock.patch('algorithms.svd.RECOMMEND_BATCH_USERS', 2):
+        movies, ratings = model.recommend(users, n=3)
+    for user in users:
+        rated_movies = train_points[train_points[:, 0] == user, 1]
+        unrated_movies = np.setdiff1d(np.arange(model.max_movie),
+                                      rated_movies)
+        predictions = model.calculate_predictions(
+            np.full(unrated_movies.shape, user), unrated_movies)
+        expected_ratings = np.sort(predictions)[::-1][:3]
+        np.testing.assert_array_almost_equal(ratings[user], expected_ratings,
+                                             decimal=5)
+        assert not np.any(np.isin(movies[user], rated_movies))
+        np.testing.assert_array_almost_equal(
+            model.calculate_predictions(np.full(3, user), movies[user]),
+            ratings[user], decimal=5)
+
+
+def test_svd_recommend_builds_the_rated_index_once_per_train_points():
+    model = make_model_with_random_factors()
+    with mock.patch('algorithms.svd.build_user_index',
+                    side_effect=svd.build_user_index) as build_user_index:
+        model.recommend([1, 2], n=2)
+        model.recommend([3], n=2)
+        assert build_user_index.call_count == 1
+        model.set_train_points(make_simple_train_points())
+        model.recommend([1], n=2)
+        assert build_user_index.call_count == 2
+
+
+def test_svd_recommend_pads_users_without_enough_unrated_movies():
+    model = make_model_with_random_factors()
+    movies, ratings = model.recommend([1, 2], n=model.max_movie)
+    # User 1 rated movies 2 and 3, user 2 only movie 3
+    assert np.all(movies[0, -2:] == -1) and np.all(np.isnan(ratings[0, -2:]))
+    assert np.all(movies[0, :-2] >= 0)
+    assert movies[1, -1] == -1 and np.all(movies[1, :-1] >= 0)
+
+
+def test_svd_recommend_without_exclusion_ranks_every_movie():
+    model = make_model_with_random_factors()
+    movies, _ = model.recommend([1], n=model.max_movie, exclude_rated=False)
+    np.testing.assert_array_equal(np.sort(movies[0]),
+                                  np.arange(model.max_movie))
+
+
+def test_svd_recommend_asks_for_rated_index_without_train_points():
+    model = make_model_with_random_factors()
+    model.train_points = np.array([])
+    with pytest.raises(ValueError):
+        model.recommend([1], n=2)
+    movies, _ = model.recommend([1], n=2, exclude_rated=False)
+    assert movies.shape == (1, 2)
+
+
+@pytest.mark.parametrize('n', [0, -1])
+def test_svd_recommend_rejects_n_below_one(n):
+    model = make_model_with_random_factors()
+    with pytest.raises(ValueError):
+        model.recommend([1], n=n)
+
+
+def test_select_top_n_returns_highest_columns_first():
+    scores = np.array([[0.5, 3.0, -1.0, 2.0],
+                       [1.0, 0.0, 4.0, 2.0]], dtype=np.float32)
+    np.testing.assert_array_equal(svd.select_top_n(scores, 2),
+                                  [[1, 3], [2, 3]])
+    np.testing.assert_array_equal(svd.select_top_n(scores, 4),
+                                  [[1, 3, 0, 2], [2, 3, 0, 1]])
+
+
+def test_svd_select_backend_rejects_run_c_without_the_c_kernel():
+    model = svd.SVD()
+    with mock.patch('algorithms.svd.is_kernel_available', return_value=False):
+        assert model.select_backend('svd_update_feature') == 'python'
+        model.run_c = True
+        with pytest.raises(ValueError):
+            model.select_backend('svd_update_feature')
+
+
+@pytest.mark.parametrize('feature_epoch', [False, True])
+def test_svd_rejects_training_order_it_would_ignore(feature_epoch):
+    from utils.data_ordering import TrainingOrder
+    model = svd.SVD()
+    model.training_order = TrainingOrder('shuffled')
+    with pytest.raises(ValueError):
+        if feature_epoch:
+            model.train_feature_epoch(make_simple_train_points(),
+                                      make_simple_stats(), epochs=1)
+        else:
+            model.train(make_simple_train_points(), make_simple_stats())
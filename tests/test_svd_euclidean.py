@@ -1,11 +1,14 @@
 import numpy as np
+import pickle
+import pytest
 try:
     from unittest import mock
 except ImportError:  # Python 2
     import mock
 
-from algorithms import svd, svd_euclidean
-from utils import data_io, data_stats
+from algorithms import learning_rates, svd, svd_euclidean
+from utils import data_io, data_ordering, data_stats
+from utils.factor_layout import is_aligned_layout
 
 MockThatAvoidsErrors = mock.Mock
 MockThatAvoidsLongRunTime = mock.Mock
@@ -145,6 +148,21 @@ def test_update_euclidean_all_features_calls_update_user_and_movie_for_each_feat
                                                  any_order=True)
 
 
+def test_svd_euclidean_factors_use_aligned_layout_after_reloading():
+    model = svd_euclidean.SVDEuclidean(num_features=20)
+    initialize_model_with_simple_train_points_but_do_not_train(model)
+    assert is_aligned_layout(model.users)
+    assert is_aligned_layout(model.movies)
+    users = model.users.copy()
+    model = pickle.loads(pickle.dumps(model))
+    assert not is_aligned_layout(model.users)
+    model.run_c = True
+    model.train_more(epochs=0)
+    assert is_aligned_layout(model.users)
+    assert is_aligned_layout(model.movies)
+    np.testing.assert_array_equal(model.users, users)
+
+
 def test_train_epoch_in_c_returns_same_as_train_epoch():
     py_model = svd_euclidean.SVDEuclidean(learn_rate=10, k_factor=0.5)
     c_model = svd_euclidean.SVDEuclidean(learn_rate=10, k_factor=0.5)
@@ -158,9 +176,248 @@ def test_train_epoch_in_c_returns_same_as_train_epoch():
     np.testing.assert_array_almost_equal(c_model.movies, py_model.movies)
 
 
+def test_train_epoch_in_c_reads_compact_points():
+    int32_model = svd_euclidean.SVDEuclidean(learn_rate=10, k_factor=0.5)
+    compact_model = svd_euclidean.SVDEuclidean(learn_rate=10, k_factor=0.5)
+    initialize_model_with_simple_train_points_but_do_not_train(int32_model)
+    initialize_model_with_simple_train_points_but_do_not_train(compact_model)
+    compact_model.set_train_points(
+        data_io.compact_points_from_array(make_simple_train_points()))
+    compact_model.users = np.copy(int32_model.users)
+    compact_model.movies = np.copy(int32_model.movies)
+    int32_model.train_epoch_in_c()
+    compact_model.train_epoch_in_c()
+    np.testing.assert_array_equal(compact_model.users, int32_model.users)
+    np.testing.assert_array_equal(compact_model.movies, int32_model.movies)
+
+
 @mock.patch('utils.c_interface.c_svd_euclidean_train_epoch')
 def test_train_epoch_in_c_calls_c_svd_euclidean_train_epoch(mock_c_train):
     model = svd_euclidean.SVDEuclidean()
     initialize_model_with_simple_train_points_but_do_not_train(model)
     model.train_epoch_in_c()
     assert mock_c_train.call_count == 1
+
+
+def test_train_epoch_in_c_with_threads_matches_single_thread_on_disjoint_rows():
+    # Each quarter of the points touches its own users and movies, so the
+    # lock-free workers never share a row and must match a serial epoch.
+    num_points = 64
+    ids = np.arange(num_points, dtype=np.int32)
+    train_points = np.column_stack(
+        (ids, ids, np.zeros(num_points, dtype=np.int32),
+         ids % 5 + 1)).astype(np.int32)
+    stats = data_stats.DataStats()
+    stats.load_data_set(data_set=train_points)
+    stats.compute_stats()
+    serial_model = svd_euclidean.SVDEuclidean(learn_rate=0.1, num_features=4)
+    threaded_model = svd_euclidean.SVDEuclidean(learn_rate=0.1,
+                                                num_features=4)
+    for model in (serial_model, threaded_model):
+        model.set_train_points(train_points)
+        model.set_stats(stats)
+        model.initialize_users_and_movies()
+    threaded_model.users = np.copy(serial_model.users)
+    threaded_model.movies = np.copy(serial_model.movies)
+    threaded_model.num_threads = 4
+    serial_model.train_epoch_in_c()
+    threaded_model.train_epoch_in_c()
+    np.testing.assert_array_equal(threaded_model.users, serial_model.users)
+    np.testing.assert_array_equal(threaded_model.movies, serial_model.movies)
+
+
+@mock.patch('utils.c_interface.c_svd_euclidean_train_epoch')
+def test_train_more_passes_num_threads_to_c_kernel(mock_c_train):
+    model = svd_euclidean.SVDEuclidean()
+    model.run_c = True
+    initialize_model_with_simple_train_points_but_do_not_train(model)
+    model.train_more(epochs=1, num_threads=3)
+    assert model.num_threads == 3
+    assert mock_c_train.call_args[1]['num_threads'] == 3
+
+
+def train_adagrad_epoch_in_python(model, user_accumulators,
+                                  movie_accumulators):
+    for user, movie, _, rating in model.train_points:
+        prediction = model.stats.get_baseline(user, movie)
+        for feature in range(model.num_features):
+            prediction += model.users[user, feature] * model.movies[movie,
+                                                                    feature]
+        error = rating - min(max(prediction, 1), 5)
+        for feature in range(model.num_features):
+            user_value = model.users[user, feature]
+            movie_value = model.movies[movie, feature]
+            user_direction = error * movie_value - model.k_factor * user_value
+            movie_direction = error * user_value - model.k_factor * movie_value
+            user_accumulators[user, feature] += user_direction ** 2
+            movie_accumulators[movie, feature] += movie_direction ** 2
+            model.users[user, feature] += (
+                model.learn_rate * user_direction /
+                (np.sqrt(user_accumulators[user, feature]) + 1e-6))
+            model.movies[movie, feature] += (
+                model.learn_rate * movie_direction /
+                (np.sqrt(movie_accumulators[movie, feature]) + 1e-6))
+
+
+def test_train_epoch_in_c_with_adagrad_matches_python_reference():
+    model = svd_euclidean.SVDEuclidean(learn_rate=0.05, num_features=3)
+    initialize_model_with_simple_train_points_but_do_not_train(model)
+    model.adaptive_method = 'adagrad'
+    expected_users = np.copy(model.users)
+    expected_movies = np.copy(model.movies)
+    reference_model = svd_euclidean.SVDEuclidean(learn_rate=0.05,
+                                                 num_features=3)
+    initialize_model_with_simple_train_points_but_do_not_train(
+        reference_model)
+    reference_model.users = expected_users
+    reference_model.movies = expected_movies
+    user_accumulators = np.zeros_like(expected_users, dtype=np.float64)
+    movie_accumulators = np.zeros_like(expected_movies, dtype=np.float64)
+    for _ in range(2):
+        model.train_epoch_in_c()
+        train_adagrad_epoch_in_python(reference_model, user_accumulators,
+                                      movie_accumulators)
+    np.testing.assert_array_almost_equal(model.users, expected_users,
+                                         decimal=4)
+    np.testing.assert_array_almost_equal(model.movies, expected_movies,
+                                         decimal=4)
+    np.testing.assert_array_almost_equal(model.user_accumulators,
+                                         user_accumulators, decimal=4)
+
+
+def test_adaptive_accumulators_persist_through_save_for_train_more():
+    model = svd_euclidean.SVDEuclidean(learn_rate=0.05, num_features=3)
+    model.adaptive_method = 'rmsprop'
+    model.run_c = True
+    model.train(make_simple_train_points(), stats=make_simple_stats(),
+                epochs=2)
+    assert np.all(model.user_accumulators[1] > 0)
+    loaded_model = pickle.loads(pickle.dumps(model))
+    np.testing.assert_array_equal(loaded_model.user_accumulators,
+                                  model.user_accumulators)
+    accumulators = loaded_model.movie_accumulators
+    loaded_model.train_more(epochs=1)
+    assert loaded_model.movie_accumulators is accumulators
+
+
+def test_run_epoch_rejects_adaptive_rates_without_c_backend():
+    model = svd_euclidean.SVDEuclidean()
+    initialize_model_with_simple_train_points_but_do_not_train(model)
+    model.adaptive_method = 'adagrad'
+    model.backend = 'numpy'
+    with pytest.raises(ValueError):
+        model.run_epoch()
+
+
+@mock.patch('utils.c_interface.c_svd_euclidean_train_epoch')
+def test_train_passes_scheduled_learn_rates_to_c_kernel(mock_c_train):
+    model = svd_euclidean.SVDEuclidean(learn_rate=0.1)
+    model.run_c = True
+    model.learn_rate_schedule = learning_rates.LearnRateSchedule(
+        'exponential', decay=0.5)
+    model.train(make_simple_train_points(), stats=make_simple_stats(),
+                epochs=3)
+    learn_rates = [call[1]['learn_rate'] for call in
+                   mock_c_train.call_args_list]
+    np.testing.assert_array_almost_equal(learn_rates, [0.1, 0.05, 0.025])
+
+
+def train_float16_epoch_in_python(model):
+    learn_rate = np.float32(model.learn_rate)
+    k_factor = np.float32(model.k_factor)
+    for user, movie, _, rating in model.train_points:
+        prediction = np.float32(model.stats.get_baseline(user, movie))
+        for feature in range(model.num_features):
+            prediction += (np.float32(model.users[user, feature]) *
+                           np.float32(model.movies[movie, feature]))
+        prediction = min(max(prediction, np.float32(1)), np.float32(5))
+        error = np.float32(rating) - prediction
+        for feature in range(model.num_features):
+            user_value = np.float32(model.users[user, feature])
+            movie_value = np.float32(model.movies[movie, feature])
+            model.movies[movie, feature] = movie_value + learn_rate * (
+                error * user_value - k_factor * movie_value)
+            model.users[user, feature] = user_value + learn_rate * (
+                error * movie_value - k_factor * user_value)
+
+
+def test_train_epoch_in_c_with_float16_factors_rounds_like_numpy():
+    model = svd_euclidean.SVDEuclidean(learn_rate=0.1, num_features=3)
+    model.factor_dtype = 'float16'
+    initialize_model_with_simple_train_points_but_do_not_train(model)
+    assert model.users.dtype == np.float16
+    reference_model = svd_euclidean.SVDEuclidean(learn_rate=0.1,
+                                                 num_features=3)
+    initialize_model_with_simple_train_points_but_do_not_train(
+        reference_model)
+    reference_model.users = np.copy(model.users)
+    reference_model.movies = np.copy(model.movies)
+    for _ in range(3):
+        model.train_epoch_in_c()
+        train_float16_epoch_in_python(reference_model)
+    np.testing.assert_allclose(model.users, reference_model.users,
+                               rtol=1e-3)
+    np.testing.assert_allclose(model.movies, reference_model.movies,
+                               rtol=1e-3)
+    np.testing.assert_array_almost_equal(
+        model.predict(model.train_points),
+        reference_model.predict(model.train_points), decimal=2)
+
+
+def test_run_epoch_rejects_float16_factors_without_c_backend():
+    model = svd_euclidean.SVDEuclidean()
+    model.factor_dtype = 'float16'
+    initialize_model_with_simple_train_points_but_do_not_train(model)
+    model.backend = 'numpy'
+    with pytest.raises(ValueError):
+        model.run_epoch()
+
+
+def test_train_epoch_in_c_follows_order_like_reordered_points():
+    train_points = make_simple_train_points()
+    order = np.array([4, 0, 6, 3, 1, 5, 2], dtype=np.int32)
+    ordered_model = svd_euclidean.SVDEuclidean(learn_rate=0.1,
+                                               num_features=4)
+    copied_model = svd_euclidean.SVDEuclidean(learn_rate=0.1, num_features=4)
+    initialize_model_with_simple_train_points_but_do_not_train(ordered_model)
+    initialize_model_with_simple_train_points_but_do_not_train(copied_model)
+    copied_model.set_train_points(np.ascontiguousarray(train_points[order]))
+    copied_model.users = np.copy(ordered_model.users)
+    copied_model.movies = np.copy(ordered_model.movies)
+    ordered_model.train_epoch_in_c(order=order)
+    copied_model.train_epoch_in_c()
+    np.testing.assert_array_equal(ordered_model.users, copied_model.users)
+    np.testing.assert_array_equal(ordered_model.movies, copied_model.movies)
+
+
+@pytest.mark.parametrize('backend', ['c', 'numpy', 'python'])
+def test_run_epoch_passes_the_training_order_to_every_backend(backend):
+    model = svd_euclidean.SVDEuclidean()
+    initialize_model_with_simple_train_points_but_do_not_train(model)
+    model.backend = backend
+    model.training_order = data_ordering.TrainingOrder('shuffled', seed=0)
+    model.train_epoch_in_c = mock.Mock()
+    model.train_epoch = mock.Mock()
+    model.train_epoch_with_kernel = mock.Mock()
+    model.run_epoch()
+    expected_order = data_ordering.TrainingOrder(
+        'shuffled', seed=0).get_epoch_order(model.train_points)
+    calls = (model.train_epoch_in_c.call_args_list +
+             model.train_epoch.call_args_list +
+             model.train_epoch_with_kernel.call_args_list)
+    assert len(calls) == 1
+    np.testing.assert_array_equal(calls[0][1]['order'], expected_order)
+
+
+def test_train_epoch_follows_order_like_train_epoch_in_c():
+    py_model = svd_euclidean.SVDEuclidean(learn_rate=10, k_factor=0.5)
+    c_model = svd_euclidean.SVDEuclidean(learn_rate=10, k_factor=0.5)
+    initialize_model_with_simple_train_points_but_do_not_train(py_model)
+    initialize_model_with_simple_train_points_but_do_not_train(c_model)
+    order = np.array([6, 5, 4, 3, 2, 1, 0], dtype=np.int32)
+    c_model.users = np.copy(py_model.users)
+    c_model.movies = np.copy(py_model.movies)
+    py_model.train_epoch(order=order)
+    c_model.train_epoch_in_c(order=order)
+    np.testing.assert_array_almost_equal(c_model.users, py_model.users)
+    np.testing.assert_array_almost_equal(c_model.movies, py_model.movies)
@@ -0,0 +1,160 @@
+import numpy as np
+import pytest
+
+from algorithms import learning_rates, svd, svd_plus_plus
+from utils import data_ordering
+from tests.helpers import (initialize_model, make_low_rank_train_points,
+                           make_stats)
+
+
+def train_epoch_in_python(model):
+    users, movies, implicit = (np.copy(model.users), np.copy(model.movies),
+                               np.copy(model.implicit_factors))
+    points = model.train_points
+    if model.user_order is not None:
+        points = points[model.user_order]
+    for user in range(users.shape[0]):
+        user_points = points[model.user_point_offsets[user]:
+                             model.user_point_offsets[user + 1]]
+        if user_points.shape[0] == 0:
+            continue
+        implicit_movies = model.implicit_movies[
+            model.implicit_offsets[user]:model.implicit_offsets[user + 1]]
+        norm = (1 / np.sqrt(implicit_movies.shape[0])
+                if implicit_movies.shape[0] else 0)
+        implicit_sum = norm * implicit[implicit_movies].sum(axis=0)
+        y_gradient = np.zeros(model.num_features)
+        for _, movie, _, rating in user_points:
+            effective_user = users[user] + implicit_sum
+            prediction = min(max(model.stats.get_baseline(user, movie) +
+                                 np.dot(effective_user, movies[movie]), 1), 5)
+            error = rating - prediction
+            user_values = np.copy(users[user])
+            movie_values = np.copy(movies[movie])
+            users[user] += model.learn_rate * (
+                error * movie_values - model.k_factor * user_values)
+            movies[movie] += model.learn_rate * (
+                error * effective_user - model.k_factor * movie_values)
+            y_gradient += error * movie_values
+        for movie in implicit_movies:
+            implicit[movie] += model.learn_rate * (
+                norm * y_gradient - model.k_factor * implicit[movie])
+    return users, movies, implicit
+
+
+def test_svd_plus_plus_init_instances_are_svd_instances():
+    assert isinstance(svd_plus_plus.SVDPlusPlus(), svd.SVD)
+
+
+def test_build_implicit_feedback_includes_implicit_points():
+    train_points = make_low_rank_train_points(num_points=200)
+    implicit_points = np.array([[0, 1, 0, 0], [5, 2, 0, 0], [9999, 1, 0, 0]],
+                               dtype=np.int32)
+    model = svd_plus_plus.SVDPlusPlus()
+    initialize_model(model, train_points, implicit_points)
+    assert model.implicit_offsets[-1] == train_points.shape[0] + 2
+    user_five_movies = model.implicit_movies[model.implicit_offsets[5]:
+                                             model.implicit_offsets[6]]
+    expected_movies = np.append(train_points[train_points[:, 0] == 5, 1], 2)
+    np.testing.assert_array_equal(user_five_movies, expected_movies)
+
+
+def test_train_epoch_in_c_matches_python_reference():
+    train_points = make_low_rank_train_points(num_points=400)
+    model = svd_plus_plus.SVDPlusPlus(learn_rate=0.05, num_features=3,
+                                      feature_initial=0.1)
+    initialize_model(model, train_points,
+                     implicit_points=make_low_rank_train_points(
+                         num_points=100))
+    model.implicit_factors[:] = np.random.normal(
+        scale=0.1, size=model.implicit_factors.shape)
+    expected_users, expected_movies, expected_implicit = (
+        train_epoch_in_python(model))
+    model.train_epoch_in_c()
+    np.testing.assert_array_almost_equal(model.users, expected_users,
+                                         decimal=4)
+    np.testing.assert_array_almost_equal(model.movies, expected_movies,
+                                         decimal=4)
+    np.testing.assert_array_almost_equal(model.implicit_factors,
+                                         expected_implicit, decimal=4)
+
+
+def test_train_epoch_in_c_follows_user_order_of_unsorted_points():
+    train_points = make_low_rank_train_points(num_points=400)
+    sorted_points = train_points[np.argsort(train_points[:, 0],
+                                            kind='mergesort')]
+    unsorted_model = svd_plus_plus.SVDPlusPlus(learn_rate=0.05)
+    sorted_model = svd_plus_plus.SVDPlusPlus(learn_rate=0.05)
+    initialize_model(unsorted_model, train_points)
+    initialize_model(sorted_model, sorted_points)
+    assert unsorted_model.user_order is not None
+    assert sorted_model.user_order is None
+    sorted_model.users = np.copy(unsorted_model.users)
+    sorted_model.movies = np.copy(unsorted_model.movies)
+    unsorted_model.train_epoch_in_c()
+    sorted_model.train_epoch_in_c()
+    np.testing.assert_array_equal(unsorted_model.users, sorted_model.users)
+    np.testing.assert_array_equal(unsorted_model.movies, sorted_model.movies)
+
+
+def test_svd_plus_plus_train_reduces_train_error():
+    train_points = make_low_rank_train_points()
+    model = svd_plus_plus.SVDPlusPlus(learn_rate=0.02, num_features=2,
+                                      feature_initial=0.1)
+    initialize_model(model, train_points)
+    ratings = train_points[:, 3]
+    first_rmse = np.sqrt(np.mean((model.predict(train_points) - ratings) ** 2))
+    model.train_more(epochs=20)
+    last_rmse = np.sqrt(np.mean((model.predict(train_points) - ratings) ** 2))
+    assert last_rmse < first_rmse
+
+
+def test_compute_effective_users_adds_normalized_implicit_sums():
+    train_points = make_low_rank_train_points(num_points=300)
+    model = svd_plus_plus.SVDPlusPlus(num_features=2)
+    initialize_model(model, train_points)
+    model.implicit_factors[:] = np.random.normal(
+        size=model.implicit_factors.shape)
+    model.compute_effective_users()
+    user = 4
+    movies = train_points[train_points[:, 0] == user, 1]
+    expected_user = (model.users[user] + model.implicit_factors[movies].sum(
+        axis=0) / np.sqrt(movies.shape[0]))
+    np.testing.assert_array_almost_equal(model.effective_users[user],
+                                         expected_user, decimal=5)
+
+
+def test_predict_in_c_uses_effective_users():
+    train_points = make_low_rank_train_points(num_points=300)
+    model = svd_plus_plus.SVDPlusPlus(learn_rate=0.05)
+    initialize_model(model, train_points)
+    model.train_more(epochs=2)
+    expected_predictions = model.predict(train_points)
+    model.run_c = True
+    np.testing.assert_array_almost_equal(model.predict(train_points),
+                                         expected_predictions, decimal=5)
+
+
+@pytest.mark.parametrize('name, value', [
+    ('adaptive_method', 'adagrad'),
+    ('learn_rate_schedule', learning_rates.LearnRateSchedule('exponential')),
+    ('factor_dtype', 'float16'),
+    ('training_order', data_ordering.TrainingOrder('shuffled'))])
+def test_svd_plus_plus_rejects_options_its_kernel_ignores(name, value):
+    train_points = make_low_rank_train_points(num_points=300)
+    model = svd_plus_plus.SVDPlusPlus()
+    setattr(model, name, value)
+    with pytest.raises(ValueError):
+        model.train(train_points, stats=make_stats(train_points))
+    with pytest.raises(ValueError):
+        model.train_more(epochs=1)
+
+
+def test_svd_plus_plus_rejects_feature_epoch_training():
+    train_points = make_low_rank_train_points(num_points=300)
+    model = svd_plus_plus.SVDPlusPlus()
+    with pytest.raises(ValueError):
+        model.train_feature_epoch(train_points, make_stats(train_points),
+                                  epochs=1)
+    with pytest.raises(ValueError):
+        model.train_more_feature_epoch(train_points, epochs=1)
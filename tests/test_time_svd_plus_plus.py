@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from algorithms import svd_plus_plus, time_svd_plus_plus
+from tests.helpers import (initialize_model, make_low_rank_train_points,
+                           make_stats)
+from utils import constants
+
+
+def make_timed_train_points(num_points=1500):
+    train_points = make_low_rank_train_points(num_points=num_points)
+    random_state = np.random.RandomState(5)
+    train_points[:, 2] = random_state.randint(1, constants.NUM_DAYS + 1,
+                                              num_points)
+    late = train_points[:, 2] > constants.NUM_DAYS // 2
+    train_points[late, 3] = np.minimum(train_points[late, 3] + 1, 5)
+    return train_points
+
+
+def test_time_svd_plus_plus_is_svd_plus_plus():
+    assert isinstance(time_svd_plus_plus.TimeSVDPlusPlus(),
+                      svd_plus_plus.SVDPlusPlus)
+
+
+def test_train_epoch_without_time_learning_matches_svd_plus_plus():
+    train_points = make_timed_train_points(num_points=400)
+    time_model = time_svd_plus_plus.TimeSVDPlusPlus(
+        learn_rate=0.05, bias_learn_rate=0, drift_learn_rate=0)
+    model = svd_plus_plus.SVDPlusPlus(learn_rate=0.05)
+    initialize_model(time_model, train_points)
+    initialize_model(model, train_points)
+    model.users = np.copy(time_model.users)
+    model.movies = np.copy(time_model.movies)
+    time_model.train_epoch_in_c()
+    model.train_epoch_in_c()
+    np.testing.assert_array_equal(time_model.users, model.users)
+    np.testing.assert_array_equal(time_model.movies, model.movies)
+    assert not np.any(time_model.item_bin_biases)
+
+
+def test_predict_adds_time_biases_of_each_point():
+    train_points = make_timed_train_points(num_points=300)
+    model = time_svd_plus_plus.TimeSVDPlusPlus(num_features=2)
+    initialize_model(model, train_points)
+    model.compute_effective_users()
+    model.item_bin_biases[:] = np.random.normal(
+        scale=0.1, size=model.item_bin_biases.shape)
+    model.user_alphas[:] = np.random.normal(scale=0.01,
+                                            size=model.user_alphas.shape)
+    model.user_day_biases[:] = np.random.normal(
+        scale=0.1, size=model.user_day_biases.shape)
+    predictions = model.predict(train_points)
+    features = model.time_features
+    for p, (user, movie, _, _) in enumerate(train_points[:20]):
+        expected_prediction = (
+            model.stats.get_baseline(user, movie) +
+            np.dot(model.effective_users[user], model.movies[movie]) +
+            model.item_bin_biases[movie, features.bins[p]] +
+            model.user_alphas[user] * features.deviations[p] +
+            model.user_day_biases[features.days[p]])
+        np.testing.assert_almost_equal(
+            predictions[p], min(max(expected_prediction, 1), 5), decimal=5)
+
+
+def test_time_svd_plus_plus_learns_time_effects():
+    train_points = make_timed_train_points()
+    model = time_svd_plus_plus.TimeSVDPlusPlus(
+        learn_rate=0.01, num_features=2, feature_initial=0.1,
+        bias_learn_rate=0.01)
+    initialize_model(model, train_points)
+    ratings = train_points[:, 3]
+    model.compute_effective_users()
+    first_rmse = np.sqrt(np.mean((model.predict(train_points) - ratings) ** 2))
+    model.train_more(epochs=20)
+    last_rmse = np.sqrt(np.mean((model.predict(train_points) - ratings) ** 2))
+    assert last_rmse < first_rmse
+    late_bins = model.item_bin_biases[:, constants.NUM_TIME_BINS // 2 + 1:]
+    early_bins = model.item_bin_biases[:, :constants.NUM_TIME_BINS // 2]
+    assert late_bins.mean() > early_bins.mean()
+
+
+def test_time_svd_plus_plus_rejects_float16_factors():
+    train_points = make_timed_train_points(num_points=300)
+    model = time_svd_plus_plus.TimeSVDPlusPlus()
+    model.factor_dtype = 'float16'
+    with pytest.raises(ValueError):
+        model.train(train_points, stats=make_stats(train_points))
@@ -1,3 +1,35 @@
+POINT_FORMAT_INT32 = 0
+"""int32[num_points][4] points, as stored in the .npy split files"""
+
+POINT_FORMAT_COMPACT = 1
+"""Packed records of utils.data_io.COMPACT_POINT_DTYPE"""
+
+ADAPTIVE_METHODS = (None, 'adagrad', 'rmsprop')
+"""Adaptive learning-rate methods, indexed by their mode in adaptive.h"""
+
+FACTOR_FORMAT_FLOAT32 = 0
+"""float32 users and movies factor matrices"""
+
+FACTOR_FORMAT_FLOAT16 = 1
+"""float16 factor matrices; the kernels still compute in float32"""
+
+KERNEL_BACKENDS = ('c', 'numpy', 'python')
+"""Kernel backends in the order they are preferred when dispatching"""
+
+KERNEL_ISA_LEVELS = ('avx512', 'avx2', 'sse2')
+"""Instruction sets the kernels are built for, most capable first. sse2 is
+the plain build (lib/<name>.so); the others are lib/<name>_<level>.so"""
+
+KERNEL_ISA_CPU_FLAGS = {'avx512': ('avx512f', 'avx2'), 'avx2': ('avx2',),
+                        'sse2': ()}
+"""/proc/cpuinfo flags a CPU needs to run each kernel build"""
+
+_c_functions = {}
+_kernel_isa = None
+_kernels = {}
+_libraries = {}
+
+
 class CException(Exception):
     message = ''
     err_no = -1
@@ -16,32 +48,44 @@ class CException(Exception):
 
 def c_svd_update_feature(train_points, users, user_offsets, movies, residuals,
                          movie_averages, feature, num_features, learn_rate,
-                         k_factor):
-    import ctypes
-    from ctypes import c_void_p, c_int32, c_float
-    import os
-    from utils.data_paths import LIBRARY_DIR_PATH
-    num_train_points = train_points.shape[0]
-    num_users = users.shape[0]
-    num_movies = movies.shape[0]
-    library_file_name = 'svd.so'
-    library_file_path = os.path.join(LIBRARY_DIR_PATH, library_file_name)
-    svd_lib = ctypes.cdll.LoadLibrary(library_file_path)
-    c_update_feature = svd_lib.c_update_feature
+                         k_factor, adaptive_method=None, adaptive_decay=0.9,
+                         user_accumulators=None, movie_accumulators=None):
+    from utils.dataset import get_points_array
+    train_points = get_points_array(train_points)
+    check_points(train_points)
+    check_factor_arrays(users=users, user_offsets=user_offsets, movies=movies,
+                        movie_averages=movie_averages,
+                        num_features=num_features, allow_layouts=True)
+    check_float_array(residuals, 'residuals', writeable=True,
+                      min_length=train_points.shape[0])
+    adaptive_mode, user_accumulators_pointer, movie_accumulators_pointer = (
+        check_accumulators(adaptive_method, users=users, movies=movies,
+                           user_accumulators=user_accumulators,
+                           movie_accumulators=movie_accumulators))
+    c_update_feature = get_c_function('svd.so', 'c_update_feature',
+                                      make_svd_update_feature_argtypes)
     returned_value = c_update_feature(
-        c_void_p(train_points.ctypes.data),    # (void*) train_points
-        c_int32(num_train_points),             # (int)   num_train_points
-        c_void_p(users.ctypes.data),           # (void*) users
-        c_void_p(user_offsets.ctypes.data),    # (void*) user_offsets
-        c_int32(num_users),                    # (int)   num_users
-        c_void_p(movies.ctypes.data),          # (void*) movies
-        c_void_p(movie_averages.ctypes.data),  # (void*) movie_averages
-        c_int32(num_movies),                   # (int)   num_movies
-        c_void_p(residuals.ctypes.data),       # (void*) residuals
-        c_float(learn_rate),                   # (float) learn_rate
-        c_int32(feature),                      # (int)   feature
-        c_int32(num_features),                 # (int)   num_features
-        c_float(k_factor)                      # (float) k_factor
+        train_points.ctypes.data,            # (void*) train_points
+        get_point_format(train_points),      # (int)   point_format
+        train_points.shape[0],               # (int)   num_train_points
+        users.ctypes.data,                   # (void*) users
+        user_offsets,                        # (float*) user_offsets
+        users.shape[0],                      # (int)   num_users
+        movies.ctypes.data,                  # (void*) movies
+        movie_averages,                      # (float*) movie_averages
+        movies.shape[0],                     # (int)   num_movies
+        residuals,                           # (float*) residuals
+        learn_rate,                          # (float) learn_rate
+        feature,                             # (int)   feature
+        num_features,                        # (int)   num_features
+        k_factor,                            # (float) k_factor
+        adaptive_mode,                       # (int)   adaptive_mode
+        adaptive_decay,                      # (float) adaptive_decay
+        user_accumulators_pointer,           # (float*) user_accumulators
+        movie_accumulators_pointer,          # (float*) movie_accumulators
+        get_factor_format(users),            # (int)   factor_format
+        get_row_stride(users),               # (int)   user_stride
+        get_row_stride(movies)               # (int)   movie_stride
     )
     if returned_value != 0:
         raise CException(returned_value)
@@ -49,30 +93,712 @@ def c_svd_update_feature(train_points, users, user_offsets, movies, residuals,
 
 def c_svd_euclidean_train_epoch(train_points, users, user_offsets, movies,
                                 movie_averages, num_features, learn_rate,
+                                k_factor, num_threads=1, adaptive_method=None,
+                                adaptive_decay=0.9, user_accumulators=None,
+                                movie_accumulators=None, order=None):
+    from utils.dataset import get_points_array
+    train_points = get_points_array(train_points)
+    check_points(train_points)
+    order_pointer = None
+    if order is not None:
+        check_order(order, train_points.shape[0])
+        order_pointer = order.ctypes.data
+    check_factor_arrays(users=users, user_offsets=user_offsets, movies=movies,
+                        movie_averages=movie_averages,
+                        num_features=num_features, allow_layouts=True)
+    adaptive_mode, user_accumulators_pointer, movie_accumulators_pointer = (
+        check_accumulators(adaptive_method, users=users, movies=movies,
+                           user_accumulators=user_accumulators,
+                           movie_accumulators=movie_accumulators))
+    c_train_epoch = get_c_function('svd_euclidean.so', 'c_train_epoch',
+                                   make_svd_euclidean_train_epoch_argtypes)
+    returned_value = c_train_epoch(
+        train_points.ctypes.data,            # (void*) train_points
+        get_point_format(train_points),      # (int)   point_format
+        train_points.shape[0],               # (int)   num_train_points
+        order_pointer,                       # (int*)  order or NULL
+        users.ctypes.data,                   # (void*) users
+        user_offsets,                        # (float*) user_offsets
+        users.shape[0],                      # (int)   num_users
+        movies.ctypes.data,                  # (void*) movies
+        movie_averages,                      # (float*) movie_averages
+        movies.shape[0],                     # (int)   num_movies
+        learn_rate,                          # (float) learn_rate
+        num_features,                        # (int)   num_features
+        k_factor,                            # (float) k_factor
+        adaptive_mode,                       # (int)   adaptive_mode
+        adaptive_decay,                      # (float) adaptive_decay
+        user_accumulators_pointer,           # (float*) user_accumulators
+        movie_accumulators_pointer,          # (float*) movie_accumulators
+        num_threads,                         # (int)   num_threads
+        get_factor_format(users),            # (int)   factor_format
+        get_row_stride(users),               # (int)   user_stride
+        get_row_stride(movies)               # (int)   movie_stride
+    )
+    if returned_value != 0:
+        raise CException(returned_value, 'Could not allocate epoch workers')
+
+
+def c_svd_plus_plus_train_epoch(train_points, order, user_point_offsets,
+                                implicit_movies, implicit_offsets, users,
+                                user_offsets, movies, movie_averages,
+                                implicit_factors, num_features, learn_rate,
                                 k_factor):
-    import ctypes
-    from ctypes import c_void_p, c_int32, c_float
-    import os
-    from utils.data_paths import LIBRARY_DIR_PATH
+    from utils.dataset import get_points_array
+    train_points = get_points_array(train_points)
+    order_pointer = check_plus_plus_arrays(
+        train_points=train_points, order=order,
+        user_point_offsets=user_point_offsets,
+        implicit_movies=implicit_movies, implicit_offsets=implicit_offsets,
+        users=users, user_offsets=user_offsets, movies=movies,
+        movie_averages=movie_averages, implicit_factors=implicit_factors,
+        num_features=num_features)
+    c_train_epoch_plus_plus = get_c_function(
+        'svd_plus_plus.so', 'c_train_epoch_plus_plus',
+        make_svd_plus_plus_train_epoch_argtypes)
+    returned_value = c_train_epoch_plus_plus(
+        train_points.ctypes.data,            # (void*) train_points
+        get_point_format(train_points),      # (int)   point_format
+        train_points.shape[0],               # (int)   num_train_points
+        order_pointer,                       # (int*)  order or NULL
+        user_point_offsets,                  # (long long*) user_point_offsets
+        users.shape[0],                      # (int)   num_users
+        implicit_movies,                     # (int*)  implicit_movies
+        implicit_offsets,                    # (long long*) implicit_offsets
+        users,                               # (float*) users
+        user_offsets,                        # (float*) user_offsets
+        movies,                              # (float*) movies
+        movie_averages,                      # (float*) movie_averages
+        movies.shape[0],                     # (int)   num_movies
+        implicit_factors,                    # (float*) implicit_factors
+        learn_rate,                          # (float) learn_rate
+        num_features,                        # (int)   num_features
+        k_factor                             # (float) k_factor
+    )
+    if returned_value != 0:
+        raise CException(returned_value, 'Could not allocate user buffers')
+
+
+def c_svd_update_cached_feature(train_points, users, movies, residual_cache,
+                                feature, num_features, learn_rate, k_factor,
+                                order=None, block_offsets=None, num_blocks=0,
+                                num_threads=1, adaptive_method=None,
+                                adaptive_decay=0.9, user_accumulators=None,
+                                movie_accumulators=None):
+    from utils.dataset import get_points_array
+    train_points = get_points_array(train_points)
+    check_points(train_points)
+    check_feature_matrices(users=users, movies=movies,
+                           num_features=num_features, allow_layouts=True)
+    check_float_array(residual_cache, 'residual_cache',
+                      min_length=train_points.shape[0])
+    order_pointer = None
+    block_offsets_pointer = None
+    if order is not None:
+        check_order(order, train_points.shape[0])
+        check_block_offsets(block_offsets, num_blocks, train_points.shape[0])
+        order_pointer = order.ctypes.data
+        block_offsets_pointer = block_offsets.ctypes.data
+    adaptive_mode, user_accumulators_pointer, movie_accumulators_pointer = (
+        check_accumulators(adaptive_method, users=users, movies=movies,
+                           user_accumulators=user_accumulators,
+                           movie_accumulators=movie_accumulators))
+    c_update_cached_feature = get_c_function(
+        'svd.so', 'c_update_cached_feature',
+        make_svd_update_cached_feature_argtypes)
+    returned_value = c_update_cached_feature(
+        train_points.ctypes.data,            # (void*) train_points
+        get_point_format(train_points),      # (int)   point_format
+        train_points.shape[0],               # (int)   num_train_points
+        order_pointer,                       # (int*)  order or NULL
+        block_offsets_pointer,               # (long long*) block_offsets
+        num_blocks,                          # (int)   num_blocks
+        users.ctypes.data,                   # (void*) users
+        users.shape[0],                      # (int)   num_users
+        movies.ctypes.data,                  # (void*) movies
+        movies.shape[0],                     # (int)   num_movies
+        residual_cache,                      # (float*) residual_cache
+        learn_rate,                          # (float) learn_rate
+        feature,                             # (int)   feature
+        num_features,                        # (int)   num_features
+        k_factor,                            # (float) k_factor
+        adaptive_mode,                       # (int)   adaptive_mode
+        adaptive_decay,                      # (float) adaptive_decay
+        user_accumulators_pointer,           # (float*) user_accumulators
+        movie_accumulators_pointer,          # (float*) movie_accumulators
+        num_threads,                         # (int)   num_threads
+        get_factor_format(users),            # (int)   factor_format
+        get_row_stride(users),               # (int)   user_stride
+        get_row_stride(movies)               # (int)   movie_stride
+    )
+    if returned_value != 0:
+        raise CException(returned_value, 'Could not allocate block workers')
+
+
+def c_svd_update_feature_stratified(train_points, order, block_offsets,
+                                    num_blocks, users, user_offsets, movies,
+                                    residuals, movie_averages, feature,
+                                    num_features, learn_rate, k_factor,
+                                    num_threads, adaptive_method=None,
+                                    adaptive_decay=0.9, user_accumulators=None,
+                                    movie_accumulators=None):
+    from utils.dataset import get_points_array
+    train_points = get_points_array(train_points)
+    check_points(train_points)
+    check_factor_arrays(users=users, user_offsets=user_offsets, movies=movies,
+                        movie_averages=movie_averages,
+                        num_features=num_features, allow_layouts=True)
+    check_float_array(residuals, 'residuals', writeable=True,
+                      min_length=train_points.shape[0])
+    check_order(order, train_points.shape[0])
+    check_block_offsets(block_offsets, num_blocks, train_points.shape[0])
+    adaptive_mode, user_accumulators_pointer, movie_accumulators_pointer = (
+        check_accumulators(adaptive_method, users=users, movies=movies,
+                           user_accumulators=user_accumulators,
+                           movie_accumulators=movie_accumulators))
+    c_update_feature_stratified = get_c_function(
+        'svd.so', 'c_update_feature_stratified',
+        make_svd_update_feature_stratified_argtypes)
+    returned_value = c_update_feature_stratified(
+        train_points.ctypes.data,            # (void*) train_points
+        get_point_format(train_points),      # (int)   point_format
+        train_points.shape[0],               # (int)   num_train_points
+        order,                               # (int*)  order
+        block_offsets,                       # (long long*) block_offsets
+        num_blocks,                          # (int)   num_blocks
+        users.ctypes.data,                   # (void*) users
+        user_offsets,                        # (float*) user_offsets
+        users.shape[0],                      # (int)   num_users
+        movies.ctypes.data,                  # (void*) movies
+        movie_averages,                      # (float*) movie_averages
+        movies.shape[0],                     # (int)   num_movies
+        residuals,                           # (float*) residuals
+        learn_rate,                          # (float) learn_rate
+        feature,                             # (int)   feature
+        num_features,                        # (int)   num_features
+        k_factor,                            # (float) k_factor
+        adaptive_mode,                       # (int)   adaptive_mode
+        adaptive_decay,                      # (float) adaptive_decay
+        user_accumulators_pointer,           # (float*) user_accumulators
+        movie_accumulators_pointer,          # (float*) movie_accumulators
+        num_threads,                         # (int)   num_threads
+        get_factor_format(users),            # (int)   factor_format
+        get_row_stride(users),               # (int)   user_stride
+        get_row_stride(movies)               # (int)   movie_stride
+    )
+    if returned_value != 0:
+        raise CException(returned_value, 'Could not allocate block workers')
+
+
+def c_time_svd_plus_plus_train_epoch(train_points, order, user_point_offsets,
+                                     implicit_movies, implicit_offsets, users,
+                                     user_offsets, movies, movie_averages,
+                                     implicit_factors, time_features,
+                                     item_bin_biases, user_alphas,
+                                     user_day_biases, num_features,
+                                     learn_rate, bias_learn_rate,
+                                     drift_learn_rate, k_factor,
+                                     bias_k_factor):
+    import numpy as np
+    from utils.dataset import get_points_array
+    train_points = get_points_array(train_points)
     num_train_points = train_points.shape[0]
-    num_users = users.shape[0]
-    num_movies = movies.shape[0]
-    library_file_name = 'svd_euclidean.so'
-    library_file_path = os.path.join(LIBRARY_DIR_PATH, library_file_name)
-    svd_euclidean_lib = ctypes.cdll.LoadLibrary(library_file_path)
-    c_train_epoch = svd_euclidean_lib.c_train_epoch
-    returned_value = c_train_epoch(
-        c_void_p(train_points.ctypes.data),    # (void*) train_points
-        c_int32(num_train_points),             # (int)   num_train_points
-        c_void_p(users.ctypes.data),           # (void*) users
-        c_void_p(user_offsets.ctypes.data),    # (void*) user_offsets
-        c_int32(num_users),                    # (int)   num_users
-        c_void_p(movies.ctypes.data),          # (void*) movies
-        c_void_p(movie_averages.ctypes.data),  # (void*) movie_averages
-        c_int32(num_movies),                   # (int)   num_movies
-        c_float(learn_rate),                   # (float) learn_rate
-        c_int32(num_features),                 # (int)   num_features
-        c_float(k_factor)                      # (float) k_factor
+    order_pointer = check_plus_plus_arrays(
+        train_points=train_points, order=order,
+        user_point_offsets=user_point_offsets,
+        implicit_movies=implicit_movies, implicit_offsets=implicit_offsets,
+        users=users, user_offsets=user_offsets, movies=movies,
+        movie_averages=movie_averages, implicit_factors=implicit_factors,
+        num_features=num_features)
+    if (time_features.bins.dtype != np.int16 or
+            not time_features.bins.flags.c_contiguous or
+            time_features.bins.shape != (num_train_points,)):
+        raise ValueError('Time bins must be C-contiguous int16, one per point')
+    check_int32_array(time_features.days, 'time_features.days',
+                      length=num_train_points)
+    check_float_array(time_features.deviations, 'time_features.deviations',
+                      min_length=num_train_points)
+    check_float_array(item_bin_biases, 'item_bin_biases', writeable=True,
+                      min_length=movies.shape[0])
+    check_float_array(user_alphas, 'user_alphas', writeable=True,
+                      min_length=users.shape[0])
+    check_float_array(user_day_biases, 'user_day_biases', writeable=True)
+    c_train_epoch_time_plus_plus = get_c_function(
+        'svd_plus_plus.so', 'c_train_epoch_time_plus_plus',
+        make_time_svd_plus_plus_train_epoch_argtypes)
+    returned_value = c_train_epoch_time_plus_plus(
+        train_points.ctypes.data,            # (void*) train_points
+        get_point_format(train_points),      # (int)   point_format
+        num_train_points,                    # (int)   num_train_points
+        order_pointer,                       # (int*)  order or NULL
+        user_point_offsets,                  # (long long*) user_point_offsets
+        users.shape[0],                      # (int)   num_users
+        implicit_movies,                     # (int*)  implicit_movies
+        implicit_offsets,                    # (long long*) implicit_offsets
+        users,                               # (float*) users
+        user_offsets,                        # (float*) user_offsets
+        movies,                              # (float*) movies
+        movie_averages,                      # (float*) movie_averages
+        movies.shape[0],                     # (int)   num_movies
+        implicit_factors,                    # (float*) implicit_factors
+        time_features.bins.ctypes.data,      # (short*) time_bins
+        time_features.days,                  # (int*)  day_ids
+        time_features.deviations,            # (float*) deviations
+        item_bin_biases,                     # (float*) item_bin_biases
+        item_bin_biases.shape[1],            # (int)   num_bins
+        user_alphas,                         # (float*) user_alphas
+        user_day_biases,                     # (float*) user_day_biases
+        learn_rate,                          # (float) learn_rate
+        bias_learn_rate,                     # (float) bias_learn_rate
+        drift_learn_rate,                    # (float) drift_learn_rate
+        num_features,                        # (int)   num_features
+        k_factor,                            # (float) k_factor
+        bias_k_factor                        # (float) bias_k_factor
     )
     if returned_value != 0:
-        raise CException(returned_value)
+        raise CException(returned_value, 'Could not allocate user buffers')
+
+
+def c_predict(points, users, user_offsets, movies, movie_averages,
+              num_features, num_threads=1):
+    import numpy as np
+    predictions = np.zeros(points.shape[0], dtype=np.float32)
+    c_predict_and_sum_squared_error(
+        points=points, users=users, user_offsets=user_offsets, movies=movies,
+        movie_averages=movie_averages, num_features=num_features,
+        predictions=predictions, num_threads=num_threads)
+    return predictions
+
+
+def c_predict_and_sum_squared_error(points, users, user_offsets, movies,
+                                    movie_averages, num_features,
+                                    predictions=None, num_threads=1):
+    import ctypes
+    from utils.dataset import get_points_array
+    points = get_points_array(points)
+    check_points(points)
+    check_predict_arrays(users=users, user_offsets=user_offsets,
+                         movies=movies, movie_averages=movie_averages,
+                         num_features=num_features)
+    predictions_pointer = None
+    if predictions is not None:
+        check_float_array(predictions, 'predictions', writeable=True,
+                          min_length=points.shape[0])
+        predictions_pointer = predictions.ctypes.data
+    squared_error = ctypes.c_double(0.0)
+    c_predict_function = get_c_function('predict.so', 'c_predict',
+                                        make_predict_argtypes)
+    returned_value = c_predict_function(
+        points.ctypes.data,                  # (void*) points
+        get_point_format(points),            # (int)   point_format
+        points.shape[0],                     # (int)   num_points
+        users.ctypes.data,                   # (void*) users
+        user_offsets,                        # (float*) user_offsets
+        users.shape[0],                      # (int)   num_users
+        movies.ctypes.data,                  # (void*) movies
+        movie_averages,                      # (float*) movie_averages
+        movies.shape[0],                     # (int)   num_movies
+        num_features,                        # (int)   num_features
+        predictions_pointer,                 # (float*) predictions
+        ctypes.byref(squared_error),         # (double*) squared_error
+        num_threads,                         # (int)   num_threads
+        get_factor_format(users),            # (int)   factor_format
+        get_row_stride(users),               # (int)   user_stride
+        get_row_stride(movies)               # (int)   movie_stride
+    )
+    if returned_value == 2:
+        raise CException(returned_value, 'Point ids are out of range of the '
+                                         'factor matrices')
+    if returned_value != 0:
+        raise CException(returned_value, 'Could not allocate predict workers')
+    return squared_error.value
+
+
+def c_rmse(points, users, user_offsets, movies, movie_averages, num_features,
+           num_threads=1):
+    from math import sqrt
+    squared_error = c_predict_and_sum_squared_error(
+        points=points, users=users, user_offsets=user_offsets, movies=movies,
+        movie_averages=movie_averages, num_features=num_features,
+        num_threads=num_threads)
+    return sqrt(squared_error / points.shape[0])
+
+
+def check_accumulators(adaptive_method, users, movies, user_accumulators,
+                       movie_accumulators):
+    if adaptive_method not in ADAPTIVE_METHODS:
+        raise ValueError('Unknown adaptive method {}, expected one of {}'
+                         .format(adaptive_method, ADAPTIVE_METHODS[1:]))
+    if adaptive_method is None:
+        return 0, None, None
+    for accumulators, factors, name in (
+            (user_accumulators, users, 'user_accumulators'),
+            (movie_accumulators, movies, 'movie_accumulators')):
+        check_float_array(accumulators, name, writeable=True)
+        if accumulators.shape != factors.shape:
+            raise ValueError('{} must have shape {}'.format(name,
+                                                            factors.shape))
+    return (ADAPTIVE_METHODS.index(adaptive_method),
+            user_accumulators.ctypes.data, movie_accumulators.ctypes.data)
+
+
+def check_block_offsets(block_offsets, num_blocks, num_points):
+    check_offsets(block_offsets, 'block_offsets', num_ids=num_blocks ** 2,
+                  num_points=num_points)
+
+
+def check_factor_arrays(users, user_offsets, movies, movie_averages,
+                        num_features, allow_layouts=False):
+    check_feature_matrices(users=users, movies=movies,
+                           num_features=num_features,
+                           allow_layouts=allow_layouts)
+    check_float_array(user_offsets, 'user_offsets',
+                      min_length=users.shape[0])
+    check_float_array(movie_averages, 'movie_averages',
+                      min_length=movies.shape[0])
+
+
+def check_feature_matrices(users, movies, num_features, allow_layouts=False):
+    # Kernels taking a factor_format and row strides accept float16 and
+    # padded rows, see utils.factor_layout
+    check_float_array(users, 'users', writeable=True,
+                      allow_float16=allow_layouts,
+                      allow_padded_rows=allow_layouts)
+    check_float_array(movies, 'movies', writeable=True,
+                      allow_float16=allow_layouts,
+                      allow_padded_rows=allow_layouts)
+    if users.dtype != movies.dtype:
+        raise ValueError('users and movies must have the same dtype')
+    if users.ndim != 2 or users.shape[1] != num_features:
+        raise ValueError('users must have shape (num_users, {})'
+                         .format(num_features))
+    if movies.ndim != 2 or movies.shape[1] != num_features:
+        raise ValueError('movies must have shape (num_movies, {})'
+                         .format(num_features))
+
+
+def check_float_array(array, name, writeable=False, min_length=0,
+                      allow_float16=False, allow_padded_rows=False):
+    import numpy as np
+    from utils.factor_layout import has_padded_rows
+    dtypes = (np.float32, np.float16) if allow_float16 else (np.float32,)
+    if not isinstance(array, np.ndarray) or array.dtype not in dtypes:
+        raise ValueError('{} must be a {} numpy array'.format(
+            name, ' or '.join(np.dtype(dtype).name for dtype in dtypes)))
+    if not (array.flags.c_contiguous or
+            (allow_padded_rows and has_padded_rows(array))):
+        raise ValueError('{} must be C-contiguous'.format(name))
+    if writeable and not array.flags.writeable:
+        raise ValueError('{} must be writeable'.format(name))
+    if array.shape[0] < min_length:
+        raise ValueError('{} must have at least {} rows, not {}'
+                         .format(name, min_length, array.shape[0]))
+
+
+def check_int32_array(array, name, length):
+    import numpy as np
+    if (not isinstance(array, np.ndarray) or array.dtype != np.int32 or
+            not array.flags.c_contiguous):
+        raise ValueError('{} must be a C-contiguous int32 array'.format(name))
+    if array.shape != (length,):
+        raise ValueError('{} must have {} entries'.format(name, length))
+
+
+def check_offsets(offsets, name, num_ids, num_points):
+    import numpy as np
+    if (not isinstance(offsets, np.ndarray) or offsets.dtype != np.int64 or
+            not offsets.flags.c_contiguous):
+        raise ValueError('{} must be a C-contiguous int64 array'.format(name))
+    if offsets.shape != (num_ids + 1,):
+        raise ValueError('{} must have {} entries'.format(name, num_ids + 1))
+    if offsets[0] != 0 or offsets[-1] != num_points:
+        raise ValueError('{} must span all {} points'.format(name,
+                                                             num_points))
+
+
+def check_order(order, num_points):
+    check_int32_array(order, 'order', length=num_points)
+
+
+def check_plus_plus_arrays(train_points, order, user_point_offsets,
+                           implicit_movies, implicit_offsets, users,
+                           user_offsets, movies, movie_averages,
+                           implicit_factors, num_features):
+    check_points(train_points)
+    check_factor_arrays(users=users, user_offsets=user_offsets, movies=movies,
+                        movie_averages=movie_averages,
+                        num_features=num_features)
+    check_float_array(implicit_factors, 'implicit_factors', writeable=True)
+    if implicit_factors.shape != movies.shape:
+        raise ValueError('implicit_factors must have the shape of movies')
+    check_offsets(user_point_offsets, 'user_point_offsets',
+                  num_ids=users.shape[0], num_points=train_points.shape[0])
+    check_offsets(implicit_offsets, 'implicit_offsets', num_ids=users.shape[0],
+                  num_points=implicit_movies.shape[0])
+    check_int32_array(implicit_movies, 'implicit_movies',
+                      length=implicit_movies.shape[0])
+    if order is None:
+        return None
+    check_order(order, train_points.shape[0])
+    return order.ctypes.data
+
+
+def check_predict_arrays(users, user_offsets, movies, movie_averages,
+                         num_features):
+    for array, name in ((users, 'users'), (movies, 'movies')):
+        check_float_array(array, name, allow_float16=True,
+                          allow_padded_rows=True)
+        if array.ndim != 2 or array.shape[1] != num_features:
+            raise ValueError('{} must have shape (num_{}, {})'
+                             .format(name, name, num_features))
+    if users.dtype != movies.dtype:
+        raise ValueError('users and movies must have the same dtype')
+    check_float_array(user_offsets, 'user_offsets',
+                      min_length=users.shape[0])
+    check_float_array(movie_averages, 'movie_averages',
+                      min_length=movies.shape[0])
+
+
+def check_points(points):
+    import numpy as np
+    from utils.constants import POINT_NUM_COLUMNS
+    from utils.data_io import COMPACT_POINT_DTYPE
+    if not isinstance(points, np.ndarray):
+        raise ValueError('Points must be a numpy array')
+    if not points.flags.c_contiguous:
+        raise ValueError('Points must be C-contiguous')
+    if points.dtype == COMPACT_POINT_DTYPE:
+        return
+    if (points.dtype != np.int32 or points.ndim != 2 or
+            points.shape[1] != POINT_NUM_COLUMNS):
+        raise ValueError('Points must be int32 with {} columns or compact '
+                         'records'.format(POINT_NUM_COLUMNS))
+
+
+def get_c_function(library_file_name, function_name, make_argtypes):
+    function_key = (library_file_name, function_name)
+    if function_key not in _c_functions:
+        import ctypes
+        library = load_library(library_file_name)
+        function = getattr(library, function_name)
+        function.argtypes = make_argtypes()
+        function.restype = ctypes.c_int
+        _c_functions[function_key] = function
+    return _c_functions[function_key]
+
+
+def get_cpu_flags():
+    try:
+        with open('/proc/cpuinfo') as cpuinfo:
+            for line in cpuinfo:
+                if line.startswith('flags'):
+                    return frozenset(line.split(':', 1)[1].split())
+    except (IOError, OSError):
+        pass
+    return frozenset()
+
+
+def get_kernel(name, backends=KERNEL_BACKENDS):
+    registered_backends = _kernels.get(name, {})
+    for backend in backends:
+        if backend not in registered_backends:
+            continue
+        function, is_available = registered_backends[backend]
+        if is_available is None or is_available():
+            return backend, function
+    raise ValueError('No available backend for kernel {} among {}'
+                     .format(name, ', '.join(backends)))
+
+
+def get_row_stride(factors):
+    return factors.strides[0] // factors.itemsize
+
+
+def get_factor_format(factors):
+    import numpy as np
+    if factors.dtype == np.float16:
+        return FACTOR_FORMAT_FLOAT16
+    return FACTOR_FORMAT_FLOAT32
+
+
+def get_kernel_isa():
+    global _kernel_isa
+    if _kernel_isa is None:
+        _kernel_isa = select_kernel_isa(get_cpu_flags())
+    return _kernel_isa
+
+
+def get_library_file_path(library_file_name):
+    import os
+    from utils.data_paths import LIBRARY_DIR_PATH
+    # Fall back through the levels the CPU supports to the plain build
+    levels = KERNEL_ISA_LEVELS[KERNEL_ISA_LEVELS.index(get_kernel_isa()):]
+    for level in levels[:-1]:
+        library_file_path = os.path.join(
+            LIBRARY_DIR_PATH, get_library_variant_name(library_file_name,
+                                                       level))
+        if os.path.isfile(library_file_path):
+            return library_file_path
+    return os.path.join(LIBRARY_DIR_PATH, library_file_name)
+
+
+def get_library_variant_name(library_file_name, isa):
+    import os
+    if isa == KERNEL_ISA_LEVELS[-1]:
+        return library_file_name
+    root, extension = os.path.splitext(library_file_name)
+    return '{}_{}{}'.format(root, isa, extension)
+
+
+def get_point_format(points):
+    from utils.data_io import COMPACT_POINT_DTYPE
+    if points.dtype == COMPACT_POINT_DTYPE:
+        return POINT_FORMAT_COMPACT
+    return POINT_FORMAT_INT32
+
+
+def is_kernel_available(name, backend):
+    try:
+        get_kernel(name, backends=(backend,))
+    except ValueError:
+        return False
+    return True
+
+
+def is_library_available(library_file_name):
+    try:
+        load_library(library_file_name)
+    except OSError:
+        return False
+    return True
+
+
+def load_library(library_file_name):
+    if library_file_name not in _libraries:
+        import ctypes
+        _libraries[library_file_name] = ctypes.cdll.LoadLibrary(
+            get_library_file_path(library_file_name))
+    return _libraries[library_file_name]
+
+
+def make_float_array_type(writeable=False):
+    import numpy as np
+    flags = 'C_CONTIGUOUS,WRITEABLE' if writeable else 'C_CONTIGUOUS'
+    return np.ctypeslib.ndpointer(dtype=np.float32, flags=flags)
+
+
+def make_predict_argtypes():
+    from ctypes import c_double, c_int, c_void_p, POINTER
+    averages = make_float_array_type()
+    return [c_void_p, c_int, c_int, c_void_p, averages, c_int, c_void_p,
+            averages, c_int, c_int, c_void_p, POINTER(c_double), c_int, c_int,
+            c_int, c_int]
+
+
+def make_svd_euclidean_train_epoch_argtypes():
+    from ctypes import c_float, c_int, c_void_p
+    averages = make_float_array_type()
+    return [c_void_p, c_int, c_int, c_void_p, c_void_p, averages, c_int,
+            c_void_p, averages, c_int, c_float, c_int, c_float, c_int,
+            c_float, c_void_p, c_void_p, c_int, c_int, c_int, c_int]
+
+
+def make_svd_update_feature_argtypes():
+    from ctypes import c_float, c_int, c_void_p
+    residuals = make_float_array_type(writeable=True)
+    averages = make_float_array_type()
+    return [c_void_p, c_int, c_int, c_void_p, averages, c_int, c_void_p,
+            averages, c_int, residuals, c_float, c_int, c_int, c_float, c_int,
+            c_float, c_void_p, c_void_p, c_int, c_int, c_int]
+
+
+def make_svd_plus_plus_train_epoch_argtypes():
+    import numpy as np
+    from ctypes import c_float, c_int, c_void_p
+    factors = make_float_array_type(writeable=True)
+    averages = make_float_array_type()
+    offsets = np.ctypeslib.ndpointer(dtype=np.int64, flags='C_CONTIGUOUS')
+    ids = np.ctypeslib.ndpointer(dtype=np.int32, flags='C_CONTIGUOUS')
+    return [c_void_p, c_int, c_int, c_void_p, offsets, c_int, ids, offsets,
+            factors, averages, factors, averages, c_int, factors, c_float,
+            c_int, c_float]
+
+
+def make_svd_update_cached_feature_argtypes():
+    from ctypes import c_float, c_int, c_void_p
+    cache = make_float_array_type()
+    return [c_void_p, c_int, c_int, c_void_p, c_void_p, c_int, c_void_p, c_int,
+            c_void_p, c_int, cache, c_float, c_int, c_int, c_float, c_int,
+            c_float, c_void_p, c_void_p, c_int, c_int, c_int, c_int]
+
+
+def make_svd_update_feature_stratified_argtypes():
+    import numpy as np
+    from ctypes import c_float, c_int, c_void_p
+    residuals = make_float_array_type(writeable=True)
+    averages = make_float_array_type()
+    order = np.ctypeslib.ndpointer(dtype=np.int32, flags='C_CONTIGUOUS')
+    block_offsets = np.ctypeslib.ndpointer(dtype=np.int64,
+                                           flags='C_CONTIGUOUS')
+    return [c_void_p, c_int, c_int, order, block_offsets, c_int, c_void_p,
+            averages, c_int, c_void_p, averages, c_int, residuals, c_float,
+            c_int, c_int, c_float, c_int, c_float, c_void_p, c_void_p, c_int,
+            c_int, c_int, c_int]
+
+
+def make_time_svd_plus_plus_train_epoch_argtypes():
+    import numpy as np
+    from ctypes import c_float, c_int, c_void_p
+    factors = make_float_array_type(writeable=True)
+    averages = make_float_array_type()
+    offsets = np.ctypeslib.ndpointer(dtype=np.int64, flags='C_CONTIGUOUS')
+    ids = np.ctypeslib.ndpointer(dtype=np.int32, flags='C_CONTIGUOUS')
+    return [c_void_p, c_int, c_int, c_void_p, offsets, c_int, ids, offsets,
+            factors, averages, factors, averages, c_int, factors, c_void_p,
+            ids, averages, factors, c_int, factors, factors, c_float, c_float,
+            c_float, c_int, c_float, c_float]
+
+
+def select_kernel_isa(cpu_flags):
+    for level in KERNEL_ISA_LEVELS:
+        if all(flag in cpu_flags for flag in KERNEL_ISA_CPU_FLAGS[level]):
+            return level
+    return KERNEL_ISA_LEVELS[-1]
+
+
+def set_kernel_isa(isa=None):
+    global _kernel_isa
+    if isa is not None and isa not in KERNEL_ISA_LEVELS:
+        raise ValueError('Unknown kernel ISA level {}, expected one of {}'
+                         .format(isa, KERNEL_ISA_LEVELS))
+    _kernel_isa = isa
+    _c_functions.clear()
+    _libraries.clear()
+
+
+def register_c_kernel(name, function, library_file_name):
+    from functools import partial
+    register_kernel(name=name, backend='c', function=function,
+                    is_available=partial(is_library_available,
+                                         library_file_name))
+
+
+def register_kernel(name, backend, function, is_available=None):
+    if backend not in KERNEL_BACKENDS:
+        raise ValueError('Unknown kernel backend {}'.format(backend))
+    _kernels.setdefault(name, {})[backend] = (function, is_available)
+
+
+register_c_kernel('svd_update_feature', c_svd_update_feature, 'svd.so')
+register_c_kernel('svd_update_cached_feature', c_svd_update_cached_feature,
+                  'svd.so')
+register_c_kernel('svd_update_feature_stratified',
+                  c_svd_update_feature_stratified, 'svd.so')
+register_c_kernel('svd_plus_plus_train_epoch', c_svd_plus_plus_train_epoch,
+                  'svd_plus_plus.so')
+register_c_kernel('time_svd_plus_plus_train_epoch',
+                  c_time_svd_plus_plus_train_epoch, 'svd_plus_plus.so')
+register_c_kernel('svd_euclidean_train_epoch', c_svd_euclidean_train_epoch,
+                  'svd_euclidean.so')
+register_c_kernel('predict', c_predict, 'predict.so')
+register_c_kernel('rmse', c_rmse, 'predict.so')
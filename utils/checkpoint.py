@@ -0,0 +1,119 @@
+"""Single-file model checkpoints: a small JSON header followed by raw arrays
+
+The file holds ``CHECKPOINT_MAGIC``, the header length as a little-endian
+uint64 and the UTF-8 JSON header, followed by each array's bytes. Every array
+starts on a ``FACTOR_ROW_ALIGNMENT`` boundary and aligned factor matrices
+keep their row padding, so ``np.memmap`` views of a checkpoint can go
+straight to the kernels. A checkpoint is written to a temporary file next to
+its destination and moved over it, so readers never see a partial file.
+"""
+import json
+import os
+import struct
+
+import numpy as np
+
+from utils.constants import FACTOR_ROW_ALIGNMENT
+from utils.factor_layout import align_factors, is_aligned_layout
+
+CHECKPOINT_MAGIC = b'NFXCKPT1'
+"""First bytes of every checkpoint file"""
+
+CHECKPOINT_VERSION = 1
+"""Version of the header layout, stored as format_version"""
+
+
+def align_offset(offset):
+    return -(-offset // FACTOR_ROW_ALIGNMENT) * FACTOR_ROW_ALIGNMENT
+
+
+def get_stored_array(array):
+    """Returns the array as written and its row stride if rows are padded"""
+    if array.ndim == 2 and not array.flags.c_contiguous and (
+            is_aligned_layout(array)):
+        row_stride = array.strides[0] // array.itemsize
+        return np.lib.stride_tricks.as_strided(
+            array, shape=(array.shape[0], row_stride)), row_stride
+    return np.ascontiguousarray(array), None
+
+
+def load_array(file_path, entry, data_start, mmap_mode):
+    dtype = np.dtype(entry['dtype'])
+    shape = tuple(entry['shape'])
+    row_stride = entry.get('row_stride')
+    stored_shape = shape if row_stride is None else (shape[0], row_stride)
+    if int(np.prod(stored_shape)) == 0:
+        return np.zeros(shape, dtype=dtype)
+    array = np.memmap(file_path, dtype=dtype, mode=mmap_mode or 'r',
+                      offset=data_start + entry['offset'], shape=stored_shape)
+    if row_stride is not None:
+        array = array[:, :shape[1]]
+    if mmap_mode is not None:
+        return array
+    array = np.array(array)
+    return array if row_stride is None else align_factors(array)
+
+
+def load_checkpoint(file_path, mmap_mode='r'):
+    """Returns the header and a dict of the arrays, memory-mapped with
+    mmap_mode ('r', 'c' or 'r+') or read into memory when it is None"""
+    header, data_start = read_checkpoint_header(file_path)
+    arrays = {name: load_array(file_path, entry, data_start, mmap_mode)
+              for name, entry in header['arrays'].items()}
+    return header, arrays
+
+
+def read_checkpoint_header(file_path):
+    with open(file_path, 'rb') as checkpoint_file:
+        if checkpoint_file.read(len(CHECKPOINT_MAGIC)) != CHECKPOINT_MAGIC:
+            raise ValueError('{} is not a checkpoint'.format(file_path))
+        header_length, = struct.unpack('<Q', checkpoint_file.read(8))
+        header = json.loads(checkpoint_file.read(header_length)
+                            .decode('utf-8'))
+    if header.get('format_version') != CHECKPOINT_VERSION:
+        raise ValueError('Unsupported checkpoint version {} in {}'
+                         .format(header.get('format_version'), file_path))
+    data_start = align_offset(len(CHECKPOINT_MAGIC) + 8 + header_length)
+    return header, data_start
+
+
+def save_checkpoint(file_path, arrays, header):
+    import tempfile
+    entries = {}
+    stored_arrays = []
+    data_length = 0
+    for name in sorted(arrays):
+        stored_array, row_stride = get_stored_array(arrays[name])
+        offset = align_offset(data_length)
+        entries[name] = {'dtype': stored_array.dtype.str,
+                         'shape': list(arrays[name].shape),
+                         'offset': offset}
+        if row_stride is not None:
+            entries[name]['row_stride'] = row_stride
+        stored_arrays.append((offset, stored_array))
+        data_length = offset + stored_array.nbytes
+    header = dict(header, format_version=CHECKPOINT_VERSION, arrays=entries)
+    header_bytes = json.dumps(header, sort_keys=True).encode('utf-8')
+    data_start = align_offset(len(CHECKPOINT_MAGIC) + 8 + len(header_bytes))
+    directory = os.path.dirname(os.path.abspath(file_path))
+    descriptor, temp_file_path = tempfile.mkstemp(
+        dir=directory, prefix='.' + os.path.basename(file_path),
+        suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as checkpoint_file:
+            checkpoint_file.write(CHECKPOINT_MAGIC)
+            checkpoint_file.write(struct.pack('<Q', len(header_bytes)))
+            checkpoint_file.write(header_bytes)
+            for offset, stored_array in stored_arrays:
+                checkpoint_file.seek(data_start + offset)
+                stored_array.tofile(checkpoint_file)
+            checkpoint_file.truncate(data_start + data_length)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        # mkstemp files are private; checkpoints are shared like pickles
+        os.chmod(temp_file_path, 0o644)
+        os.replace(temp_file_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+        raise
@@ -32,3 +32,61 @@ SVD_FEATURE_VALUE_INITIAL = 0.01
 
 BLENDING_RATIO = 25
 """Blending ratio (K) described by funny to blend global mean and movie mean"""
+
+
+PARSE_BLOCK_SIZE = 2 ** 25
+"""Number of bytes of raw text read and parsed at once by the block parsers"""
+
+POINT_NUM_COLUMNS = 4
+"""Number of integer columns (user, movie, time, rating) in a data point"""
+
+STATS_CHUNK_SIZE = 2 ** 22
+"""Number of data points reduced at once when computing data set statistics"""
+
+SORT_CHUNK_SIZE = 2 ** 24
+"""Number of data points sorted in memory by each external sort worker"""
+
+SORT_MERGE_BLOCK_SIZE = 2 ** 16
+"""Number of data points buffered per sorted run while merging runs"""
+
+PREDICT_CHUNK_SIZE = 2 ** 16
+"""Number of points whose factor rows are gathered at once when predicting"""
+
+RECOMMEND_BATCH_USERS = 2 ** 9
+"""Number of users whose scores for every movie are computed at once"""
+
+MIN_RATING = 1
+"""Lowest possible rating; predictions are clipped to it"""
+
+MAX_RATING = 5
+"""Highest possible rating; predictions are clipped to it"""
+
+FINGERPRINT_CHUNK_SIZE = 2 ** 20
+"""Number of points hashed at a time to fingerprint a points array"""
+
+ALS_BATCH_POINTS = 2 ** 20
+"""Approximate number of points whose ids are solved together by one ALS task"""
+
+NUMPY_BATCH_SIZE = 2 ** 14
+"""Number of points per mini-batch in the vectorized numpy kernels"""
+
+NUMPY_SCATTER_ROUNDS = 8
+"""Occurrences of one id in a mini-batch added directly; more are summed"""
+
+NUM_DAYS = 2243
+"""Number of distinct rating dates; time stamps run from 1 to NUM_DAYS"""
+
+NUM_TIME_BINS = 30
+"""Number of equal-length date bins of the time-dependent movie biases"""
+
+TIME_DEVIATION_EXPONENT = 0.4
+"""Exponent beta of the user drift dev_u(t) = sign(t - t_u) |t - t_u|^beta"""
+
+FACTOR_ROW_ALIGNMENT = 64
+"""Bytes each factor row is aligned and padded to: one AVX-512 register"""
+
+ORDER_CHUNK_POINTS = 2 ** 16
+"""Number of consecutive points shuffled as one chunk by 'chunks' orders"""
+
+ORDER_TILE_POINTS = 2 ** 18
+"""Approximate number of points per tile of whole users in 'user_tiles'"""
@@ -0,0 +1,107 @@
+"""Offset (CSR) indexes over data point arrays sorted by user or movie
+
+For points sorted by one column, ``offsets[i]:offsets[i + 1]`` is the range
+of rows holding id ``i``, so all ratings of a user (or movie) are a single
+zero-copy slice. Indexes are saved next to the sorted array they describe.
+"""
+from os.path import splitext
+
+import numpy as np
+
+from utils.constants import MOVIE_INDEX, TIME_INDEX, USER_INDEX
+from utils.data_io import get_point_column
+from utils.dataset import get_points_array, load_dataset_from_file
+
+
+SORT_ORDERS = {
+    'um': (USER_INDEX, MOVIE_INDEX),
+    'mu': (MOVIE_INDEX, USER_INDEX),
+    'du': (TIME_INDEX, USER_INDEX)
+}
+"""Sort keys (primary column, secondary column) of each sort order name"""
+
+
+class PointIndex:
+    def __init__(self, points, offsets):
+        self.points = points
+        self.offsets = offsets
+
+    def __getitem__(self, key):
+        return self.points[self.offsets[key]:self.offsets[key + 1]]
+
+    @property
+    def num_ids(self):
+        return self.offsets.shape[0] - 1
+
+    def count(self, key):
+        return int(self.offsets[key + 1] - self.offsets[key])
+
+    def counts(self):
+        return np.diff(self.offsets)
+
+    def gather(self, keys):
+        """Returns the points of every key in keys, concatenated, and the
+        position in keys each point belongs to; unknown keys have none"""
+        keys = np.minimum(np.asarray(keys, dtype=np.int64), self.num_ids)
+        starts = self.offsets[keys]
+        counts = self.offsets[np.minimum(keys + 1, self.num_ids)] - starts
+        positions = np.repeat(np.arange(keys.shape[0]), counts)
+        first_rows = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        rows = first_rows + np.arange(positions.shape[0])
+        return self.points[rows], positions
+
+
+def build_point_index(sorted_points, column_index, num_ids=None):
+    sorted_points = get_points_array(sorted_points)
+    offsets = compute_index_offsets(get_point_column(sorted_points,
+                                                     column_index),
+                                    num_ids=num_ids)
+    return PointIndex(sorted_points, offsets)
+
+
+def build_user_index(points, num_users=None):
+    """Returns a user-major PointIndex of points in any order, copying them
+    into user order only when they are not sorted by user already"""
+    points = get_points_array(points)
+    users = get_point_column(points, USER_INDEX)
+    if np.any(users[1:] < users[:-1]):
+        order = np.argsort(users, kind='mergesort')
+        points = points[order]
+        users = users[order]
+    return PointIndex(points, compute_index_offsets(users, num_ids=num_users))
+
+
+def compute_index_offsets(sorted_column, num_ids=None):
+    if sorted_column.shape[0] and np.any(sorted_column[1:] <
+                                         sorted_column[:-1]):
+        raise ValueError('Cannot index points that are not sorted by the '
+                         'indexed column')
+    counts = np.bincount(sorted_column, minlength=num_ids or 0)
+    offsets = np.zeros(shape=(counts.shape[0] + 1,), dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets
+
+
+def get_index_file_path(sorted_file_path):
+    # Works for both .npy and compact .pts sorted files
+    return splitext(sorted_file_path)[0] + '_idx.npy'
+
+
+def load_point_index_from_file(sorted_file_path):
+    points = load_dataset_from_file(sorted_file_path).points
+    offsets = np.load(get_index_file_path(sorted_file_path), mmap_mode='r')
+    return PointIndex(points, offsets)
+
+
+def split_id_batches(offsets, batch_points):
+    num_ids = offsets.shape[0] - 1
+    targets = np.arange(batch_points, offsets[-1], batch_points)
+    boundaries = np.unique(np.concatenate(
+        ([0], np.searchsorted(offsets, targets), [num_ids])))
+    return [(int(start_id), int(stop_id))
+            for start_id, stop_id in zip(boundaries[:-1], boundaries[1:])]
+
+
+def write_index_offsets_to_file(offsets, sorted_file_path):
+    np.save(get_index_file_path(sorted_file_path), offsets)
+
@@ -6,6 +6,22 @@ from __future__ import print_function
 import numpy as np
 
 
+COMPACT_POINT_DTYPE = np.dtype([('user', '<i4'), ('movie', '<i2'),
+                                ('time', '<i2'), ('rating', 'i1')])
+"""Packed 9-byte record of one data point in the compact points format"""
+
+COMPACT_POINT_FIELDS = ('user', 'movie', 'time', 'rating')
+"""Compact record field names, in the order of the data point tuple indices"""
+
+COMPACT_HEADER_DTYPE = np.dtype([('magic', 'S4'), ('version', '<u2'),
+                                 ('record_size', '<u2'),
+                                 ('num_points', '<u8')])
+"""16-byte header written before the records of a compact points file"""
+
+COMPACT_FORMAT_MAGIC = b'NFXP'
+COMPACT_FORMAT_VERSION = 1
+
+
 def _generate_points_from_index(correct_index):
     from utils.data_paths import ALL_DATA_FILE_PATH, ALL_INDEX_FILE_PATH
     indices_generator = indices(ALL_INDEX_FILE_PATH)
@@ -19,6 +35,52 @@ def _generate_points_from_index(correct_index):
             yield point
 
 
+def _compact_header(file_path):
+    header = np.fromfile(file_path, dtype=COMPACT_HEADER_DTYPE, count=1)
+    if (header.shape[0] != 1 or
+            header['magic'][0] != COMPACT_FORMAT_MAGIC):
+        raise ValueError('{} is not a compact points file'.format(file_path))
+    if header['version'][0] != COMPACT_FORMAT_VERSION:
+        raise ValueError('Unsupported compact points format version {} in {}'
+                         .format(header['version'][0], file_path))
+    if header['record_size'][0] != COMPACT_POINT_DTYPE.itemsize:
+        raise ValueError('Unexpected record size {} in {}'
+                         .format(header['record_size'][0], file_path))
+    return header[0]
+
+
+def _int32_blocks(file_path, block_size=None):
+    from utils.constants import PARSE_BLOCK_SIZE
+    if block_size is None:
+        block_size = PARSE_BLOCK_SIZE
+    remainder = b''
+    with open(file_path, 'rb') as data_file:
+        while True:
+            chunk = data_file.read(block_size)
+            if not chunk:
+                break
+            chunk = remainder + chunk
+            last_line_end = chunk.rfind(b'\n') + 1
+            remainder = chunk[last_line_end:]
+            if last_line_end:
+                yield _parse_int32_block(chunk[:last_line_end])
+    if remainder.strip():
+        yield _parse_int32_block(remainder)
+
+
+def _parse_int32_block(text):
+    values = np.fromstring(text, dtype=np.int32, sep=' ')
+    # fromstring stops quietly at a bad token, so every token must be parsed
+    is_space = np.frombuffer(text, dtype=np.uint8) <= ord(' ')
+    num_tokens = np.count_nonzero(is_space[:-1] & ~is_space[1:])
+    if is_space.shape[0] and not is_space[0]:
+        num_tokens += 1
+    if values.shape[0] != num_tokens:
+        raise ValueError('Malformed integer block: parsed {} of {} values'
+                         .format(values.shape[0], num_tokens))
+    return values
+
+
 def all_points():
     from utils.data_paths import ALL_DATA_FILE_PATH
     count = 0
@@ -29,18 +91,66 @@ def all_points():
         yield data_point
 
 
+def all_point_blocks(block_size=None):
+    from utils.data_paths import ALL_DATA_FILE_PATH
+    count = 0
+    for block in data_point_blocks(ALL_DATA_FILE_PATH, block_size=block_size):
+        count += block.shape[0]
+        print(count, 'points parsed')
+        yield block
+
+
+def array_from_compact_points(compact_points):
+    from utils.constants import POINT_NUM_COLUMNS
+    points = np.empty(shape=(compact_points.shape[0], POINT_NUM_COLUMNS),
+                      dtype=np.int32)
+    for column_index, field in enumerate(COMPACT_POINT_FIELDS):
+        points[:, column_index] = compact_points[field]
+    return points
+
+
 def base_points():
     from utils.constants import BASE_INDEX
     for point in _generate_points_from_index(BASE_INDEX):
         yield point
 
 
+def compact_points_from_array(points):
+    compact_points = np.empty(shape=(points.shape[0],),
+                              dtype=COMPACT_POINT_DTYPE)
+    for column_index, field in enumerate(COMPACT_POINT_FIELDS):
+        column = points[:, column_index]
+        field_info = np.iinfo(COMPACT_POINT_DTYPE[field])
+        if column.shape[0] and (np.amin(column) < field_info.min or
+                                np.amax(column) > field_info.max):
+            raise ValueError('Column "{}" does not fit in the compact points '
+                             'format'.format(field))
+        compact_points[field] = column
+    return compact_points
+
+
+def data_point_blocks(data_file_path, block_size=None):
+    """Yield the points of a data file as int32 arrays of shape (n, 4)"""
+    from utils.constants import POINT_NUM_COLUMNS
+    for block in _int32_blocks(data_file_path, block_size):
+        if block.size % POINT_NUM_COLUMNS:
+            raise ValueError('Malformed data file {}: expected {} values per '
+                             'line'.format(data_file_path, POINT_NUM_COLUMNS))
+        yield block.reshape(-1, POINT_NUM_COLUMNS)
+
+
 def data_points(data_file_path):
     with open(data_file_path) as data_file:
         for line in data_file:
             yield line.strip().split()
 
 
+def get_point_column(points, column_index):
+    if points.dtype.names is not None:
+        return points[COMPACT_POINT_FIELDS[column_index]]
+    return points[:, column_index]
+
+
 def get_user_movie_time_rating(data_point):
     from utils.constants import (MOVIE_INDEX, RATING_INDEX, TIME_INDEX,
                                  USER_INDEX)
@@ -57,6 +167,12 @@ def hidden_points():
         yield point
 
 
+def index_blocks(index_file_path, block_size=None):
+    """Yield the indices of an index file as 1-d int32 arrays"""
+    for block in _int32_blocks(index_file_path, block_size):
+        yield block
+
+
 def indices(index_file_path):
     with open(index_file_path) as index_file:
         for line in index_file:
@@ -90,5 +206,55 @@ def write_submission(ratings, submission_file_name):
         submission_file.writelines(['{:.3f}\n'.format(r) for r in ratings])
 
 
-def load_numpy_array_from_file(file_name):
-    return np.load(file_name)
+def is_compact_points_file(file_path):
+    with open(file_path, 'rb') as points_file:
+        magic = points_file.read(len(COMPACT_FORMAT_MAGIC))
+    return magic == COMPACT_FORMAT_MAGIC
+
+
+def create_compact_points_file(file_path, num_points):
+    """Write the header of a compact points file and map its records"""
+    header = np.zeros(shape=(1,), dtype=COMPACT_HEADER_DTYPE)
+    header['magic'] = COMPACT_FORMAT_MAGIC
+    header['version'] = COMPACT_FORMAT_VERSION
+    header['record_size'] = COMPACT_POINT_DTYPE.itemsize
+    header['num_points'] = num_points
+    with open(file_path, 'wb') as points_file:
+        header.tofile(points_file)
+        points_file.truncate(COMPACT_HEADER_DTYPE.itemsize +
+                             num_points * COMPACT_POINT_DTYPE.itemsize)
+    if num_points == 0:
+        return np.zeros(shape=(0,), dtype=COMPACT_POINT_DTYPE)
+    return np.memmap(file_path, dtype=COMPACT_POINT_DTYPE, mode='r+',
+                     offset=COMPACT_HEADER_DTYPE.itemsize,
+                     shape=(num_points,))
+
+
+def load_compact_points_from_file(file_path, mmap_mode='r'):
+    header = _compact_header(file_path)
+    num_points = int(header['num_points'])
+    if mmap_mode is None:
+        with open(file_path, 'rb') as points_file:
+            points_file.seek(COMPACT_HEADER_DTYPE.itemsize)
+            return np.fromfile(points_file, dtype=COMPACT_POINT_DTYPE,
+                               count=num_points)
+    if num_points == 0:
+        return np.zeros(shape=(0,), dtype=COMPACT_POINT_DTYPE)
+    return np.memmap(file_path, dtype=COMPACT_POINT_DTYPE, mode=mmap_mode,
+                     offset=COMPACT_HEADER_DTYPE.itemsize,
+                     shape=(num_points,))
+
+
+def load_numpy_array_from_file(file_name, mmap_mode=None):
+    return np.load(file_name, mmap_mode=mmap_mode)
+
+
+def write_compact_points_to_file(points, file_path, chunk_size=2 ** 20):
+    compact_points = create_compact_points_file(file_path, points.shape[0])
+    for start in range(0, points.shape[0], chunk_size):
+        chunk = points[start:start + chunk_size]
+        if chunk.dtype != COMPACT_POINT_DTYPE:
+            chunk = compact_points_from_array(chunk)
+        compact_points[start:start + chunk_size] = chunk
+    if points.shape[0]:
+        compact_points.flush()
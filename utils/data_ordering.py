@@ -0,0 +1,136 @@
+"""Training orders: permutations of point rows that kernels follow in place
+
+Kernels that take an ``order`` visit ``points[order[i]]`` for increasing
+``i``, so a new order never copies the (large) points array itself.
+"""
+import numpy as np
+
+from utils.constants import (MOVIE_INDEX, ORDER_CHUNK_POINTS,
+                             ORDER_TILE_POINTS, USER_INDEX)
+from utils.data_io import get_point_column
+from utils.dataset import get_points_array
+
+TRAINING_ORDERS = ('file', 'shuffled', 'chunks', 'user_tiles')
+"""Per-epoch orders of TrainingOrder. 'file' keeps the points array's order;
+'shuffled' is a uniform permutation; 'chunks' shuffles runs of consecutive
+points and the points within each run; 'user_tiles' does the same to tiles
+of whole users in user-major order, so a tile's user rows stay in cache"""
+
+
+class TrainingOrder:
+    def __init__(self, strategy='file', chunk_points=ORDER_CHUNK_POINTS,
+                 tile_points=ORDER_TILE_POINTS, seed=None):
+        if strategy not in TRAINING_ORDERS:
+            raise ValueError('Unknown training order {}, expected one of {}'
+                             .format(strategy, TRAINING_ORDERS))
+        self.strategy = strategy
+        self.chunk_points = chunk_points
+        self.tile_points = tile_points
+        self.random_state = np.random.RandomState(seed)
+        self.num_points = None
+        self.base_order = None
+        self.block_offsets = None
+        self.order = None
+
+    def __getstate__(self):
+        # Orders are rebuilt for whatever points are trained next
+        state = self.__dict__.copy()
+        for name in ('num_points', 'base_order', 'block_offsets', 'order'):
+            state[name] = None
+        return state
+
+    def get_epoch_order(self, points):
+        """Returns a new permutation of the points for this epoch, or None
+        to train in file order. The array is reused by the next call."""
+        if self.strategy == 'file':
+            return None
+        points = get_points_array(points)
+        if self.num_points != points.shape[0]:
+            self.set_points(points)
+        if self.strategy == 'shuffled':
+            self.order[:] = self.random_state.permutation(self.num_points)
+        else:
+            shuffle_blocks(self.base_order, self.block_offsets,
+                           random_state=self.random_state, out=self.order)
+        return self.order
+
+    def set_points(self, points):
+        self.num_points = points.shape[0]
+        self.order = np.empty(self.num_points, dtype=np.int32)
+        self.base_order = None
+        self.block_offsets = None
+        if self.strategy == 'chunks':
+            self.block_offsets = compute_chunk_offsets(
+                self.num_points, chunk_points=self.chunk_points)
+        elif self.strategy == 'user_tiles':
+            self.base_order, self.block_offsets = compute_user_tiles(
+                points, tile_points=self.tile_points)
+
+
+def compute_balanced_bins(ids, num_bins):
+    counts = np.bincount(ids)
+    points_before = np.cumsum(counts) - counts
+    id_bins = (points_before * num_bins) // max(ids.shape[0], 1)
+    return np.minimum(id_bins, num_bins - 1).astype(np.int32)[ids]
+
+
+def compute_chunk_offsets(num_points, chunk_points):
+    return np.append(np.arange(0, num_points, chunk_points, dtype=np.int64),
+                     np.int64(num_points))
+
+
+def compute_stratified_order(points, num_blocks):
+    points = get_points_array(points)
+    user_bins = compute_balanced_bins(get_point_column(points, USER_INDEX),
+                                      num_bins=num_blocks)
+    movie_bins = compute_balanced_bins(get_point_column(points, MOVIE_INDEX),
+                                       num_bins=num_blocks)
+    blocks = user_bins * num_blocks + movie_bins
+    order = np.argsort(blocks, kind='mergesort').astype(np.int32)
+    block_offsets = np.zeros(shape=(num_blocks ** 2 + 1,), dtype=np.int64)
+    np.cumsum(np.bincount(blocks, minlength=num_blocks ** 2),
+              out=block_offsets[1:])
+    return order, block_offsets
+
+
+def get_stratum_blocks(stratum, num_blocks):
+    rows = np.arange(num_blocks)
+    return rows * num_blocks + (rows + stratum) % num_blocks
+
+
+def compute_user_tiles(points, tile_points):
+    """Returns a user-major order (None if the points already are) and the
+    offsets of tiles of whole users holding about tile_points points each"""
+    users = get_point_column(get_points_array(points), USER_INDEX)
+    if users.shape[0] == 0:
+        return None, np.zeros(1, dtype=np.int64)
+    if np.all(users[1:] >= users[:-1]):
+        order = None
+        sorted_users = users
+    else:
+        order = np.argsort(users, kind='mergesort').astype(np.int32)
+        sorted_users = users[order]
+    user_starts = np.flatnonzero(np.concatenate(
+        ([True], sorted_users[1:] != sorted_users[:-1])))
+    # A tile starts at the first user starting past each tile_points boundary
+    tiles = user_starts // max(tile_points, 1)
+    tile_starts = user_starts[np.concatenate(
+        ([True], tiles[1:] != tiles[:-1]))]
+    return order, np.append(tile_starts, users.shape[0]).astype(np.int64)
+
+
+def shuffle_blocks(base_order, block_offsets, random_state, out=None):
+    """Permutes the blocks base_order[block_offsets[b]:block_offsets[b + 1]]
+    and the points within each; a None base_order is the file order"""
+    num_points = block_offsets[-1]
+    if out is None:
+        out = np.empty(num_points, dtype=np.int32)
+    position = 0
+    for block in random_state.permutation(block_offsets.shape[0] - 1):
+        start, stop = block_offsets[block], block_offsets[block + 1]
+        rows = random_state.permutation(stop - start) + start
+        if base_order is not None:
+            rows = base_order[rows]
+        out[position:position + stop - start] = rows
+        position += stop - start
+    return out
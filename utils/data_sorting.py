@@ -0,0 +1,151 @@
+"""External sort of data point files that do not fit in memory
+
+The input is cut into runs of ``SORT_CHUNK_SIZE`` points that worker
+processes sort in parallel and spill to temporary files. The runs are then
+merged block by block straight into the preallocated output file, and the
+CSR offsets of the primary sort column are counted in the same pass.
+"""
+from __future__ import print_function
+import multiprocessing
+import numpy as np
+import os
+import shutil
+import tempfile
+
+from utils.constants import SORT_CHUNK_SIZE, SORT_MERGE_BLOCK_SIZE
+from utils.data_indexes import SORT_ORDERS, write_index_offsets_to_file
+from utils.data_io import (COMPACT_POINT_DTYPE, create_compact_points_file,
+                           get_point_column)
+from utils.dataset import load_dataset_from_file
+
+
+def compute_sort_keys(points, order):
+    primary_column, secondary_column = SORT_ORDERS[order]
+    keys = get_point_column(points, primary_column).astype(np.int64) << 32
+    keys |= get_point_column(points, secondary_column).astype(np.int64)
+    return keys
+
+
+def external_sort(input_file_path, output_file_path, order='um',
+                  keep_columns=None, write_index=True,
+                  chunk_size=SORT_CHUNK_SIZE,
+                  block_size=SORT_MERGE_BLOCK_SIZE, num_workers=None):
+    points = load_dataset_from_file(input_file_path).points
+    is_compact = points.dtype == COMPACT_POINT_DTYPE
+    if is_compact and keep_columns is not None:
+        raise ValueError('Columns cannot be dropped from compact points')
+    num_points = points.shape[0]
+    if num_workers is None:
+        num_workers = multiprocessing.cpu_count()
+    run_directory = tempfile.mkdtemp(
+        dir=os.path.dirname(os.path.abspath(output_file_path)))
+    try:
+        run_arguments = [
+            (input_file_path, start, start + chunk_size, order,
+             os.path.join(run_directory, 'run_{}.npy'.format(run_number)))
+            for run_number, start in enumerate(range(0, num_points,
+                                                     chunk_size))
+        ]
+        print('Sorting {} runs...'.format(len(run_arguments)))
+        if num_workers > 1 and len(run_arguments) > 1:
+            pool = multiprocessing.Pool(processes=num_workers)
+            try:
+                run_file_paths = pool.map(_sort_run, run_arguments)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            run_file_paths = [_sort_run(arguments)
+                              for arguments in run_arguments]
+        if is_compact:
+            output = create_compact_points_file(output_file_path, num_points)
+        else:
+            if keep_columns is None:
+                keep_columns = list(range(points.shape[1]))
+            output = np.lib.format.open_memmap(
+                output_file_path, mode='w+', dtype=points.dtype,
+                shape=(num_points, len(keep_columns)))
+        print('Merging runs...')
+        primary_column = SORT_ORDERS[order][0]
+        counts = np.zeros(shape=(0,), dtype=np.int64)
+        position = 0
+        runs = [np.load(file_path, mmap_mode='r')
+                for file_path in run_file_paths]
+        for merged_points in merge_sorted_runs(runs, order, block_size):
+            if keep_columns is not None:
+                merged_points = merged_points[:, keep_columns]
+            output[position:position + merged_points.shape[0]] = merged_points
+            position += merged_points.shape[0]
+            if write_index:
+                block_counts = np.bincount(
+                    get_point_column(merged_points, primary_column),
+                    minlength=counts.shape[0])
+                block_counts[:counts.shape[0]] += counts
+                counts = block_counts
+        del runs
+        if num_points:
+            output.flush()
+    finally:
+        shutil.rmtree(run_directory)
+    if not write_index:
+        return None
+    offsets = np.zeros(shape=(counts.shape[0] + 1,), dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    write_index_offsets_to_file(offsets, output_file_path)
+    return offsets
+
+
+def merge_sorted_runs(runs, order, block_size=SORT_MERGE_BLOCK_SIZE):
+    """Yield the points of several sorted runs as sorted merged blocks
+
+    Ties keep the order of the runs, so the merge is stable.
+    """
+    run_positions = [0] * len(runs)
+    buffers = [None] * len(runs)
+    buffer_keys = [None] * len(runs)
+    while True:
+        for run_number, run in enumerate(runs):
+            if (buffers[run_number] is None or
+                    not buffers[run_number].shape[0]):
+                start = run_positions[run_number]
+                buffers[run_number] = np.array(run[start:start + block_size])
+                buffer_keys[run_number] = compute_sort_keys(
+                    buffers[run_number], order)
+                run_positions[run_number] += buffers[run_number].shape[0]
+        if not any(buffer.shape[0] for buffer in buffers):
+            return
+        # The run whose buffer ends lowest bounds what is safe to emit.
+        # Runs after it hold back keys equal to the bound so ties stay in
+        # run order.
+        bound_run_number = None
+        for run_number, keys in enumerate(buffer_keys):
+            if (run_positions[run_number] < runs[run_number].shape[0] and
+                    (bound_run_number is None or
+                     keys[-1] < buffer_keys[bound_run_number][-1])):
+                bound_run_number = run_number
+        if bound_run_number is not None:
+            bound_key = buffer_keys[bound_run_number][-1]
+        merged_buffers = []
+        merged_keys = []
+        for run_number, keys in enumerate(buffer_keys):
+            if bound_run_number is None:
+                num_taken = keys.shape[0]
+            else:
+                side = 'right' if run_number <= bound_run_number else 'left'
+                num_taken = np.searchsorted(keys, bound_key, side=side)
+            merged_buffers.append(buffers[run_number][:num_taken])
+            merged_keys.append(keys[:num_taken])
+            buffers[run_number] = buffers[run_number][num_taken:]
+            buffer_keys[run_number] = keys[num_taken:]
+        merged_keys = np.concatenate(merged_keys)
+        merge_order = np.argsort(merged_keys, kind='mergesort')
+        yield np.concatenate(merged_buffers)[merge_order]
+
+
+def _sort_run(arguments):
+    input_file_path, start, stop, order, run_file_path = arguments
+    points = np.array(load_dataset_from_file(input_file_path)
+                      .points[start:stop])
+    run_order = np.argsort(compute_sort_keys(points, order), kind='mergesort')
+    np.save(run_file_path, points[run_order])
+    return run_file_path
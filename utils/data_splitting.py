@@ -1,13 +1,84 @@
+from __future__ import print_function
 import numpy as np
 
+from utils.constants import (BASE_INDEX, HIDDEN_INDEX, POINT_NUM_COLUMNS,
+                             PROBE_INDEX, QUAL_INDEX, VALID_INDEX)
+
+
+SPLIT_NAMES = {
+    BASE_INDEX: 'base',
+    VALID_INDEX: 'valid',
+    HIDDEN_INDEX: 'hidden',
+    PROBE_INDEX: 'probe',
+    QUAL_INDEX: 'qual'
+}
+
 
 def write_numpy_array_to_file(array, file_path):
     np.save(file_path, array)
 
 
-def create_numpy_array_from_generator(generator, overestimated_shape):
-    array = np.zeros(shape=overestimated_shape, dtype=np.int32)
-    index = 0
-    for index, value in enumerate(generator()):
-        array[index, :] = value
-    return array[:index + 1, :]
+def count_points_by_index(index_file_path, block_size=None):
+    from utils.data_io import index_blocks
+    counts = np.zeros(shape=(max(SPLIT_NAMES) + 1,), dtype=np.int64)
+    for block in index_blocks(index_file_path, block_size=block_size):
+        block_counts = np.bincount(block, minlength=counts.shape[0])
+        block_counts[:counts.shape[0]] += counts
+        counts = block_counts
+    return counts
+
+
+def split_points_by_index(split_file_paths, data_file_path, index_file_path,
+                          block_size=None):
+    """Write the points of every split to its own .npy file in one pass
+
+    ``split_file_paths`` maps a split index (``BASE_INDEX``...) to the path
+    of its output file. Outputs are preallocated from the index counts.
+    """
+    from utils.data_io import data_point_blocks, index_blocks
+    counts = count_points_by_index(index_file_path, block_size=block_size)
+    split_arrays = {}
+    for split_index, file_path in split_file_paths.items():
+        num_points = counts[split_index] if split_index < len(counts) else 0
+        split_arrays[split_index] = np.lib.format.open_memmap(
+            file_path, mode='w+', dtype=np.int32,
+            shape=(num_points, POINT_NUM_COLUMNS)
+        )
+    positions = dict.fromkeys(split_arrays, 0)
+    index_generator = index_blocks(index_file_path, block_size=block_size)
+    pending_indices = np.zeros(shape=(0,), dtype=np.int32)
+    routed = 0
+    for block in data_point_blocks(data_file_path, block_size=block_size):
+        num_points = block.shape[0]
+        while pending_indices.shape[0] < num_points:
+            try:
+                next_indices = next(index_generator)
+            except StopIteration:
+                raise ValueError('Index file {} has fewer lines than data '
+                                 'file {}'.format(index_file_path,
+                                                  data_file_path))
+            pending_indices = np.concatenate((pending_indices, next_indices))
+        block_indices = pending_indices[:num_points]
+        pending_indices = pending_indices[num_points:]
+        order = np.argsort(block_indices, kind='mergesort')
+        sorted_indices = block_indices[order]
+        for split_index, split_array in split_arrays.items():
+            start = np.searchsorted(sorted_indices, split_index, side='left')
+            end = np.searchsorted(sorted_indices, split_index, side='right')
+            position = positions[split_index]
+            split_array[position:position + end - start] = (
+                block[order[start:end]]
+            )
+            positions[split_index] = position + end - start
+        routed += num_points
+        print(routed, 'points routed')
+    for split_array in split_arrays.values():
+        split_array.flush()
+    for split_index, split_array in split_arrays.items():
+        if positions[split_index] != split_array.shape[0]:
+            raise ValueError('Data file {} has fewer lines than index file '
+                             '{}: split {} got {} of {} points'.format(
+                                 data_file_path, index_file_path,
+                                 split_index, positions[split_index],
+                                 split_array.shape[0]))
+    return positions
@@ -2,11 +2,14 @@ import numpy as np
 import pickle
 
 from utils import constants
+from utils.data_io import get_point_column
+from utils.dataset import get_num_movies, get_num_users, get_points_array
 
 
 class DataStats:
-    def __init__(self):
+    def __init__(self, chunk_size=constants.STATS_CHUNK_SIZE):
         self.data_set = np.array([])
+        self.chunk_size = chunk_size
         self.num_users = None
         self.num_movies = None
         self.global_average = None
@@ -17,9 +20,14 @@ class DataStats:
         self.user_rating_count = np.array([])
         self.user_offsets_sum = np.array([])
 
+    def __setstate__(self, state):
+        # Stats pickled before chunked reduction have no chunk_size
+        state.setdefault('chunk_size', constants.STATS_CHUNK_SIZE)
+        self.__dict__.update(state)
+
     def init_movie_and_user_arrays(self):
         movies_1d = (self.num_movies,)
-        users_1d = (self.num_movies,)
+        users_1d = (self.num_users,)
         self.movie_averages = np.zeros(shape=movies_1d, dtype=np.float32)
         self.movie_rating_count = np.zeros(shape=movies_1d, dtype=np.int32)
         self.movie_rating_sum = np.zeros(shape=movies_1d)
@@ -28,12 +36,18 @@ class DataStats:
         self.user_rating_count = np.zeros(shape=users_1d, dtype=np.int32)
 
     def load_data_set(self, data_set):
-        self.data_set = data_set
-        self.num_users = np.amax(data_set[:, constants.USER_INDEX]) + 1
-        self.num_movies = np.amax(data_set[:, constants.MOVIE_INDEX]) + 1
+        """Load one data set, or a list of them to compute combined stats"""
+        if isinstance(data_set, (list, tuple)):
+            self.data_set = [get_points_array(part) for part in data_set]
+            parts = data_set
+        else:
+            self.data_set = get_points_array(data_set)
+            parts = [data_set]
+        self.num_users = max(get_num_users(part) for part in parts)
+        self.num_movies = max(get_num_movies(part) for part in parts)
 
     def compute_stats(self):
-        if self.data_set == np.array([]):
+        if sum(np.size(data_set) for data_set in self.get_data_sets()) == 0:
             raise Exception(
                 'No Data set loaded. '
                 'Please use DataStats.load_data_set(data_set) '
@@ -44,88 +58,182 @@ class DataStats:
             self.compute_movie_stats()
             self.compute_user_stats()
 
+    def accumulate_movie_stats(self, data_sets):
+        for chunk in self.iterate_chunks(data_sets):
+            chunk_sum, chunk_count = compute_simple_indexed_sum_and_count(
+                data_values=get_point_column(chunk, constants.RATING_INDEX),
+                data_indices=get_point_column(chunk, constants.MOVIE_INDEX),
+                array_length=self.num_movies
+            )
+            self.movie_rating_sum += chunk_sum
+            self.movie_rating_count += chunk_count
+
+    def accumulate_user_stats(self, data_sets):
+        for chunk in self.iterate_chunks(data_sets):
+            simple_offsets = compute_offsets(
+                data_indices=get_point_column(chunk, constants.MOVIE_INDEX),
+                data_values=get_point_column(chunk, constants.RATING_INDEX),
+                averages=self.movie_averages
+            )
+            chunk_sum, chunk_count = compute_simple_indexed_sum_and_count(
+                data_indices=get_point_column(chunk, constants.USER_INDEX),
+                data_values=simple_offsets,
+                array_length=self.num_users
+            )
+            self.user_offsets_sum += chunk_sum
+            self.user_rating_count += chunk_count
+
     def compute_movie_stats(self):
-        simple_sum, simple_count = compute_simple_indexed_sum_and_count(
-            data_values=self.data_set[:, constants.RATING_INDEX],
-            data_indices=self.data_set[:, constants.MOVIE_INDEX]
-        )
-        global_average = compute_global_average_rating(data_set=self.data_set)
+        self.movie_rating_sum = np.zeros(shape=(self.num_movies,))
+        self.movie_rating_count = np.zeros(shape=(self.num_movies,),
+                                           dtype=np.int32)
+        self.accumulate_movie_stats(self.get_data_sets())
+        self.derive_movie_averages()
+
+    def compute_user_stats(self):
+        self.user_offsets_sum = np.zeros(shape=(self.num_users,))
+        self.user_rating_count = np.zeros(shape=(self.num_users,),
+                                          dtype=np.int32)
+        self.accumulate_user_stats(self.get_data_sets())
+        self.derive_user_offsets()
+
+    def derive_averages(self):
+        self.derive_movie_averages()
+        self.derive_user_offsets()
+
+    def derive_movie_averages(self):
+        global_average = (np.sum(self.movie_rating_sum) /
+                          np.sum(self.movie_rating_count))
         self.movie_averages = compute_blended_indexed_averages(
-            simple_sum=simple_sum,
-            simple_count=simple_count,
+            simple_sum=self.movie_rating_sum,
+            simple_count=self.movie_rating_count,
             global_average=global_average
         )
-        self.movie_rating_count = simple_count
-        self.movie_rating_sum = simple_sum
         self.global_average = global_average
 
-    def compute_user_stats(self):
-        simple_offsets = compute_offsets(
-            data_indices=self.data_set[:, constants.MOVIE_INDEX],
-            data_values=self.data_set[:, constants.RATING_INDEX],
-            averages=self.movie_averages
-        )
-        simple_sum, simple_count = compute_simple_indexed_sum_and_count(
-            data_indices=self.data_set[:, constants.USER_INDEX],
-            data_values=simple_offsets
-        )
-        user_offset_global_average = np.sum(simple_sum)/np.sum(simple_count)
-        if user_offset_global_average == np.nan:
+    def derive_user_offsets(self):
+        user_offset_global_average = (np.sum(self.user_offsets_sum) /
+                                      np.sum(self.user_rating_count))
+        if np.isnan(user_offset_global_average):
             raise Exception('Error NaN in global average of offsets')
         self.user_offsets = compute_blended_indexed_averages(
-            simple_sum=simple_sum,
-            simple_count=simple_count,
+            simple_sum=self.user_offsets_sum,
+            simple_count=self.user_rating_count,
             global_average=user_offset_global_average
         )
-        self.user_offsets_sum = simple_sum
-        self.user_rating_count = simple_count
 
-    def get_baseline(self, user, movie):
-        if self.movie_averages == np.array([]):
+    def get_data_sets(self):
+        if isinstance(self.data_set, list):
+            return self.data_set
+        return [self.data_set]
+
+    def check_baseline_arrays(self):
+        if self.movie_averages.size == 0:
             raise Exception('Cannot get baseline: Missing Movie averages!')
-        if self.user_offsets == np.array([]):
+        if self.user_offsets.size == 0:
             raise Exception('Cannot get baseline: Missing user offsets!')
+
+    def get_baseline(self, user, movie):
+        self.check_baseline_arrays()
         mov_avg = self.movie_averages[movie]
         usr_off = self.user_offsets[user]
         return mov_avg + usr_off
 
+    def get_baselines(self, users, movies):
+        self.check_baseline_arrays()
+        return self.movie_averages[movies] + self.user_offsets[users]
+
+    def grow_movie_and_user_arrays(self, num_users, num_movies):
+        self.num_users = max(self.num_users or 0, num_users)
+        self.num_movies = max(self.num_movies or 0, num_movies)
+        self.movie_rating_sum = grow_array(self.movie_rating_sum,
+                                           self.num_movies)
+        self.movie_rating_count = grow_array(self.movie_rating_count,
+                                             self.num_movies, dtype=np.int32)
+        self.user_offsets_sum = grow_array(self.user_offsets_sum,
+                                           self.num_users)
+        self.user_rating_count = grow_array(self.user_rating_count,
+                                            self.num_users, dtype=np.int32)
+
+    def iterate_chunks(self, data_sets=None):
+        if data_sets is None:
+            data_sets = self.get_data_sets()
+        for data_set in data_sets:
+            for start in range(0, data_set.shape[0], self.chunk_size):
+                yield data_set[start:start + self.chunk_size]
+
+    def merge(self, other_stats):
+        """Add the sums and counts of other_stats and re-derive the averages
+
+        Each side's user offset sums stay relative to the movie averages
+        they were accumulated against; call compute_stats on the combined
+        data set to re-base them exactly.
+        """
+        self.grow_movie_and_user_arrays(num_users=other_stats.num_users,
+                                        num_movies=other_stats.num_movies)
+        self.movie_rating_sum[:other_stats.num_movies] += (
+            other_stats.movie_rating_sum)
+        self.movie_rating_count[:other_stats.num_movies] += (
+            other_stats.movie_rating_count)
+        self.user_offsets_sum[:other_stats.num_users] += (
+            other_stats.user_offsets_sum)
+        self.user_rating_count[:other_stats.num_users] += (
+            other_stats.user_rating_count)
+        self.derive_averages()
+
+    def update(self, new_points):
+        """Add a batch of points to the stats without revisiting old points
+
+        The new points' user offsets are taken against the re-derived movie
+        averages; offsets accumulated earlier are not re-based.
+        """
+        data_sets = [get_points_array(new_points)]
+        self.grow_movie_and_user_arrays(num_users=get_num_users(new_points),
+                                        num_movies=get_num_movies(new_points))
+        self.accumulate_movie_stats(data_sets)
+        self.derive_movie_averages()
+        self.accumulate_user_stats(data_sets)
+        self.derive_user_offsets()
+
     def write_stats_to_file(self, file_path):
         self.data_set = []
         pickle.dump(self, file=open(file_path, 'wb'))
 
 
-def compute_simple_indexed_sum_and_count(data_indices, data_values):
+def compute_simple_indexed_sum_and_count(data_indices, data_values,
+                                         array_length=None):
     if data_indices.shape != data_values.shape:
         raise ValueError(
             'Error! Shapes of index array and data array are not the same!'
         )
-    array_length = np.amax(data_indices) + 1
-    data = zip(data_indices, data_values)
-    indexed_sum = np.zeros(shape=(array_length,), dtype=np.float32)
-    indexed_count = np.zeros(shape=(array_length,), dtype=np.int32)
-    for index, value in data:
-        indexed_sum[index] += value
-        indexed_count[index] += 1
+    if array_length is None:
+        array_length = np.amax(data_indices) + 1
+    indexed_sum = np.bincount(data_indices, weights=data_values,
+                              minlength=array_length)
+    indexed_count = np.bincount(data_indices,
+                                minlength=array_length).astype(np.int32)
     return indexed_sum, indexed_count
 
 
 def compute_offsets(data_values, data_indices, averages):
-    offsets = np.zeros(shape=data_values.shape, dtype=np.float32)
-    for index, value in enumerate(data_values):
-        offsets[index] += value - averages[data_indices[index]]
-    return offsets
+    return (data_values - averages[data_indices]).astype(np.float32)
 
 
 def compute_blended_indexed_averages(simple_sum, simple_count, global_average):
-    return np.array(
-        [((global_average * constants.BLENDING_RATIO + simple_sum[i]) /
-          (constants.BLENDING_RATIO + simple_count[i]))
-         for i in range(len(simple_sum))],
-        dtype=np.float32)
+    return ((global_average * constants.BLENDING_RATIO + simple_sum) /
+            (constants.BLENDING_RATIO + simple_count)).astype(np.float32)
 
 
 def compute_global_average_rating(data_set):
-    return np.mean(data_set[:, constants.RATING_INDEX])
+    return np.mean(get_point_column(data_set, constants.RATING_INDEX))
+
+
+def grow_array(array, length, dtype=np.float64):
+    if array.shape[0] >= length:
+        return array
+    grown_array = np.zeros(shape=(length,), dtype=dtype)
+    grown_array[:array.shape[0]] = array
+    return grown_array
 
 
 def load_stats_from_file(file_path):
@@ -0,0 +1,149 @@
+"""Time-effect preprocessing for time-aware models
+
+Rating dates are turned once into the per-point arrays the timeSVD++ kernel
+reads: the movie time bin, the per-user-day id and the user's date
+deviation dev_u(t). Day ids index the sorted user-day keys of the training
+set, and user-days the training set never saw get -1. The arrays are stored
+beside the split files as ``NAME_time_bins.npy``, ``NAME_time_days.npy`` and
+``NAME_time_deviations.npy``, and the training-set context as
+``NAME_day_keys.npy`` and ``NAME_user_mean_times.npy``.
+"""
+import numpy as np
+from os.path import join
+
+from utils.constants import (NUM_DAYS, NUM_TIME_BINS, STATS_CHUNK_SIZE,
+                             TIME_DEVIATION_EXPONENT, TIME_INDEX, USER_INDEX)
+from utils.data_io import get_point_column
+from utils.data_paths import DATA_DIR_PATH
+from utils.data_stats import compute_simple_indexed_sum_and_count
+from utils.dataset import get_num_users, get_points_array
+
+TIME_FEATURE_NAMES = ('bins', 'days', 'deviations')
+"""Names of the per-point time feature arrays, in TimeFeatures order"""
+
+
+class TimeFeatures:
+    def __init__(self, bins, days, deviations):
+        self.bins = bins
+        self.days = days
+        self.deviations = deviations
+
+    def __len__(self):
+        return self.bins.shape[0]
+
+    def rows(self, start, stop):
+        return TimeFeatures(self.bins[start:stop], self.days[start:stop],
+                            self.deviations[start:stop])
+
+
+def compute_day_ids(users, times, day_keys):
+    keys = compute_day_key_values(users, times)
+    day_ids = np.searchsorted(day_keys, keys)
+    found = day_ids < day_keys.shape[0]
+    found[found] = day_keys[day_ids[found]] == keys[found]
+    return np.where(found, day_ids, -1).astype(np.int32)
+
+
+def compute_day_key_values(users, times):
+    return (users.astype(np.int64) << 32) | times.astype(np.int64)
+
+
+def compute_day_keys(points, chunk_size=STATS_CHUNK_SIZE):
+    points = get_points_array(points)
+    day_keys = np.array([], dtype=np.int64)
+    for start in range(0, points.shape[0], chunk_size):
+        chunk = points[start:start + chunk_size]
+        day_keys = np.union1d(day_keys, compute_day_key_values(
+            get_point_column(chunk, USER_INDEX),
+            get_point_column(chunk, TIME_INDEX)))
+    return day_keys
+
+
+def compute_time_bins(times):
+    bins = (times.astype(np.int64) - 1) * NUM_TIME_BINS // NUM_DAYS
+    return np.clip(bins, 0, NUM_TIME_BINS - 1).astype(np.int16)
+
+
+def compute_time_deviations(users, times, user_mean_times):
+    known = users < user_mean_times.shape[0]
+    differences = np.zeros(users.shape[0], dtype=np.float64)
+    differences[known] = times[known] - user_mean_times[users[known]]
+    deviations = (np.sign(differences) *
+                  np.abs(differences) ** TIME_DEVIATION_EXPONENT)
+    return deviations.astype(np.float32)
+
+
+def compute_time_features(points, day_keys, user_mean_times,
+                          chunk_size=STATS_CHUNK_SIZE):
+    points = get_points_array(points)
+    num_points = points.shape[0]
+    time_features = TimeFeatures(
+        bins=np.zeros(num_points, dtype=np.int16),
+        days=np.zeros(num_points, dtype=np.int32),
+        deviations=np.zeros(num_points, dtype=np.float32))
+    for start in range(0, num_points, chunk_size):
+        chunk = points[start:start + chunk_size]
+        stop = start + chunk.shape[0]
+        users = get_point_column(chunk, USER_INDEX)
+        times = get_point_column(chunk, TIME_INDEX)
+        time_features.bins[start:stop] = compute_time_bins(times)
+        time_features.days[start:stop] = compute_day_ids(users, times,
+                                                         day_keys)
+        time_features.deviations[start:stop] = compute_time_deviations(
+            users, times, user_mean_times)
+    return time_features
+
+
+def compute_user_mean_times(points, num_users=None,
+                            chunk_size=STATS_CHUNK_SIZE):
+    points = get_points_array(points)
+    if num_users is None:
+        num_users = get_num_users(points)
+    time_sums = np.zeros(num_users)
+    time_counts = np.zeros(num_users, dtype=np.int64)
+    for start in range(0, points.shape[0], chunk_size):
+        chunk = points[start:start + chunk_size]
+        chunk_sums, chunk_counts = compute_simple_indexed_sum_and_count(
+            get_point_column(chunk, USER_INDEX),
+            get_point_column(chunk, TIME_INDEX), array_length=num_users)
+        time_sums += chunk_sums
+        time_counts += chunk_counts
+    user_mean_times = np.zeros(num_users, dtype=np.float32)
+    rated = time_counts > 0
+    user_mean_times[rated] = time_sums[rated] / time_counts[rated]
+    return user_mean_times
+
+
+def get_time_context_file_path(train_set_name, context_name):
+    return join(DATA_DIR_PATH, '{}_{}.npy'.format(train_set_name,
+                                                  context_name))
+
+
+def get_time_features_file_path(data_set_name, feature_name):
+    return join(DATA_DIR_PATH, '{}_time_{}.npy'.format(data_set_name,
+                                                       feature_name))
+
+
+def load_time_context(train_set_name):
+    return (np.load(get_time_context_file_path(train_set_name, 'day_keys')),
+            np.load(get_time_context_file_path(train_set_name,
+                                               'user_mean_times')))
+
+
+def load_time_features(data_set_name, mmap_mode='r'):
+    return TimeFeatures(*[
+        np.load(get_time_features_file_path(data_set_name, feature_name),
+                mmap_mode=mmap_mode)
+        for feature_name in TIME_FEATURE_NAMES])
+
+
+def write_time_context(day_keys, user_mean_times, train_set_name):
+    np.save(get_time_context_file_path(train_set_name, 'day_keys'), day_keys)
+    np.save(get_time_context_file_path(train_set_name, 'user_mean_times'),
+            user_mean_times)
+
+
+def write_time_features(time_features, data_set_name):
+    for feature_name in TIME_FEATURE_NAMES:
+        np.save(get_time_features_file_path(data_set_name, feature_name),
+                getattr(time_features, feature_name))
@@ -0,0 +1,110 @@
+"""Lazy, memory-mapped access to the data point arrays
+
+Split files opened through ``load_dataset_from_file`` are mapped read-only,
+so jobs training on the same split share the page cache instead of each
+holding a private copy of the array. Both ``.npy`` int32 arrays and compact
+points files (see ``utils.data_io.write_compact_points_to_file``) can be
+opened.
+"""
+import numpy as np
+
+from utils.constants import (FINGERPRINT_CHUNK_SIZE, MOVIE_INDEX,
+                             RATING_INDEX, TIME_INDEX, USER_INDEX)
+from utils.data_io import (get_point_column, is_compact_points_file,
+                           load_compact_points_from_file)
+
+
+class Dataset:
+    def __init__(self, points):
+        self.points = points
+        self._num_users = None
+        self._num_movies = None
+
+    def __getitem__(self, key):
+        return self.points[key]
+
+    def __iter__(self):
+        return iter(self.points)
+
+    def __len__(self):
+        return self.points.shape[0]
+
+    @property
+    def movies(self):
+        return get_point_column(self.points, MOVIE_INDEX)
+
+    @property
+    def num_movies(self):
+        if self._num_movies is None:
+            self._num_movies = int(np.amax(self.movies)) + 1
+        return self._num_movies
+
+    @property
+    def num_points(self):
+        return self.points.shape[0]
+
+    @property
+    def num_users(self):
+        if self._num_users is None:
+            self._num_users = int(np.amax(self.users)) + 1
+        return self._num_users
+
+    @property
+    def ratings(self):
+        return get_point_column(self.points, RATING_INDEX)
+
+    @property
+    def shape(self):
+        return self.points.shape
+
+    @property
+    def times(self):
+        return get_point_column(self.points, TIME_INDEX)
+
+    @property
+    def users(self):
+        return get_point_column(self.points, USER_INDEX)
+
+    def chunks(self, chunk_size):
+        for start in range(0, self.num_points, chunk_size):
+            yield self.rows(start, start + chunk_size)
+
+    def rows(self, start, stop):
+        return Dataset(self.points[start:stop])
+
+
+def compute_points_fingerprint(data_set, chunk_size=FINGERPRINT_CHUNK_SIZE):
+    """Hashes every point, a chunk at a time, so any edited point changes
+    the fingerprint"""
+    import hashlib
+    points = get_points_array(data_set)
+    digest = hashlib.sha1()
+    digest.update('{}{}'.format(points.shape, points.dtype).encode('ascii'))
+    for start in range(0, points.shape[0], chunk_size):
+        digest.update(np.ascontiguousarray(
+            points[start:start + chunk_size]).tobytes())
+    return digest.hexdigest()
+
+
+def get_num_movies(data_set):
+    if isinstance(data_set, Dataset):
+        return data_set.num_movies
+    return int(np.amax(get_point_column(data_set, MOVIE_INDEX))) + 1
+
+
+def get_num_users(data_set):
+    if isinstance(data_set, Dataset):
+        return data_set.num_users
+    return int(np.amax(get_point_column(data_set, USER_INDEX))) + 1
+
+
+def get_points_array(data_set):
+    if isinstance(data_set, Dataset):
+        return data_set.points
+    return data_set
+
+
+def load_dataset_from_file(file_path):
+    if is_compact_points_file(file_path):
+        return Dataset(load_compact_points_from_file(file_path, mmap_mode='r'))
+    return Dataset(np.load(file_path, mmap_mode='r'))
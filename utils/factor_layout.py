@@ -0,0 +1,47 @@
+import numpy as np
+
+from utils.constants import FACTOR_ROW_ALIGNMENT
+
+
+def align_factors(factors):
+    if factors.ndim != 2 or is_aligned_layout(factors):
+        return factors
+    aligned = allocate_factors(num_rows=factors.shape[0],
+                               num_features=factors.shape[1],
+                               dtype=factors.dtype)
+    aligned[:] = factors
+    return aligned
+
+
+def allocate_factors(num_rows, num_features, dtype='float32',
+                     fill_value=0):
+    """Returns a num_rows x num_features view of a buffer whose rows start on
+    FACTOR_ROW_ALIGNMENT byte boundaries; the padding columns stay zero"""
+    dtype = np.dtype(dtype)
+    row_stride = get_padded_num_features(num_features, dtype)
+    num_bytes = num_rows * row_stride * dtype.itemsize
+    buffer = np.zeros(num_bytes + FACTOR_ROW_ALIGNMENT, dtype=np.uint8)
+    offset = -buffer.ctypes.data % FACTOR_ROW_ALIGNMENT
+    padded = buffer[offset:offset + num_bytes].view(dtype).reshape(
+        num_rows, row_stride)
+    factors = padded[:, :num_features]
+    factors.fill(fill_value)
+    return factors
+
+
+def get_padded_num_features(num_features, dtype='float32'):
+    values_per_row = FACTOR_ROW_ALIGNMENT // np.dtype(dtype).itemsize
+    return -(-num_features // values_per_row) * values_per_row
+
+
+def has_padded_rows(factors):
+    """True for 2D arrays of contiguous rows, possibly spaced apart"""
+    return (factors.ndim == 2 and factors.strides[1] == factors.itemsize and
+            factors.strides[0] % factors.itemsize == 0 and
+            factors.strides[0] >= factors.shape[1] * factors.itemsize)
+
+
+def is_aligned_layout(factors):
+    return (has_padded_rows(factors) and
+            factors.ctypes.data % FACTOR_ROW_ALIGNMENT == 0 and
+            factors.strides[0] % FACTOR_ROW_ALIGNMENT == 0)
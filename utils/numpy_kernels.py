@@ -0,0 +1,139 @@
+"""Vectorized mini-batch numpy kernels, registered as the 'numpy' backend
+
+Each batch of ``NUMPY_BATCH_SIZE`` points gathers its user and movie rows,
+computes all prediction errors at once and scatter-adds the summed
+gradients back, so a user or movie seen twice in a batch gets both updates
+computed from the same starting values. The kernels take the same
+arguments as their C counterparts in ``utils.c_interface`` and need no
+compiled library.
+"""
+import numpy as np
+
+from utils.c_interface import register_kernel
+from utils.constants import (MAX_RATING, MIN_RATING, MOVIE_INDEX,
+                             NUMPY_BATCH_SIZE, NUMPY_SCATTER_ROUNDS,
+                             RATING_INDEX, USER_INDEX)
+from utils.data_io import get_point_column
+from utils.dataset import get_points_array
+
+
+def compute_changes(scaled_errors, other_rows, rows, decay):
+    """Returns the learn-rate scaled gradient step of rows, given the errors
+    already multiplied by the learn rate and decay = learn_rate * k_factor"""
+    if rows.ndim == 2:
+        scaled_errors = scaled_errors[:, None]
+    changes = np.multiply(other_rows, scaled_errors)
+    changes -= rows * np.float32(decay)
+    return changes
+
+
+def get_scaled_errors(ratings, predictions, learn_rate):
+    errors = np.subtract(ratings, predictions, dtype=np.float32)
+    errors *= np.float32(learn_rate)
+    return errors
+
+
+def iterate_batches(train_points, batch_size, order=None):
+    for start in range(0, train_points.shape[0], batch_size):
+        if order is None:
+            batch = train_points[start:start + batch_size]
+        else:
+            batch = train_points[order[start:start + batch_size]]
+        yield (get_point_column(batch, USER_INDEX),
+               get_point_column(batch, MOVIE_INDEX),
+               get_point_column(batch, RATING_INDEX))
+
+
+def numpy_svd_euclidean_train_epoch(train_points, users, user_offsets, movies,
+                                    movie_averages, num_features, learn_rate,
+                                    k_factor, num_threads=1,
+                                    batch_size=NUMPY_BATCH_SIZE, order=None):
+    """Runs one epoch like c_svd_euclidean_train_epoch; num_threads is
+    accepted for the same call but ignored, numpy runs on one thread"""
+    train_points = get_points_array(train_points)
+    for batch_users, batch_movies, ratings in iterate_batches(
+            train_points, batch_size, order=order):
+        user_rows = users[batch_users]
+        movie_rows = movies[batch_movies]
+        scaled_errors = get_scaled_errors(
+            ratings, predict_batch(user_rows, movie_rows, batch_users,
+                                   batch_movies, user_offsets,
+                                   movie_averages), learn_rate)
+        user_changes = compute_changes(scaled_errors, movie_rows, user_rows,
+                                       decay=learn_rate * k_factor)
+        movie_changes = compute_changes(scaled_errors, user_rows, movie_rows,
+                                        decay=learn_rate * k_factor)
+        user_rows += user_changes
+        movie_rows += movie_changes
+        scatter_add(users, batch_users, user_changes, updated_rows=user_rows)
+        scatter_add(movies, batch_movies, movie_changes,
+                    updated_rows=movie_rows)
+
+
+def numpy_svd_update_feature(train_points, users, user_offsets, movies,
+                             residuals, movie_averages, feature, num_features,
+                             learn_rate, k_factor,
+                             batch_size=NUMPY_BATCH_SIZE, order=None):
+    train_points = get_points_array(train_points)
+    for batch_users, batch_movies, ratings in iterate_batches(
+            train_points, batch_size, order=order):
+        user_rows = users[batch_users]
+        movie_rows = movies[batch_movies]
+        scaled_errors = get_scaled_errors(
+            ratings, predict_batch(user_rows, movie_rows, batch_users,
+                                   batch_movies, user_offsets,
+                                   movie_averages), learn_rate)
+        user_values = user_rows[:, feature]
+        movie_values = movie_rows[:, feature]
+        user_changes = compute_changes(scaled_errors, movie_values,
+                                       user_values,
+                                       decay=learn_rate * k_factor)
+        movie_changes = compute_changes(scaled_errors, user_values,
+                                        movie_values,
+                                        decay=learn_rate * k_factor)
+        scatter_add(users[:, feature], batch_users, user_changes,
+                    updated_rows=user_values + user_changes)
+        scatter_add(movies[:, feature], batch_movies, movie_changes,
+                    updated_rows=movie_values + movie_changes)
+
+
+def predict_batch(user_rows, movie_rows, batch_users, batch_movies,
+                  user_offsets, movie_averages):
+    predictions = (movie_averages[batch_movies] + user_offsets[batch_users] +
+                   np.einsum('ij,ij->i', user_rows, movie_rows))
+    return np.clip(predictions, MIN_RATING, MAX_RATING)
+
+
+def scatter_add(target, ids, changes, updated_rows=None):
+    """Adds every row of changes to the target row of its id. The ids are
+    sorted once and added in rounds of distinct ids, the k-th occurrence of
+    each id in round k; ids seen more than NUMPY_SCATTER_ROUNDS times have
+    their remaining rows summed with reduceat, which is slow per id. When
+    updated_rows holds the gathered rows plus their changes, the first round
+    stores them instead of gathering the target rows again."""
+    order = np.argsort(ids, kind='stable')
+    sorted_ids = ids[order]
+    is_start = np.empty(ids.shape[0], dtype=bool)
+    is_start[:1] = True
+    np.not_equal(sorted_ids[1:], sorted_ids[:-1], out=is_start[1:])
+    starts = np.flatnonzero(is_start)
+    counts = np.diff(np.append(starts, ids.shape[0]))
+    ranks = np.arange(ids.shape[0]) - np.repeat(starts, counts)
+    for rank in range(min(counts.max(), NUMPY_SCATTER_ROUNDS)):
+        rows = order[ranks == rank]
+        if rank == 0 and updated_rows is not None:
+            target[ids[rows]] = updated_rows[rows]
+        else:
+            target[ids[rows]] += changes[rows]
+    if counts.max() <= NUMPY_SCATTER_ROUNDS:
+        return
+    is_rest = ranks >= NUMPY_SCATTER_ROUNDS
+    rest_ids = sorted_ids[is_rest]
+    rest_starts = np.flatnonzero(np.append(True,
+                                           rest_ids[1:] != rest_ids[:-1]))
+    target[rest_ids[rest_starts]] += np.add.reduceat(
+        changes[order[is_rest]], rest_starts, axis=0)
+
+register_kernel('svd_update_feature', 'numpy', numpy_svd_update_feature)
+register_kernel('svd_euclidean_train_epoch', 'numpy',
+                numpy_svd_euclidean_train_epoch)